@@ -5,17 +5,27 @@ import json
 import requests
 import time
 import sys, os
+import threading
+from API.tracker import OrderTracker
+
+# 下单被拒时，认为是会话失效的返回信息关键字
+AUTH_ERROR_KEYWORDS = ('未登录', '登录', '登陆', 'login', 'Login')
+
+# 默认服务地址，可用环境变量或 base_url 参数替换（如指向本地模拟服务）
+REAL_BASE_URL = "https://www.quantum-hedge.com"
+VIRTUAL_BASE_URL = "https://www.popper-fintech.com"
 
 
 class SSEClient:
-    def __init__(self, license_key='', fc_code=''):
+    def __init__(self, license_key='', fc_code='', base_url=None):
         """
         初始化交易客户端
-        :param base_url: API基础地址
         :param license_key: 许可证密钥
+        :param base_url: API基础地址，设置后行情与交易请求都发往该地址；
+                         默认取环境变量 LZC_REAL_BASE_URL / LZC_VIRTUAL_BASE_URL，否则为官方地址
         """
-        self.real_base_url = "https://www.quantum-hedge.com"
-        self.virtual_base_url = "https://www.popper-fintech.com"
+        self.real_base_url = base_url or os.environ.get('LZC_REAL_BASE_URL', REAL_BASE_URL)
+        self.virtual_base_url = base_url or os.environ.get('LZC_VIRTUAL_BASE_URL', VIRTUAL_BASE_URL)
         if fc_code == 'simnow':
             self.base_url = self.virtual_base_url
             self.next_url = "apollo-ctp"
@@ -40,7 +50,10 @@ class SSEClient:
         self.is_mkt_open = True
         self._loop = asyncio.get_event_loop()
 
-        self.order_conditions = {}
+        self.order_tracker = OrderTracker()
+        # 由 'ready' / 'logged_out' 推送维护的会话状态
+        self._ready_event = threading.Event()
+        self._login_lock = threading.Lock()
 
     async def connect_sse(self, fc_code, user_id):
         """
@@ -89,6 +102,7 @@ class SSEClient:
             try:
                 print("listening")
                 async for event in self.event_source:
+                    recv_time = time.perf_counter()
                     print("event", event)
 
                     # 跳过连接确认/心跳等非业务事件
@@ -101,25 +115,29 @@ class SSEClient:
                         print(f"登陆成功: {event.data}")
                     if event.type == "ready":
                         self.is_ready = True
+                        self._ready_event.set()
                         print(f"结算单已确认，可以开始交易:{event.data}")
                     if event.type == "isMarketOpen":
                         self.is_mkt_open = False
                         print(f"现在{event.data}交易时间")
-                    if event.type == "trade":
-                        print("成交单回报:", event.data)
-                        print("已成交单号", event.dara.originOrderId)
-
                     # 只处理业务事件
-                    if event.type in ('logged_out', 'order', 'excption'):
+                    if event.type in ('logged_out', 'order', 'trade', 'excption'):
                         try:
                             data = json.loads(event.data) if event.data else {}
                             print(f"收到业务事件: {event.type} - {data}")
 
                             if event.type == "logged_out":
-                                self.is_logged_in = False
+                                self.invalidate_session()
                                 print("退出成功")
                             elif event.type == "order":
                                 print("委托单回报:", data)
+                                self.order_tracker.on_order(data, recv_time)
+                            elif event.type == "trade":
+                                print("成交单回报:", data)
+                                self.order_tracker.on_trade(data, recv_time)
+                            elif event.type == "excption":
+                                print("异常回报:", data)
+                                self.order_tracker.on_error(data, recv_time)
 
                         except json.JSONDecodeError:
                             print(f"非JSON格式的业务数据: {event.data}")
@@ -127,8 +145,10 @@ class SSEClient:
                             print(f"处理业务事件时出错: {e}")
 
             except Exception as e:
-                print(f"事件监听错误: {e['characters_written']}")
-                await self._cleanup()
+                # 推送流已断开：关闭连接并标记为未连接，由 reconnect() 重新建立
+                print(f"事件监听错误: {e}")
+                await self._close_stream()
+                return
 
     '''async def _check_connected(self):
         # 等待连接状态稳定
@@ -179,11 +199,72 @@ class SSEClient:
             print(f"登录请求出错: {e}")
             return False
 
-    def send_order(self, symbol, exchange, direction, offset, price, volume, stopPrice, orderPriceType):
+    def is_alive(self):
+        """推送流是否仍在接收：已连接且监听任务未退出"""
+        receive_task = getattr(self, 'receive_task', None)
+        return self.is_connected and receive_task is not None and not receive_task.done()
+
+    def reconnect(self, timeout=10):
+        """
+        推送流断开后重新建立SSE连接并重新登录（同步，不能在事件循环线程中调用）
+        :param timeout: 建立连接、等待连接确认和等待 'ready' 推送各自的最长秒数
+        :return: 连接与登录是否都已恢复
+        """
+        print("SSE推送流已断开，重新连接")
+        try:
+            asyncio.run_coroutine_threadsafe(self._cleanup(), self._loop).result(timeout)
+            connect = asyncio.run_coroutine_threadsafe(self.connect_sse(self.fc_code, self.user_id), self._loop)
+            if not connect.result(timeout):
+                return False
+        except Exception as e:
+            print(f"重新连接出错: {e}")
+            return False
+
+        deadline = time.time() + timeout
+        while not self.is_connected:
+            if time.time() > deadline or self.receive_task.done():
+                print("SSE连接超时")
+                return False
+            time.sleep(0.1)
+        return self.ensure_login(timeout=timeout)
+
+    def invalidate_session(self):
+        """标记会话失效，下一次下单前会重新登录"""
+        self.is_logged_in = False
+        self.is_ready = False
+        self._ready_event.clear()
+
+    def ensure_login(self, password=None, timeout=5):
+        """
+        会话有效时直接返回；失效时才重新登录，并等待 'ready' 推送
+        :param password: 交易密码，默认使用上次登录的密码
+        :param timeout: 等待 'ready' 的最长秒数
+        """
+        if self.is_ready:
+            return True
+        with self._login_lock:
+            # 其他线程可能已经完成了重新登录
+            if self.is_ready:
+                return True
+            if not self.login(password or self.password):
+                return False
+            if not self._ready_event.wait(timeout):
+                print("重新登录等待超时")
+                return False
+            return True
+
+    @staticmethod
+    def _is_auth_error(result):
+        message = str(result.get('message') or '')
+        return any(keyword in message for keyword in AUTH_ERROR_KEYWORDS)
+
+    def send_order(self, symbol, exchange, direction, offset, price, volume, stopPrice, orderPriceType, callback=None):
         """
         期货下单（同步）
+        会话有效时只发送一次请求；因登录失效被拒时重新登录并重试一次
+        :param callback: 可选回调 callback(record, stage)，在委托回报和全部成交时调用
         """
-        if not self.is_ready:
+        if not self.ensure_login():
             raise Exception("未登录")
 
         url = f"{self.base_url}/{self.next_url}/api/v1/td/submitOrder"
@@ -202,23 +283,30 @@ class SSEClient:
         }
 
         try:
-            resp = self.syn_session.post(
-                url,
-                json=data,
-                headers={
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json',
-                    'license': self.license_key
-                },
-                timeout=10
-            )
-            result = resp.json()
-            if result.get('code') == 0:
-                print(f"单号: {result.get('data')}")
-                order_number = result.get('data')
-                self.order_conditions[order_number] = 0
-                return result.get('data')
-            else:
+            for attempt in range(2):
+                data["password"] = self.password
+                submit_time = time.perf_counter()
+                resp = self.syn_session.post(
+                    url,
+                    json=data,
+                    headers={
+                        'Content-Type': 'application/json',
+                        'Accept': 'application/json',
+                        'license': self.license_key
+                    },
+                    timeout=10
+                )
+                result = resp.json()
+                if result.get('code') == 0:
+                    print(f"单号: {result.get('data')}")
+                    order_number = result.get('data')
+                    self.order_tracker.submitted(order_number, submit_time, symbol=symbol, volume=volume, callback=callback)
+                    return result.get('data')
+                if attempt == 0 and self._is_auth_error(result):
+                    print(f"下单因登录失效被拒，重新登录后重试: {result.get('message')}")
+                    self.invalidate_session()
+                    if self.ensure_login():
+                        continue
                 print(f"下单失败: {result.get('message')}")
                 return None
         except Exception as e:
@@ -359,7 +447,7 @@ class SSEClient:
             result = resp.json()
             if result.get('code') == 0:
                 print("退出请求已发送，等待退出结果...")
-                self.is_ready = False
+                self.invalidate_session()
                 return True
             else:
                 print(f"退出失败: {result.get('message')}")
@@ -423,17 +511,23 @@ class SSEClient:
 
     async def _cleanup(self):
         """清理资源"""
-        try:
-            print("开始清理资源")
-            if hasattr(self, 'receive_task'):
-                self.receive_task.cancel()
-                try:
-                    await self.receive_task
-                except asyncio.CancelledError:
-                    pass
+        print("开始清理资源")
+        receive_task = getattr(self, 'receive_task', None)
+        if receive_task is not None and not receive_task.done():
+            receive_task.cancel()
+            try:
+                await receive_task
+            except asyncio.CancelledError:
+                pass
 
+        await self._close_stream()
+
+    async def _close_stream(self):
+        """关闭推送流和异步会话，并标记为未连接、未登录（监听任务自身退出时也会调用）"""
+        try:
             if hasattr(self, 'event_source'):
                 await self.event_source.__aexit__(None, None, None)
+                del self.event_source
 
             if self.asy_session:
                 await self.asy_session.close()
@@ -443,7 +537,7 @@ class SSEClient:
 
         finally:
             self.is_connected = False
-            self.is_ready = False
+            self.invalidate_session()
             self.asy_session = None
 
     async def __aenter__(self):
@@ -10,8 +10,9 @@ class Context:
     """
     API interface provides connection to China's products
     """
-    def __init__(self, lisence="", fc_code="", user_id="", password=""):
+    def __init__(self, lisence="", fc_code="", user_id="", password="", base_url=None):
         self.lisence = lisence
+        self.base_url = base_url
         self.fc_code = fc_code
         self.user_id = user_id
         self.password = password
@@ -48,7 +49,7 @@ class Context:
         print("同步登出完成")
 
     async def _start_connection(self):
-        async with SSEClient(license_key=self.lisence, fc_code=self.fc_code) as client:
+        async with SSEClient(license_key=self.lisence, fc_code=self.fc_code, base_url=self.base_url) as client:
             if not await client.connect_sse(self.fc_code, self.user_id):
                 print("连接 SSE 失败")
                 return
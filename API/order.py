@@ -29,3 +29,7 @@ class EntitySpec(object):
             order=order
         )
 
+    def cancel(self, order_id):
+
+        return self.ctx.sse_client.cancel_order(order_id)
+
@@ -0,0 +1,297 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+# 延迟直方图的桶边界（毫秒），最后一个桶为溢出桶
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+LATENCY_STAGES = ('response', 'ack', 'fill')
+
+# 委托回报中的终止状态 -> 记录状态，兼容CTP状态码（'5' 已撤单）与文字状态
+ORDER_END_STATUSES = {
+    '5': 'cancelled',
+    'canceled': 'cancelled',
+    'cancelled': 'cancelled',
+    'rejected': 'rejected',
+}
+FINAL_STATUSES = ('filled', 'cancelled', 'rejected')
+
+# 未登记单号的推送（如手工下单或同账户的其他客户端）最多暂存的单号数和秒数
+EARLY_EVENT_LIMIT = 1000
+EARLY_EVENT_TTL = 30
+
+
+class OrderRecord(object):
+    """单笔委托的生命周期记录"""
+
+    def __init__(self, order_id, symbol=None, volume=None, submit_time=None):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.volume = volume
+        self.filled_volume = 0
+        self.status = 'submitted'
+        # 以 time.perf_counter() 记录的各阶段时间点
+        self.submit_time = submit_time
+        self.response_time = None
+        self.ack_time = None
+        self.fill_time = None
+        self.future = Future()
+        self.callbacks = []
+
+    def latency(self):
+        """返回各阶段相对报单时刻的延迟（毫秒），未到达的阶段为 None"""
+        result = {}
+        for stage in LATENCY_STAGES:
+            stage_time = getattr(self, f'{stage}_time')
+            if stage_time is None or self.submit_time is None:
+                result[stage] = None
+            else:
+                result[stage] = (stage_time - self.submit_time) * 1000
+        return result
+
+
+class LatencyHistogram(object):
+    """固定桶的延迟直方图"""
+
+    def __init__(self, bounds=None):
+        self.bounds = list(bounds or LATENCY_BUCKETS_MS)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value_ms):
+        self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+        self.total += 1
+        self.sum += value_ms
+        self.max = max(self.max, value_ms)
+
+    def merge(self, other):
+        """并入另一个同桶边界的直方图"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """按桶上界估计分位数（毫秒）"""
+        if self.total == 0:
+            return None
+        rank = q / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count > 0:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        labels = [f'<={b}ms' for b in self.bounds] + [f'>{self.bounds[-1]}ms']
+        return {
+            'count': self.total,
+            'mean': self.sum / self.total if self.total else None,
+            'max': self.max if self.total else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class OrderTracker(object):
+    """
+    委托跟踪器：将服务器单号映射到 Future / 回调，
+    并根据 SSE 推送记录 报单 -> 回报 -> 成交 的时间点
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+        # 在报单响应返回之前就已到达的推送，按单号暂存；超时或超量时丢弃最早的
+        self._early_events = OrderedDict()
+        self._histograms = {stage: LatencyHistogram() for stage in LATENCY_STAGES}
+
+    def submitted(self, order_id, submit_time, symbol=None, volume=None, callback=None):
+        """
+        报单响应返回后登记单号
+        :param order_id: 服务器返回的单号
+        :param submit_time: 发送报单请求前的 time.perf_counter()
+        :param callback: 可选回调 callback(record, stage)，stage 为 'ack'、'fill'、'cancelled' 或 'rejected'
+        :return: 全部成交、撤单或被拒时完成的 Future，结果为委托记录
+        """
+        record = OrderRecord(order_id, symbol=symbol, volume=volume, submit_time=submit_time)
+        record.response_time = time.perf_counter()
+        if callback is not None:
+            record.callbacks.append(callback)
+
+        with self._lock:
+            self._records[order_id] = record
+            self._histograms['response'].add((record.response_time - submit_time) * 1000)
+            early_events = self._early_events.pop(order_id, [])
+
+        for event_type, data, recv_time in early_events:
+            if event_type == 'order':
+                self.on_order(data, recv_time)
+            elif event_type == 'trade':
+                self.on_trade(data, recv_time)
+            else:
+                self.on_error(data, recv_time)
+        return record.future
+
+    def add_callback(self, order_id, callback):
+        """登记回调；委托已经结束时立即以结束阶段（'fill'、'cancelled' 或 'rejected'）调用一次"""
+        with self._lock:
+            record = self._records.get(order_id)
+            if record is None:
+                raise KeyError(order_id)
+            finished = record.status in FINAL_STATUSES
+            if not finished:
+                record.callbacks.append(callback)
+        if finished:
+            stage = 'fill' if record.status == 'filled' else record.status
+            try:
+                callback(record, stage)
+            except Exception as e:
+                print(f"委托回调出错: {e}")
+
+    def on_order(self, data, recv_time=None):
+        """处理委托回报推送，撤单或拒单的回报会结束该委托"""
+        recv_time = recv_time or time.perf_counter()
+        order_id = data.get('originOrderId')
+        if order_id is None:
+            return
+        status = str(data.get('orderStatus', data.get('status', ''))).lower()
+        end_status = ORDER_END_STATUSES.get(status)
+        with self._lock:
+            record = self._records.get(order_id)
+            if record is None:
+                self._buffer_early(order_id, 'order', data, recv_time)
+                return
+            acked = self._ack(record, recv_time)
+            if record.status == 'submitted':
+                record.status = 'acknowledged'
+            ended = end_status is not None and self._end(record, end_status)
+        if acked:
+            self._notify(record, 'ack')
+        if ended:
+            self._resolve(record)
+
+    def on_error(self, data, recv_time=None):
+        """处理异常推送（如可平仓位不足），对应的委托视为被拒"""
+        recv_time = recv_time or time.perf_counter()
+        order_id = data.get('originOrderId')
+        if order_id is None:
+            return
+        with self._lock:
+            record = self._records.get(order_id)
+            if record is None:
+                self._buffer_early(order_id, 'error', data, recv_time)
+                return
+            ended = self._end(record, 'rejected')
+        if ended:
+            self._resolve(record)
+
+    def on_trade(self, data, recv_time=None):
+        """处理成交回报推送"""
+        recv_time = recv_time or time.perf_counter()
+        order_id = data.get('originOrderId')
+        if order_id is None:
+            return
+        with self._lock:
+            record = self._records.get(order_id)
+            if record is None:
+                self._buffer_early(order_id, 'trade', data, recv_time)
+                return
+            # 成交先于委托回报到达时，以成交时间作为回报时间
+            acked = self._ack(record, recv_time)
+            filled = False
+            if record.fill_time is None:
+                record.filled_volume += int(float(data.get('volume') or 0))
+                if record.volume is not None and record.filled_volume < record.volume:
+                    record.status = 'partially_filled'
+                else:
+                    record.fill_time = recv_time
+                    record.status = 'filled'
+                    self._histograms['fill'].add((recv_time - record.submit_time) * 1000)
+                    filled = True
+        if acked:
+            self._notify(record, 'ack')
+        if filled:
+            if not record.future.done():
+                record.future.set_result(record)
+            self._notify(record, 'fill')
+
+    def _ack(self, record, recv_time):
+        """首次收到该委托的推送时记录回报时间，返回是否为首次（需持有锁）"""
+        if record.ack_time is not None:
+            return False
+        record.ack_time = recv_time
+        self._histograms['ack'].add((recv_time - record.submit_time) * 1000)
+        return True
+
+    def _end(self, record, status):
+        """将未结束的委托标记为撤单或被拒，返回是否发生了变化（需持有锁）"""
+        if record.status in FINAL_STATUSES:
+            return False
+        record.status = status
+        return True
+
+    def _resolve(self, record):
+        if not record.future.done():
+            record.future.set_result(record)
+        self._notify(record, record.status)
+
+    def _buffer_early(self, order_id, event_type, data, recv_time):
+        """暂存单号尚未登记的推送，丢弃超过 EARLY_EVENT_TTL 秒或超出 EARLY_EVENT_LIMIT 个单号的最早记录（需持有锁）"""
+        events = self._early_events.get(order_id)
+        if events is None:
+            events = self._early_events[order_id] = []
+        events.append((event_type, data, recv_time))
+        while self._early_events:
+            first_id, first_events = next(iter(self._early_events.items()))
+            if len(self._early_events) <= EARLY_EVENT_LIMIT and recv_time - first_events[0][2] <= EARLY_EVENT_TTL:
+                break
+            del self._early_events[first_id]
+
+    def _notify(self, record, stage):
+        for callback in list(record.callbacks):
+            try:
+                callback(record, stage)
+            except Exception as e:
+                print(f"委托回调出错: {e}")
+
+    def get(self, order_id):
+        with self._lock:
+            return self._records.get(order_id)
+
+    def wait(self, order_id, timeout=None):
+        """阻塞等待委托全部成交、撤单或被拒（见 record.status），超时抛出 concurrent.futures.TimeoutError"""
+        record = self.get(order_id)
+        if record is None:
+            raise KeyError(order_id)
+        return record.future.result(timeout=timeout)
+
+    def latency(self, order_id):
+        record = self.get(order_id)
+        return record.latency() if record is not None else None
+
+    def summary(self):
+        """各阶段的聚合延迟直方图"""
+        with self._lock:
+            return {stage: hist.to_dict() for stage, hist in self._histograms.items()}
+
+    def reset(self):
+        """
+        交易时段结束时调用：丢弃已结束委托的记录和暂存的推送，并清空延迟直方图，
+        常驻进程中记录不会无限增长，各时段的统计也互不混合；未结束的委托保留，仍可等待
+        :return: 丢弃的委托记录数
+        """
+        with self._lock:
+            finished = [order_id for order_id, record in self._records.items() if record.status in FINAL_STATUSES]
+            for order_id in finished:
+                del self._records[order_id]
+            self._early_events.clear()
+            self._histograms = {stage: LatencyHistogram() for stage in LATENCY_STAGES}
+        return len(finished)
@@ -2,17 +2,22 @@ import asyncio
 import aiohttp
 from aiohttp_sse_client import client as sse_client
 import json
+import os
 import requests
 
+# 默认服务地址，可用环境变量或 base_url 参数替换（如指向本地模拟服务）
+REAL_BASE_URL = "https://www.quantum-hedge.com"
+VIRTUAL_BASE_URL = "https://www.popper-fintech.com"
+
 class SSEClient:
-    def __init__(self, license_key=''):
+    def __init__(self, license_key='', base_url=None):
         """
         初始化交易客户端
-        :param base_url: API基础地址
         :param license_key: 许可证密钥
+        :param base_url: API基础地址，默认取环境变量 LZC_REAL_BASE_URL / LZC_VIRTUAL_BASE_URL，否则为官方地址
         """
-        self.real_base_url = "https://www.quantum-hedge.com"
-        self.virtual_base_url = "https://www.popper-fintech.com"
+        self.real_base_url = base_url or os.environ.get('LZC_REAL_BASE_URL', REAL_BASE_URL)
+        self.virtual_base_url = base_url or os.environ.get('LZC_VIRTUAL_BASE_URL', VIRTUAL_BASE_URL)
 
         self.license_key = license_key
         self.is_connected = False
@@ -41,7 +46,7 @@ class SSEClient:
             print("SSE连接已存在，无需重复连接")
             return True
 
-        url = f"https://www.quantum-hedge.com/apollo-trade/sse/tdConnect?fcCode=rh&userId=202500100"
+        url = f"{self.real_base_url}/apollo-trade/sse/tdConnect?fcCode=rh&userId=202500100"
 
         try:
             self.asy_session = aiohttp.ClientSession(
@@ -93,7 +98,6 @@ class SSEClient:
                         print(f"现在{event.data}交易时间")
                     if event.type == "trade":
                         print("成交单回报:", event.data)
-                        print("已成交单号", event.dara.originOrderId)
 
                     # 只处理业务事件
                     if event.type in ('logged_out', 'order', 'excption'):
@@ -10,8 +10,9 @@ class Context:
     """
     API interface provides connection to China's products
     """
-    def __init__(self, lisence=""):
+    def __init__(self, lisence="", base_url=None):
         self.lisence = lisence
+        self.base_url = base_url
         self.sse_client = None
 
         # 子模块接口
@@ -45,7 +46,7 @@ class Context:
         print("同步登出完成")
 
     async def _start_connection(self):
-        async with SSEClient(license_key=self.lisence) as client:
+        async with SSEClient(license_key=self.lisence, base_url=self.base_url) as client:
             if not await client.connect_sse():
                 print("连接 SSE 失败")
                 return
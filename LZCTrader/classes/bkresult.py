@@ -1,6 +1,13 @@
+import numpy as np
+import pandas as pd
 from LZCTrader.classes.order import Order
+from LZCTrader.tools.resultstore import TRADE_DTYPE, EQUITY_DTYPE
 from datetime import datetime
 
+# 权益曲线数组的初始容量，写满后容量翻倍
+EQUITY_CAPACITY = 4096
+
+
 class Bkresult:
 
     def __init__(
@@ -14,55 +21,213 @@ class Bkresult:
         # Required attributes
         self.instrument = instrument
         self.balance = balance
+        self.start_balance = balance
         self.value_per_point = value_per_point
         self.point_change = point_change
         self.long_position = 0
         self.short_position = 0
-        self.long_enter_price = 0
-        self.short_enter_price = 0
+        self.long_enter_price = 0  # 多仓持仓均价
+        self.short_enter_price = 0  # 空仓持仓均价
         self.data_1s_buff = None
         self.data_1min_buff = None
         self.point = 0
+        self.time = None  # 当前回测时间，由回测循环设置
+        self.ts = 0
+        self.last_price = None
+        self.trades = []  # 成交记录，见TRADE_DTYPE
+
+        # 每个回测步长按最新价盯市的权益，按列存放在预分配的数组中，见EQUITY_DTYPE
+        self.rows = 0
+        self.columns = {name: np.empty(EQUITY_CAPACITY, dtype=EQUITY_DTYPE[name]) for name in EQUITY_DTYPE.names}
+
+        # 风险指标随权益曲线增量更新
+        self.peak_equity = balance
+        self.peak_ts = None
+        self.max_drawdown = 0
+        self.max_drawdown_pct = None  # 相对回撤起点权益，权益非正时无意义
+        self.max_drawdown_duration = 0  # 纳秒
+        self.bars_in_market = 0
+        self.max_position = 0
 
     def update_result(self, order: Order):
         profit = 0
         if order.offset == 1:
             if order.direction == 2:
-                self.long_enter_price = order.price
+                self.long_enter_price = (self.long_enter_price * self.long_position + order.price * order.volume) / (self.long_position + order.volume)
                 self.long_position += order.volume
+                type = 1
             else:
-                self.short_enter_price = order.price
+                self.short_enter_price = (self.short_enter_price * self.short_position + order.price * order.volume) / (self.short_position + order.volume)
                 self.short_position += order.volume
+                type = 3
         elif order.offset == 4:
             if order.direction == 2:
                 self.short_position -= order.volume
                 profit = self.short_enter_price - order.price
+                type = 4
             else:
                 self.long_position -= order.volume
                 profit = order.price - self.long_enter_price
+                type = 2
         else:
             raise ValueError("Invalid offset")
 
         if self.long_position < 0 or self.short_position < 0:
             raise ValueError("Invalid position")
+        if self.long_position == 0:
+            self.long_enter_price = 0
+        if self.short_position == 0:
+            self.short_enter_price = 0
 
         profit = profit / self.point_change
         self.balance += profit * self.value_per_point * order.volume
         self.point += profit
+        self.record_trade(type, order.price, order.volume, profit)
 
     def clear_positions(self, clear_price):
         if self.long_position > 0:
-            profit = clear_price - self.long_enter_price
+            profit = (clear_price - self.long_enter_price) / self.point_change
             self.balance += profit * self.value_per_point * self.long_position
             self.point += profit
+            self.record_trade(2, clear_price, self.long_position, profit)
             self.long_position = 0
+            self.long_enter_price = 0
         if self.short_position > 0:
-            profit = self.short_enter_price - clear_price
+            profit = (self.short_enter_price - clear_price) / self.point_change
             self.balance += profit * self.value_per_point * self.short_position
             self.point += profit
+            self.record_trade(4, clear_price, self.short_position, profit)
             self.short_position = 0
+            self.short_enter_price = 0
         return
 
+    def set_time(self, time: datetime):
+        self.time = time
+        self.ts = pd.Timestamp(time).value
+
+    def record_trade(self, type: int, price: float, volume: int, points: float):
+        self.trades.append((self.ts, type, price, volume, points, self.balance))
+
+    def unrealized(self, price: float) -> float:
+        """Floating profit of the open positions at price, in money."""
+        points = (price - self.long_enter_price) * self.long_position + (self.short_enter_price - price) * self.short_position
+        return points / self.point_change * self.value_per_point
+
+    def mark(self, price: float = None):
+        """Appends the mark-to-market equity at the current backtest time.
+
+        price is the latest price; without it the previous one is used.
+        O(1) apart from the occasional doubling of the arrays.
+        """
+        if price is not None:
+            self.last_price = price
+        position = self.long_position - self.short_position
+        equity = self.balance
+        if self.last_price is not None and (self.long_position or self.short_position):
+            equity += self.unrealized(self.last_price)
+
+        if self.rows == len(self.columns['ts']):
+            for name, column in self.columns.items():
+                self.columns[name] = np.resize(column, 2 * len(column))
+        row = self.rows
+        columns = self.columns
+        columns['ts'][row] = self.ts
+        columns['price'][row] = self.last_price if self.last_price is not None else np.nan
+        columns['balance'][row] = self.balance
+        columns['equity'][row] = equity
+        columns['point'][row] = self.point
+        columns['position'][row] = position
+        self.rows += 1
+
+        if self.peak_ts is None or equity >= self.peak_equity:
+            self.peak_equity = equity
+            self.peak_ts = self.ts
+        else:
+            drawdown = self.peak_equity - equity
+            self.max_drawdown = max(self.max_drawdown, drawdown)
+            if self.peak_equity > 0:
+                self.max_drawdown_pct = max(self.max_drawdown_pct or 0.0, drawdown / self.peak_equity)
+            self.max_drawdown_duration = max(self.max_drawdown_duration, self.ts - self.peak_ts)
+        if position:
+            self.bars_in_market += 1
+            self.max_position = max(self.max_position, abs(position))
+
+    def extend(self, trades: np.ndarray, equity: np.ndarray, long_position: int, long_enter_price: float,
+               short_position: int, short_enter_price: float):
+        """Appends a whole session of ledger and equity rows at once.
+
+        Used by the vectorized backtest: trades and equity are TRADE_DTYPE and
+        EQUITY_DTYPE rows computed for the session (every session with trades
+        has equity rows), and the positions are those after its last row. Balance, risk figures and the last price
+        end up as if every row had gone through update_result and mark.
+        """
+        self.trades.extend(trades.tolist())
+        if len(trades):
+            self.balance = float(trades['balance'][-1])
+            self.point = float(equity['point'][-1])
+        self.long_position, self.long_enter_price = long_position, long_enter_price
+        self.short_position, self.short_enter_price = short_position, short_enter_price
+        if len(equity) == 0:
+            return
+
+        rows = self.rows + len(equity)
+        if rows > len(self.columns['ts']):
+            capacity = max(rows, 2 * len(self.columns['ts']))
+            for name, column in self.columns.items():
+                self.columns[name] = np.resize(column, capacity)
+        for name, column in self.columns.items():
+            column[self.rows:rows] = equity[name]
+        self.rows = rows
+        prices = equity['price'][~np.isnan(equity['price'])]
+        if len(prices):
+            self.last_price = float(prices[-1])
+        self.set_time(pd.Timestamp(int(equity['ts'][-1])).to_pydatetime())
+
+        # 与mark()逐行更新的结果相同：权益不低于此前峰值即为新峰值
+        values, ts, position = equity['equity'], equity['ts'], equity['position']
+        running = np.maximum.accumulate(np.r_[-np.inf if self.peak_ts is None else self.peak_equity, values])
+        peak_before = running[:-1]
+        new_peak = values >= peak_before
+        at = np.maximum.accumulate(np.where(new_peak, np.arange(len(values)), -1))
+        peak_ts = np.where(at >= 0, ts[np.maximum(at, 0)], self.peak_ts if self.peak_ts is not None else 0)
+        below = ~new_peak
+        if below.any():
+            drawdown = peak_before[below] - values[below]
+            self.max_drawdown = max(self.max_drawdown, float(drawdown.max()))
+            positive = peak_before[below] > 0
+            if positive.any():
+                self.max_drawdown_pct = max(self.max_drawdown_pct or 0.0, float((drawdown[positive] / peak_before[below][positive]).max()))
+            self.max_drawdown_duration = max(self.max_drawdown_duration, int((ts[below] - peak_ts[below]).max()))
+        if new_peak.any():
+            self.peak_equity = float(running[-1])
+            self.peak_ts = int(peak_ts[-1])
+        holding = position != 0
+        self.bars_in_market += int(holding.sum())
+        if holding.any():
+            self.max_position = max(self.max_position, int(np.abs(position[holding]).max()))
+
+    def risk_metrics(self) -> dict:
+        """Risk figures of the equity curve so far, as JSON-serialisable numbers."""
+        equity = float(self.columns['equity'][self.rows - 1]) if self.rows else float(self.balance)
+        return {
+            'equity': equity,
+            'return': equity - self.start_balance,
+            'max_drawdown': float(self.max_drawdown),
+            'max_drawdown_pct': self.max_drawdown_pct,
+            'max_drawdown_duration_s': self.max_drawdown_duration / 1e9,
+            'exposure': self.bars_in_market / self.rows if self.rows else 0.0,
+            'max_position': int(self.max_position),
+        }
+
+    def trade_ledger(self) -> np.ndarray:
+        return np.array(self.trades, dtype=TRADE_DTYPE)
+
+    def equity_curve(self) -> np.ndarray:
+        curve = np.empty(self.rows, dtype=EQUITY_DTYPE)
+        for name, column in self.columns.items():
+            curve[name] = column[:self.rows]
+        return curve
+
     def set_1s_buff(self, buff_data):
         self.data_1s_buff = buff_data
 
@@ -74,4 +239,3 @@ class Bkresult:
 
     def get_1min_buff(self):
         return self.data_1min_buff
-
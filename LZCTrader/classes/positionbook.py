@@ -0,0 +1,53 @@
+import threading
+from LZCTrader.classes.order import Order
+
+
+class PositionBook:
+    """Positions of every strategy and instrument, kept from the fills of the orders their bots submit.
+
+    When several strategies trade one account, the broker only knows the
+    sum of their positions. The book attributes the filled volume of every
+    order to the strategy whose bot sent it, so each strategy's share is
+    known without asking the broker.
+    """
+
+    def __init__(self) -> None:
+        self._positions = {}  # (strategy, instrument) -> [多仓, 空仓]
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"PositionBook ({len(self._positions)} positions)"
+
+    def record(self, strategy: str, order: Order, volume: int = None) -> None:
+        """Books a filled order (direction 2 buy / 3 sell, offset 1 open / 4 close), volume defaulting to the order's."""
+        volume = order.volume if volume is None else volume
+        with self._lock:
+            position = self._positions.setdefault((strategy, order.instrument), [0, 0])
+            if order.offset == 1:
+                position[0 if order.direction == 2 else 1] += volume
+            else:
+                # 卖平平多仓，买平平空仓；平仓量不超过该策略的持仓
+                side = 0 if order.direction == 3 else 1
+                position[side] = max(position[side] - volume, 0)
+
+    def position(self, strategy: str, instrument: str) -> dict:
+        """{'long': ..., 'short': ...} of one strategy on one instrument."""
+        with self._lock:
+            long, short = self._positions.get((strategy, instrument), (0, 0))
+        return {'long': long, 'short': short}
+
+    def positions(self, strategy: str = None) -> dict:
+        """(strategy, instrument) -> {'long': ..., 'short': ...} of the open positions, optionally of one strategy."""
+        with self._lock:
+            return {
+                key: {'long': long, 'short': short}
+                for key, (long, short) in self._positions.items()
+                if (long or short) and (strategy is None or key[0] == strategy)
+            }
+
+    def clear(self, instruments: list) -> None:
+        """Forgets every strategy's positions on the instruments, e.g. after they were flattened."""
+        instruments = set(instruments)
+        with self._lock:
+            for key in [key for key in self._positions if key[1] in instruments]:
+                del self._positions[key]
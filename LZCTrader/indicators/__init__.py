@@ -0,0 +1,16 @@
+"""Technical indicators on plain NumPy arrays.
+
+Every function takes a 1-D array of prices (e.g. candles['Close'].to_numpy())
+and returns arrays of the same length. The EMA family gives bit for bit the
+same values as finta, so strategies keep their signals while skipping the
+DataFrame round trips. The cross-sectional helpers (zscore, rank,
+long_short) work across instruments instead, on instruments x time or
+instruments x factor matrices.
+"""
+from LZCTrader.indicators.moving import ema, ema_rows, sma, rolling_mean, rolling_std
+from LZCTrader.indicators.lines import life_line, bdwz_lines, macd
+from LZCTrader.indicators.cross import zscore, rank, long_short
+from LZCTrader.indicators.cache import IndicatorCache
+
+__all__ = ['ema', 'ema_rows', 'sma', 'rolling_mean', 'rolling_std', 'life_line', 'bdwz_lines', 'macd',
+           'zscore', 'rank', 'long_short', 'IndicatorCache']
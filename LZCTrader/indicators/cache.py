@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class IndicatorCache:
+    """Bounded LRU cache of indicator results shared by every bot of a broker.
+
+    An entry is keyed on the instrument and granularity, the indicator
+    function and its parameters, and the candle window it was computed on:
+    the time of its first and last bar, the bar count and the first and last
+    close. The closes are part of the key because the newest bar may still
+    be forming in live trading. When a window with a newer last bar arrives
+    for an instrument and granularity, its older entries are dropped, since
+    no bot asks for an old bar again. Without a granularity the bar spacing
+    of the window stands in for it.
+
+    Results are returned shared and read-only.
+    """
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        """
+        Parameters
+        ----------
+        max_entries : int, optional
+            Entries kept before the least recently used ones are evicted. The default is 4096.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._keys = {}  # (instrument, granularity) -> {key: 最后一根K线时间}
+        self._latest = {}  # (instrument, granularity) -> 最新K线时间
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return f"IndicatorCache ({len(self._entries)}/{self.max_entries})"
+
+    def get(self, instrument: str, candles: pd.DataFrame, function, params: tuple = (), granularity: str = None):
+        """function(candles' Close array, *params), from the cache when the same window was seen."""
+        close = candles['Close'].to_numpy(dtype=np.float64)
+        stamps = getattr(candles.index, 'asi8', None)
+        if len(close) == 0 or stamps is None:
+            return function(close, *params)
+
+        # 不同周期的K线各自维护最新K线时间，未给出周期时以K线间隔区分
+        series = (instrument, granularity if granularity is not None else _spacing(stamps))
+        # 窗口可能是倒序的，取较晚一端作为该窗口的K线时间
+        bar = max(int(stamps[0]), int(stamps[-1]))
+        key = (series, function.__module__, function.__qualname__, tuple(params),
+               int(stamps[0]), int(stamps[-1]), len(close), float(close[0]), float(close[-1]))
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = _read_only(function(close, *params))
+
+        with self._lock:
+            latest = self._latest.get(series)
+            if latest is not None and bar < latest:
+                return result
+            if latest is None or bar > latest:
+                self._latest[series] = bar
+                self._invalidate(series, bar)
+            self._entries[key] = result
+            self._keys.setdefault(series, {})[key] = bar
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._keys[old_key[0]].pop(old_key, None)
+                self.evictions += 1
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._latest.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def _invalidate(self, series, bar):
+        keys = self._keys.get(series, {})
+        for key in [key for key, key_bar in keys.items() if key_bar < bar]:
+            del keys[key]
+            self._entries.pop(key, None)
+            self.evictions += 1
+
+
+def _spacing(stamps):
+    """Smallest gap between consecutive bars in ns, 0 for a single bar."""
+    gaps = np.abs(np.diff(stamps))
+    gaps = gaps[gaps > 0]
+    return int(gaps.min()) if len(gaps) else 0
+
+
+def _read_only(result):
+    for array in result if isinstance(result, tuple) else (result,):
+        if isinstance(array, np.ndarray):
+            array.flags.writeable = False
+    return result
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def zscore(values, axis: int = 0) -> np.ndarray:
+    """Cross-sectional z-scores, (x - mean) / std along axis, ignoring NaN.
+
+    With instruments along axis 0 every column (e.g. a factor) is
+    standardised across instruments. A slice without spread scores 0 and
+    NaN stays NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    count = np.maximum(valid.sum(axis=axis, keepdims=True), 1)
+    mean = np.where(valid, values, 0.0).sum(axis=axis, keepdims=True) / count
+    deviation = np.where(valid, values - mean, 0.0)
+    std = np.sqrt((deviation ** 2).sum(axis=axis, keepdims=True) / count)
+    scores = deviation / np.where(std > 0, std, 1.0)
+    return np.where(valid, scores, np.nan)
+
+
+def rank(values, axis: int = 0) -> np.ndarray:
+    """Cross-sectional ranks along axis, 0 for the smallest. Ties keep their order, NaN stays NaN."""
+    values = np.asarray(values, dtype=np.float64)
+    # NaN排在最后，有效值的名次为0..k-1
+    order = np.argsort(values, axis=axis, kind='stable')
+    ranks = np.argsort(order, axis=axis, kind='stable').astype(np.float64)
+    return np.where(np.isnan(values), np.nan, ranks)
+
+
+def long_short(scores, count: int = 1, axis: int = 0) -> np.ndarray:
+    """+1 for the count highest scores along axis, -1 for the count lowest, 0 otherwise.
+
+    With fewer than 2*count valid scores both sides shrink to half of them,
+    so no instrument is long and short at once. NaN scores get 0.
+    """
+    ranks = rank(scores, axis=axis)
+    valid = ~np.isnan(ranks)
+    k = valid.sum(axis=axis, keepdims=True)
+    n = np.minimum(count, k // 2)
+    side = np.where(valid & (ranks >= k - n), 1, 0) - np.where(valid & (ranks < n), 1, 0)
+    return side.astype(np.int64)
@@ -0,0 +1,33 @@
+import numpy as np
+from LZCTrader.indicators.moving import ema
+
+
+def life_line(medium_ema, period: int) -> np.ndarray:
+    """The BDWZ life line: an EMA of the medium EMA."""
+    return ema(medium_ema, period)
+
+
+def bdwz_lines(close, long_period: int, medium_period: int, short_period: int):
+    """Long, medium and short EMAs of close and the life line, as the BDWZ strategies use them.
+
+    With fewer than 2*medium_period bars the periods shrink to the data:
+    n, n//2 and n//4, and n for the life line. With fewer than 2 bars all
+    four are empty.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    if n < 2 * medium_period:
+        if n < 2:
+            empty = np.empty(0)
+            return empty, empty, empty, empty
+        long_period, medium_period, short_period, life_period = n, n // 2, n // 4, n
+    else:
+        life_period = medium_period
+    ema_medium = ema(close, medium_period)
+    return ema(close, long_period), ema_medium, ema(close, short_period), life_line(ema_medium, life_period)
+
+
+def macd(close, fast_period: int, slow_period: int, signal_period: int):
+    """MACD line (DIF, fast EMA minus slow EMA) and its signal line (DEA, an EMA of DIF)."""
+    dif = ema(close, fast_period) - ema(close, slow_period)
+    return dif, ema(dif, signal_period)
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 超过此长度时改用pandas的编译循环（仍是Series，不构造DataFrame），更短时纯Python/NumPy更快
+EMA_LOOP_MAX = 512
+ROLLING_VIEW_MAX = 4096
+
+
+def _decay(period) -> float:
+    # 与pandas ewm(span=period)相同的运算顺序，保证结果逐位一致
+    if period < 1:
+        raise ValueError("span must satisfy: span >= 1")
+    com = (period - 1) / 2.0
+    return 1. - 1. / (1. + com)
+
+
+def ema(values, period: int) -> np.ndarray:
+    """Exponential moving average, identical to finta's TA.EMA (pandas ewm(span=period, adjust=True)).
+
+    On the short windows strategies use, the recursion runs over plain
+    floats, which beats any array call; longer inputs go through pandas'
+    compiled loop. NaN inputs are skipped, with weights by absolute
+    position as in pandas.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    factor = _decay(period)
+    if len(values) > EMA_LOOP_MAX:
+        return pd.Series(values).ewm(span=period, adjust=True).mean().to_numpy()
+    out = np.empty(len(values))
+    if len(values) == 0:
+        return out
+    items = values.tolist()
+    weighted = items[0]
+    old_wt = 1.
+    out[0] = weighted
+    for i in range(1, len(items)):
+        cur = items[i]
+        if weighted == weighted:
+            old_wt *= factor
+            if cur == cur:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + cur) / (old_wt + 1.)
+                old_wt += 1.
+        elif cur == cur:
+            weighted = cur
+        out[i] = weighted
+    return out
+
+
+def ema_rows(matrix: np.ndarray, period) -> np.ndarray:
+    """ema() of every row of a matrix at once; period may differ per row.
+
+    Same recursion as ema(), one column per step, so it pays off when there
+    are many rows (e.g. every window of a backtest session).
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    rows, width = matrix.shape
+    period = np.broadcast_to(np.asarray(period, dtype=np.float64), (rows,))
+    if np.any(period < 1):
+        raise ValueError("span must satisfy: span >= 1")
+    com = (period - 1) / 2.0
+    factor = 1. - 1. / (1. + com)
+    out = np.empty_like(matrix)
+    if width == 0:
+        return out
+    weighted = matrix[:, 0].copy()
+    old_wt = np.ones(rows)
+    out[:, 0] = weighted
+    for i in range(1, width):
+        cur = matrix[:, i]
+        observed = cur == cur
+        started = weighted == weighted
+        old_wt = np.where(started, old_wt * factor, old_wt)
+        update = started & observed
+        changed = update & (weighted != cur)
+        mixed = (old_wt * weighted + cur) / (old_wt + 1.)
+        weighted = np.where(changed, mixed, np.where(~started & observed, cur, weighted))
+        old_wt = np.where(update, old_wt + 1., old_wt)
+        out[:, i] = weighted
+    return out
+
+
+def _windows(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    if window < 1:
+        raise ValueError("window must be >= 1")
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return values, out, None
+    return values, out, sliding_window_view(values, window)
+
+
+def rolling_mean(values, window: int) -> np.ndarray:
+    """Mean of the last window values, NaN until the window is full.
+
+    Matches pandas rolling(window).mean() up to rounding on short inputs and
+    exactly on long ones, which use pandas' running sums.
+    """
+    if len(values) > ROLLING_VIEW_MAX:
+        return pd.Series(values, dtype=np.float64).rolling(window).mean().to_numpy()
+    values, out, windows = _windows(values, window)
+    if windows is not None:
+        out[window - 1:] = windows.mean(axis=-1)
+    return out
+
+
+def sma(values, period: int) -> np.ndarray:
+    """Simple moving average, the same as rolling_mean."""
+    return rolling_mean(values, period)
+
+
+def rolling_std(values, window: int, ddof: int = 1) -> np.ndarray:
+    """Standard deviation of the last window values (pandas rolling(window).std(), as rolling_mean)."""
+    if len(values) > ROLLING_VIEW_MAX:
+        return pd.Series(values, dtype=np.float64).rolling(window).std(ddof=ddof).to_numpy()
+    values, out, windows = _windows(values, window)
+    if windows is not None and window > ddof:
+        out[window - 1:] = windows.std(axis=-1, ddof=ddof)
+    return out
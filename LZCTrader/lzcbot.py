@@ -1,3 +1,4 @@
+import time
 from datetime import datetime
 from LZCTrader.strategy import Strategy
 from LZCTrader.classes.order import Order
@@ -25,16 +26,27 @@ class LZCBot:
         self.instrument = strategy.instrument
         self.broker = strategy.broker
         self.strategy = strategy
-        self.run_thread = None
         self.stop_flag = None
-        self.stop_thread = None
+        self.stop_times = []
         self.backtest_thread = None
+        self.profiler = None
+        # 实盘中由LZCTrader设置：策略名、运行间隔（秒）和按策略归属持仓的账本
+        self.strategy_name = None
+        self.interval = None
+        self.position_book = None
 
     def __repr__(self):
         if isinstance(self.instrument, list):
             return "Portfolio LZCTraderBot"
         else:
-            return f"{self.instrument} LZCTraderBot"
+            return f"{self.label} LZCTraderBot"
+
+    @property
+    def label(self) -> str:
+        """The instrument, prefixed with the strategy name when the bot has one (e.g. 'mabd/rb2510')."""
+        if self.strategy_name is None:
+            return str(self.instrument)
+        return f"{self.strategy_name}/{self.instrument}"
 
     def __str__(self):
         return "LZCTraderBot instance"
@@ -47,11 +59,18 @@ class LZCBot:
         timestamp : datetime, optional
             The current update time.
         """
+        profiler = self.profiler
+        if profiler is not None:
+            tick = profiler.begin()
         try:
             strategy_orders = self.strategy.generate_signal(timestamp)
         except Exception as e:
             print(f"Error when updating strategy: {e}")
+            if profiler is not None:
+                profiler.exception(self.label, e)
             strategy_orders = []
+        if profiler is not None:
+            tick.signal_end = time.perf_counter()
 
         # Check and qualify orders
         orders = strategy_orders
@@ -68,10 +87,24 @@ class LZCBot:
                     )
                 except Exception as e:
                     print(f"LZCTrader exception when submitting order: {e}")
+                    if profiler is not None:
+                        profiler.exception(self.label, e)
+
+        if profiler is not None:
+            profiler.end(self.label, tick, self.interval)
+
+    def set_profiler(self, profiler) -> None:
+        """Enables per-stage timing of update() with a StageProfiler."""
+        self.profiler = profiler
+        profiler.instrument(self.strategy)
 
     def reset(self):
         self.strategy.reset()
 
     def submit_order(self, order: Order):
         "The default order execution method."
-        self.broker.place_order(order)
+        order_id = self.broker.place_order(order)
+        if self.position_book is not None:
+            # 按实际成交量记账，被拒或未成交的委托不计入策略持仓
+            self.broker.on_filled(order, order_id,
+                                  lambda volume: self.position_book.record(self.strategy_name, order, volume))
@@ -1,18 +1,36 @@
 import os
 import sys
 import time
+import math
+import queue
+import traceback
 from tqdm import tqdm
 import threading
 import importlib
 import importlib.util
+import numpy as np
 import pandas as pd
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
 from pathlib import Path
 from LZCTrader.classes.bkresult import Bkresult
+from LZCTrader.classes.positionbook import PositionBook
 from datetime import datetime, timedelta, time as dt_time
 from LZCTrader.tools.utilities import read_yaml, extract_letters, extract_hours_from_ranges, get_trading_hours
+from LZCTrader.tools.recorder import MarketRecorder
+from LZCTrader.tools.journal import TradeJournal
+from LZCTrader.tools.resultstore import ResultStore
+from LZCTrader.tools.analytics import analyze
+from LZCTrader.tools.profiler import StageProfiler
+from LZCTrader.tools.vectorized import step_grid
+from LZCTrader.indicators import IndicatorCache
 from brokers.futures import Futures
 from brokers.backtest import Backtest
+from brokers.replay import Replay
 from LZCTrader.lzcbot import LZCBot
+from LZCTrader.strategy import PortfolioStrategy
+from LZCTrader.scheduler import BotScheduler, SessionCloseScheduler
 
 
 class LZCTrader:
@@ -47,19 +65,33 @@ class LZCTrader:
         self.trade_type = ''
         self.across = False
         self.strategy_config = {}
+        self.strategy_name = None
         self.preliminary_config = {}
         self.strategy_timestep = None
         self.preliminary_select = None
         self.strategy_class = None
+        self.strategies = []  # set_strategy加载的全部策略
+        self.position_book = PositionBook()
         self.fake_time = datetime.min
         self.bot_list = []
         self.fc_code = ''
-        self.timer_thread = None
         self.market_time_type = None
         self.backtest_start_time = None
         self.backtest_end_time = None
         self.backtest_min_granularity = None
         self.backtest_start_balance = 0
+        self.backtest_vectorized = True
+        self.replay_start_time = None
+        self.replay_end_time = None
+        self.replay_speed = 0
+        self.max_workers = 8
+        self.scheduler = None
+        self.recorder = None
+        self.journal = None
+        self.indicator_cache = None
+        self.warm_start = True
+        self.profile = False
+        self.profiler = None
         self.lock = threading.Lock()
 
         self.root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -81,10 +113,22 @@ class LZCTrader:
         account: str = '',
         password: str = '',
         trade_type: str = 'within',
+        api_base_url: str = '',
         backtest_start_time: str = '',
         backtest_end_time: str = '',
         backtest_min_granularity: str = '1s',
-        backtest_start_balance: int = 0
+        backtest_start_balance: int = 0,
+        backtest_offline: bool = False,
+        backtest_vectorized: bool = True,
+        max_workers: int = 8,
+        record_market_data: bool = False,
+        indicator_cache_size: int = 4096,
+        warm_start: bool = True,
+        profile: bool = False,
+        replay_dir: str = '',
+        replay_start_time: str = '',
+        replay_end_time: str = '',
+        replay_speed: float = 0
     ) -> None:
         """Configures run settings for LZCTrader.
 
@@ -92,9 +136,10 @@ class LZCTrader:
         ----------
         broker_name : str, optional
             The broker(s) to connect to for trade execution. The default is 'futures'.
+            Use 'replay' to run recorded sessions.
 
         mode : str, necessary
-            The trading mode of the system. There are 'backtest', 'virtualtrading', 'realtrading'.
+            The trading mode of the system. There are 'backtest', 'virtualtrading', 'realtrading', 'replay'.
 
         enter_license:str,necessary
             The license of yours.
@@ -108,6 +153,11 @@ class LZCTrader:
         trade_type : str, optional
             Whether the trade across days or within a day. There are 'across' and 'within'. The default is 'within'.
 
+        api_base_url : str, optional
+            Base URL of the market-data and trading API, e.g. a local
+            simulator started with `python -m LZCTrader.tools.simserver`.
+            The default is '' (the official services).
+
         backtest_start_time : str, optional
            Backtest start time, the format is like '1/1/2025'. The default is ''.
 
@@ -120,6 +170,54 @@ class LZCTrader:
          backtest_start_balance : int, optional
             Backtest start_balance. The default is 0.
 
+        backtest_offline : bool, optional
+            Whether to backtest only on the local store (home_dir/store, filled
+            by import_history.py) without connecting to the data API. The default is False.
+
+        backtest_vectorized : bool, optional
+            Whether to backtest strategies that implement session_orders a
+            whole session at a time on days in the local store. Other days
+            and strategies run step by step. The default is True.
+
+        max_workers : int, optional
+            Size of the worker pool that runs live strategy updates. The
+            thread count stays fixed however long the watchlist is. The
+            default is 8.
+
+        record_market_data : bool, optional
+            Whether to record every tick and candle received in live trading
+            to compressed segment files under home_dir/record. The default is False.
+
+        indicator_cache_size : int, optional
+            Entries of the indicator cache shared by all bots, so strategies
+            running on the same instrument compute each indicator once per
+            candle window. 0 disables it. The default is 4096.
+
+        warm_start : bool, optional
+            Whether to fetch the history of every bot's candle windows before
+            the open (live and replay). Windows requested with cut_yesterday
+            are then filled from the previous session until the new one has
+            enough candles, so signals are fully formed from the first
+            update. The default is True.
+
+        profile : bool, optional
+            Whether to time every bot update by stage (data fetch, indicators,
+            signal, orders) and count exceptions by type. A summary with
+            p50/p95/p99 is printed when the run ends. The default is False.
+
+        replay_dir : str, optional
+            The recording to replay. The default is home_dir/record.
+
+        replay_start_time : str, optional
+            Start of the replayed session, the format is like '1/7/2025 21:00'. The default is ''.
+
+        replay_end_time : str, optional
+            End of the replayed session, the format is like '2/7/2025 02:30'. The default is ''.
+
+        replay_speed : float, optional
+            Upper bound of virtual seconds per real second. 0 replays as fast
+            as the strategies run. The default is 0.
+
         Returns
         -------
         None
@@ -130,6 +228,9 @@ class LZCTrader:
         self.account = account
         self.password = password
         self.trade_type = trade_type
+        self.max_workers = max_workers
+        self.profile = profile
+        self.warm_start = warm_start
 
         if self.trade_type == 'within':
             self.across = False
@@ -142,7 +243,7 @@ class LZCTrader:
             self.fc_code = 'rh'
         elif self.mode == 'virtualtrading':
             self.fc_code = 'simnow'
-        elif self.mode == 'backtest':
+        elif self.mode in ('backtest', 'replay'):
             self.fc_code = ''
         else:
             raise ValueError("Invalid mode")
@@ -153,12 +254,20 @@ class LZCTrader:
             self.backtest_start_time = datetime.strptime(backtest_start_time, '%d/%m/%Y')
             self.backtest_end_time = datetime.strptime(backtest_end_time, '%d/%m/%Y')
             self.backtest_start_balance = int(backtest_start_balance)
+            self.backtest_vectorized = backtest_vectorized
             supported_backtest_min_granularity = ['0.5s', '1s', '5s', '1min', '1h']
             if backtest_min_granularity not in supported_backtest_min_granularity:
                 raise ValueError("Unsupported granularity")
             self.backtest_min_granularity = backtest_min_granularity
 
-        supported_brokers = ['futures', 'backtest']
+        if self.mode == 'replay':
+            if replay_start_time == '' or replay_end_time == '':
+                raise ValueError("No replay start time or end time")
+            self.replay_start_time = datetime.strptime(replay_start_time, '%d/%m/%Y %H:%M')
+            self.replay_end_time = datetime.strptime(replay_end_time, '%d/%m/%Y %H:%M')
+            self.replay_speed = float(replay_speed)
+
+        supported_brokers = ['futures', 'backtest', 'replay']
         if self.broker_name not in supported_brokers:
             raise ValueError("Unsupported broker")
         if self.broker_name == 'futures':
@@ -166,22 +275,55 @@ class LZCTrader:
                 enter_license=self.license,
                 fc_code=self.fc_code,
                 account=self.account,
-                password=self.password
+                password=self.password,
+                base_url=api_base_url or None
+            )
+            if record_market_data:
+                self.recorder = MarketRecorder(os.path.join(self.root_dir, "record"))
+                self.broker.set_recorder(self.recorder)
+        elif self.broker_name == 'replay':
+            if self.mode != 'replay':
+                raise ValueError("Replay broker requires replay mode")
+            self.broker = Replay(
+                record_dir=replay_dir or os.path.join(self.root_dir, "record"),
+                session_start=self.replay_start_time
             )
         else:
-            self.broker = Backtest(enter_license=self.license)
+            self.broker = Backtest(
+                enter_license=self.license,
+                store_dir=os.path.join(self.root_dir, "store"),
+                offline=backtest_offline,
+                base_url=api_base_url or None
+            )
+
+        if indicator_cache_size > 0:
+            self.indicator_cache = IndicatorCache(max_entries=indicator_cache_size)
+            self.broker.set_indicator_cache(self.indicator_cache)
+
+        # 实盘和回放中策略的交易记录由后台线程批量写入root_dir下的结果文件；回测的成交记录保存在ResultStore中
+        if self.mode != 'backtest':
+            if self.mode == 'replay':
+                self.journal = TradeJournal(self.root_dir, order_book=os.path.join("result", "replay_order_book.txt"))
+            else:
+                self.journal = TradeJournal(self.root_dir)
+            self.broker.set_journal(self.journal)
 
     def set_strategy(
         self,
-        strategy_config_filename: str = None
+        strategy_config_filename: Union[str, list] = None
     ) -> None:
-        """Adds a strategy to LZCTrader.
+        """Adds a strategy, or several strategies, to LZCTrader.
 
         Parameters
         ----------
-        strategy_config_filename : str, optional
+        strategy_config_filename : str or list, optional
             The prefix of the yaml strategy configuration file, located in
-            home_dir/strategies_config. The default is None.
+            home_dir/strategies_config, or a list of prefixes to run several
+            strategies in one process. They share the broker connection, its
+            market data and the indicator cache; every strategy gets a bot
+            per instrument of its WATCHLIST, updated at its own INTERVAL,
+            and the positions of each are kept apart in position_book. The
+            default is None.
 
         Returns
         -------
@@ -194,6 +336,29 @@ class LZCTrader:
             minutes / minute / min / m
             seconds / second / sec / s
 
+        """
+        filenames = [strategy_config_filename] if isinstance(strategy_config_filename, str) else list(strategy_config_filename)
+        if len(set(filenames)) != len(filenames):
+            print("Each strategy configuration can only be added once.")
+            sys.exit(0)
+        self.strategies = [self.load_strategy(filename) for filename in filenames]
+
+        # 单策略时的原有属性指向第一个策略；调度精度按最短的运行间隔
+        first = self.strategies[0]
+        self.strategy_config = first['config']
+        self.strategy_class = first['class']
+        self.strategy_name = first['name']
+        self.strategy_timestep = min(strategy['timestep'] for strategy in self.strategies)
+        if self.profile:
+            # 超时按各bot自己策略的运行间隔计算，此处只是未设置间隔的bot的默认值
+            self.profiler = StageProfiler(interval=self.strategy_timestep)
+
+    def load_strategy(
+        self,
+        strategy_config_filename: str
+    ) -> dict:
+        """
+        Load one strategy of home_dir/strategies as {'name', 'class', 'config', 'timestep'}.
         """
         config_file_path = os.path.join(
             self.root_dir, "strategies_config", strategy_config_filename
@@ -218,9 +383,6 @@ class LZCTrader:
             print(f"Error parsing time interval '{strategy_config['INTERVAL']}': {str(e)}")
             sys.exit(1)
 
-        self.strategy_config = strategy_config
-        self.strategy_timestep = granularity.total_seconds()
-
         # 策略文件路径
         strategies_file_path = os.path.join(self.root_dir, "strategies", strategy_config_filename)
         strategy_module_name = Path(strategy_config_filename).stem  # 去除扩展名得到模块名
@@ -241,14 +403,21 @@ class LZCTrader:
                 raise AttributeError(f"Class '{class_name}' not found in module '{strategy_module_name}'")
 
             strategy_class = getattr(strategy_module, class_name)
-
-            # 实例化策略
-            self.strategy_class = strategy_class
+            # 实盘按品种逐个建bot，组合策略暂只支持回测
+            if issubclass(strategy_class, PortfolioStrategy):
+                raise ValueError(f"Portfolio strategy '{class_name}' can only be backtested")
 
         except Exception as e:
             print(f"Error initializing strategy: {str(e)}")
             sys.exit(1)
 
+        return {
+            'name': strategy_config_filename,
+            'class': strategy_class,
+            'config': strategy_config,
+            'timestep': granularity.total_seconds(),
+        }
+
     def set_backtest_strategy(
         self,
         strategy_config_filename: str = None
@@ -269,6 +438,7 @@ class LZCTrader:
                 sys.exit(0)
 
         self.strategy_config = strategy_config
+        self.strategy_name = strategy_config_filename
 
         # 策略文件路径
         strategy_module_name = Path(strategy_config_filename).stem  # 去除扩展名得到模块名
@@ -356,128 +526,345 @@ class LZCTrader:
         self
     ) -> None:
         """
-        Run LZCTrader.
+        Run LZCTrader for the current session.
         """
-        current_time = datetime.now().hour
-        if 7 < current_time < 16:
-            self.market_time_type = 'morning'
-        elif current_time > 19 or current_time < 4:
-            self.market_time_type = 'night'
-        else:
+        session = self.current_session(datetime.now())
+        if session is None:
             raise ValueError("Invalid trade time")
+        self.trade_session(*session)
 
-        watchlist = self.strategy_config['WATCHLIST']
-        tradelist = self.preliminary_select.generate_tradelist(watchlist)
-        for instrument in tradelist:
-            instrument_type = extract_letters(instrument)
-            try:
-                instrument_config = self.instrument_map[f'{instrument_type}']
-            except KeyError:
-                raise ValueError("Unsupported instrument")
-            exchange = instrument_config['exchange']
-            morning = instrument_config['morning']
-            night = instrument_config['night']
-            stop = instrument_config['stop']
-            point_change = instrument_config['pointChange']
+        if self.recorder is not None:
+            self.recorder.close()
+        self.journal.close()
+        print("EXIT SYSTEM")
+        sys.exit(0)
 
-            if self.market_time_type == 'morning':
-                if not morning:
-                    continue
-            else:
-                if not night:
+    def daemon(
+        self,
+        warmup: float = 120
+    ) -> None:
+        """
+        Trade every session from one resident process, instead of starting run.py for each.
+
+        The broker connection, the strategy modules and the market-data and
+        indicator caches stay warm between sessions. warmup seconds before
+        each open the login is checked and the bots are built, their history
+        is preloaded just before the open and they start trading at the open
+        to the second. A session already running when the daemon starts is
+        joined immediately. A session whose connection or login cannot be
+        restored is skipped, and an error in one session is logged without
+        stopping the daemon. Stop it with Ctrl+C.
+        """
+        last_open = None
+        try:
+            while True:
+                now = datetime.now()
+                session = self.current_session(now)
+                if session is None or session[1] == last_open:
+                    session_open = self.next_session_open(now)
+                    print(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] Next session opens at {session_open.strftime('%Y-%m-%d %H:%M:%S')}")
+                    self.sleep_until(session_open.timestamp() - warmup)
+                    session = ('morning' if session_open.hour < 16 else 'night', session_open)
+
+                # 无论成败，同一交易时段只尝试一次
+                last_open = session[1]
+                stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                # 开盘前预热：确认推送流和登录仍有效（断开则重连重登），再建bot、预取行情，准点开始交易
+                if not self.broker.relog():
+                    print(f"[{stamp}] !!! Broker connection or login could not be restored, "
+                          f"SKIPPING the {session[0]} session opening at {session[1].strftime('%Y-%m-%d %H:%M:%S')} !!!")
                     continue
+                try:
+                    self.trade_session(*session)
+                except Exception:
+                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {session[0]} session opening at "
+                          f"{session[1].strftime('%Y-%m-%d %H:%M:%S')} failed:")
+                    traceback.print_exc()
+        except KeyboardInterrupt:
+            print("Daemon stopped")
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+            self.journal.close()
+
+    @staticmethod
+    def current_session(now: datetime):
+        """(market_time_type, session open) of the weekday session running at now (or about to open), or None."""
+        if 7 < now.hour < 16:
+            session = 'morning', now.replace(hour=9, minute=0, second=0, microsecond=0)
+        elif now.hour > 19:
+            session = 'night', now.replace(hour=21, minute=0, second=0, microsecond=0)
+        elif now.hour < 4:
+            # 凌晨属于前一天21点开盘的夜盘
+            session = 'night', (now - timedelta(days=1)).replace(hour=21, minute=0, second=0, microsecond=0)
+        else:
+            return None
+        return session if session[1].weekday() < 5 else None
+
+    @staticmethod
+    def next_session_open(now: datetime) -> datetime:
+        """The next morning (9:00) or night (21:00) open after now on a weekday."""
+        day = now.date()
+        while True:
+            for hour in (9, 21):
+                session_open = datetime.combine(day, dt_time(hour=hour))
+                if session_open > now and session_open.weekday() < 5:
+                    return session_open
+            day += timedelta(days=1)
+
+    @staticmethod
+    def sleep_until(timestamp: float) -> None:
+        # 分段休眠，长时间等待不受系统时钟调整影响
+        while True:
+            delta = timestamp - time.time()
+            if delta <= 0:
+                return
+            time.sleep(min(delta, 60))
+
+    def trade_session(
+        self,
+        market_time_type: str,
+        session_open: datetime
+    ) -> None:
+        """
+        Trade one session: build the bots, start them at session_open (or now if later) and wait until all of them stopped.
+        """
+        self.market_time_type = market_time_type
+        self.bot_list = []
+        self.scheduler = BotScheduler(max_workers=self.max_workers)
+        close_scheduler = SessionCloseScheduler(on_close=self.scheduler.stop_bot)
 
-            bot = LZCBot(
-                strategy=self.strategy_class(instrument=instrument,
-                                             exchange=exchange,
-                                             point_change=point_change,
-                                             parameters=self.strategy_config['PARAMETERS'],
-                                             broker=self.broker)
-            )
-            bot.run_thread = threading.Thread(target=self.real_loop, args=(bot,))
-            bot.stop_flag = threading.Event()
-            bot.stop_thread = threading.Thread(target=self.start_market_status_timer, args=(stop, bot))
+        # 并行构建所有策略：每个策略的每个品种一个bot，共用同一个broker
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            built = list(executor.map(lambda job: self.build_bot(*job), self.bot_jobs()))
 
-            time.sleep(0.2)
-            bot.run_thread.start()
-            bot.stop_thread.start()
-            self.bot_list.append(bot)
+        for bot in built:
+            if bot is not None:
+                self.bot_list.append(bot)
 
-        # 首先收集所有需要等待的线程
-        threads_to_wait = {bot.run_thread for bot in self.bot_list}
+        # 开盘前一次取回所有bot所需窗口的历史，指标从第一次运行起即完整
+        preload_requests = self.history_requests()
+        if self.warm_start:
+            self.broker.warm_up(preload_requests)
 
-        while threads_to_wait:
-            # 获取当前所有存活线程
-            alive_threads = set(threading.enumerate())
-            # 找出已经结束的线程
-            finished_threads = threads_to_wait - alive_threads
+        # 所有bot在同一时刻开始交易：开盘时刻，若已开盘则为预取完成后
+        start_at = max(session_open.timestamp(), time.time() + 1)
+        self.sleep_until(start_at - 1)
 
-            # 处理已结束的线程
-            for thread in finished_threads:
-                # 找到对应的bot
-                for bot in self.bot_list:
-                    if bot.run_thread is thread:
-                        if not self.across:
-                            self.broker.clear_positions(bot.instrument)
-                            time.sleep(1)
-                            print(f"Bot {bot.instrument} killed")
-                        break
-                threads_to_wait.remove(thread)
+        # 一次性预取所有bot首次运行所需的行情窗口
+        self.broker.preload_candles(preload_requests, valid_until=start_at + self.strategy_timestep)
+        start_at = max(start_at, time.time())
 
-            # 避免忙等待
-            if threads_to_wait:
-                time.sleep(0.1)  # 短暂休眠减少CPU占用
+        for bot in self.bot_list:
+            self.scheduler.add_bot(bot, bot.interval, self.fake_time, start_at=start_at)
+            close_scheduler.add(bot, bot.stop_times)
 
-        print("EXIT SYSTEM")
-        sys.exit(0)
+        self.scheduler.start()
+        close_scheduler.start()
+        print(f"Session close monitor RUNNING for {len(self.bot_list)} bots")
 
-    def real_loop(
+        flattened = set()
+        completed = False
+        try:
+            # 等待调度器报告已停止的bot；同一时刻收盘的bot一起批量平仓，品种的全部bot都停止后才平该品种
+            remaining = len(self.bot_list)
+            running = Counter(bot.instrument for bot in self.bot_list)
+            while remaining:
+                stopped = [self.scheduler.finished.get()]
+                while True:
+                    try:
+                        stopped.append(self.scheduler.finished.get(timeout=0.5))
+                    except queue.Empty:
+                        break
+                remaining -= len(stopped)
+                running.subtract(bot.instrument for bot in stopped)
+                closed = [bot.instrument for bot in stopped if running[bot.instrument] == 0]
+                if not self.across and closed:
+                    self.broker.flatten_all(closed)
+                    self.position_book.clear(closed)
+                    flattened.update(closed)
+                for bot in stopped:
+                    print(f"Bot {bot.label} killed")
+            for (strategy, instrument), position in self.position_book.positions().items():
+                print(f"{strategy} holds {instrument}: long {position['long']}, short {position['short']}")
+            completed = True
+        finally:
+            # 出错时也停掉本时段的所有bot，常驻进程中它们不能带到下一个交易时段
+            for bot in self.bot_list:
+                self.scheduler.stop_bot(bot)
+            close_scheduler.shutdown()
+            self.scheduler.shutdown()
+            if not completed and not self.across:
+                self.flatten_after_error([bot.instrument for bot in self.bot_list if bot.instrument not in flattened])
+            self.journal.flush()
+        for instrument, stats in self.scheduler.report().items():
+            if stats['missed_ticks']:
+                print(f"Bot {instrument} missed {stats['missed_ticks']} tick(s), "
+                      f"max lateness {stats['max_lateness']:.3f}s")
+
+        for stage, stats in self.broker.latency_summary().items():
+            if stats['count']:
+                print(f"Order {stage} latency: n={stats['count']} p50={stats['p50']}ms "
+                      f"p95={stats['p95']}ms p99={stats['p99']}ms max={stats['max']:.1f}ms")
+        # 下一个交易时段重新统计，并丢弃已结束委托的记录
+        self.broker.reset_latency()
+
+        if self.profiler is not None:
+            self.profiler.print_report()
+            if self.indicator_cache is not None:
+                stats = self.indicator_cache.stats()
+                print(f"Indicator cache: {stats['hits']} hits, {stats['misses']} misses "
+                      f"({stats['hit_rate']:.1%}), {stats['evictions']} evicted")
+
+    def flatten_after_error(self, instruments: list) -> None:
+        """Best-effort flatten of the instruments a failed session had not closed yet, warning loudly about what is still held."""
+        instruments = list(dict.fromkeys(instruments))
+        if not instruments:
+            return
+        try:
+            held = list(self.broker.flatten_all(instruments))
+        except Exception as e:
+            print(f"Flattening after the failed session raised: {e}")
+            held = instruments
+        self.position_book.clear([instrument for instrument in instruments if instrument not in held])
+        if held:
+            print(f"!!! Session failed and positions may still be held in {', '.join(held)}, CHECK THEM !!!")
+
+    def history_requests(self) -> list:
+        """(instrument, granularity, count) of the candle windows every bot fetches on an update."""
+        return [
+            (bot.instrument, granularity, count)
+            for bot in self.bot_list
+            for granularity, count in bot.strategy.history_requests()
+        ]
+
+    def bot_jobs(self) -> list:
+        """(instrument, strategy) of every bot to build: each strategy's tradelist from its WATCHLIST."""
+        return [
+            (instrument, strategy)
+            for strategy in self.strategies
+            for instrument in self.preliminary_select.generate_tradelist(strategy['config']['WATCHLIST'])
+        ]
+
+    def build_bot(
         self,
-        bot: LZCBot
-    ) -> None:
+        instrument: str,
+        strategy: dict = None
+    ) -> LZCBot:
         """
-        Run real trade loop.
+        Build the bot of one instrument and strategy (by default the first one set), or None if it does not trade in the current session.
         """
-        while not bot.stop_flag.is_set():
-            bot.update(self.fake_time)
-            time.sleep(self.strategy_timestep)
-
-    def start_market_status_timer(self, stoptime: list, bot: LZCBot):
-        """Start market monitor"""
-
-        def timer_loop():
-            # target_times = [(14, 57), (22, 57)]
-            target_times = stoptime
-
-            while True:
-                now = datetime.now()
-                weekday = now.weekday()  # 周一=0，周日=6
-
-                if weekday < 5:  # 周一到周五
-                    for target_hour, target_min in target_times:
-                        target_time = now.replace(hour=target_hour, minute=target_min, second=0, microsecond=0)
-
-                        if target_time < now:
-                            target_time += timedelta(days=1)
-                        time_diff = (now - target_time).total_seconds()
-                        if abs(time_diff) < 60:
-                            try:
-                                #self.stop_flag.set()
-                                bot.stop_flag.set()
-                                print(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] Closing BOT")
-                                time.sleep(80)
-                            except AttributeError:
-                                print("ERROR when closing market")
-                else:
-                    time.sleep(3600)  # 周末休眠1小时
-                    continue
+        if strategy is None:
+            strategy = self.strategies[0]
+        instrument_type = extract_letters(instrument)
+        try:
+            instrument_config = self.instrument_map[f'{instrument_type}']
+        except KeyError:
+            raise ValueError("Unsupported instrument")
+        exchange = instrument_config['exchange']
+        morning = instrument_config['morning']
+        night = instrument_config['night']
+        stop = instrument_config['stop']
+        point_change = instrument_config['pointChange']
+
+        if self.market_time_type == 'morning':
+            if not morning:
+                return None
+        else:
+            if not night:
+                return None
+
+        bot = LZCBot(
+            strategy=strategy['class'](instrument=instrument,
+                                       exchange=exchange,
+                                       point_change=point_change,
+                                       parameters=strategy['config']['PARAMETERS'],
+                                       broker=self.broker)
+        )
+        bot.stop_flag = threading.Event()
+        bot.stop_times = stop
+        bot.interval = strategy['timestep']
+        bot.strategy_name = strategy['name']
+        bot.position_book = self.position_book
+        if self.profiler is not None:
+            bot.set_profiler(self.profiler)
+        return bot
+
+    def replay(
+        self
+    ) -> dict:
+        """
+        Replay a recorded session through the live strategy classes.
 
-                time.sleep(30)  # 检查间隔
+        Every bot is updated once per strategy interval of virtual time, the
+        bots of one step concurrently, and the clock only moves on once all
+        of them are done. Bots stop at their instruments' session close (or
+        at replay_end_time) and are flattened there unless trading across
+        days. Returns the replay broker's summary.
+        """
+        start = self.replay_start_time
+        if 7 < start.hour < 16:
+            self.market_time_type = 'morning'
+        else:
+            self.market_time_type = 'night'
 
-        # 启动线程（daemon=True 确保主进程退出时线程自动终止）
-        self.timer_thread = threading.Thread(target=timer_loop, daemon=True)
-        self.timer_thread.start()
-        print(f"Bot {bot.instrument} monitor RUNNING")
+        self.bot_list = [bot for bot in (self.build_bot(*job) for job in self.bot_jobs()) if bot is not None]
+        if self.warm_start:
+            self.broker.warm_up(self.history_requests())
+
+        # 每个bot在其品种收盘时停止
+        stop_at = {
+            bot: min([self.replay_end_time] + [SessionCloseScheduler.next_close(stop_time, start)
+                                               for stop_time in bot.stop_times])
+            for bot in self.bot_list
+        }
+        # 虚拟时钟按各策略运行间隔的最大公约数前进，每个bot只在自己的间隔上更新
+        periods = {bot: max(int(round(bot.interval * 1000)), 1) for bot in self.bot_list}
+        step_ms = math.gcd(*periods.values()) if periods else int(self.strategy_timestep * 1000)
+        step = timedelta(milliseconds=step_ms)
+        active = list(self.bot_list)
+        current_dt = start
+        wall_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while active:
+                self.broker.set_time(current_dt)
+                closing = [bot for bot in active if current_dt >= stop_at[bot]]
+                if closing:
+                    active = [bot for bot in active if bot not in closing]
+                    trading = {bot.instrument for bot in active}
+                    closed = [bot.instrument for bot in closing if bot.instrument not in trading]
+                    if not self.across and closed:
+                        self.broker.flatten_all(closed)
+                        self.position_book.clear(closed)
+                    for bot in closing:
+                        print(f"[{current_dt.strftime('%Y-%m-%d %H:%M:%S')}] Closing BOT {bot.label}")
+
+                elapsed_ms = int(round((current_dt - start).total_seconds() * 1000))
+                due = [bot for bot in active if elapsed_ms % periods[bot] == 0]
+                list(executor.map(lambda bot: bot.update(current_dt), due))
+
+                current_dt += step
+                if self.replay_speed > 0:
+                    # 虚拟时钟最快为真实时间的replay_speed倍
+                    ahead = (current_dt - start).total_seconds() / self.replay_speed - (time.perf_counter() - wall_start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+        elapsed = time.perf_counter() - wall_start
+        print(f"Replayed {(current_dt - start).total_seconds():.0f}s of market time in {elapsed:.1f}s")
+        self.journal.flush()
+        if self.profiler is not None:
+            self.profiler.print_report()
+            if self.indicator_cache is not None:
+                stats = self.indicator_cache.stats()
+                print(f"Indicator cache: {stats['hits']} hits, {stats['misses']} misses "
+                      f"({stats['hit_rate']:.1%}), {stats['evictions']} evicted")
+        summary = self.broker.summary()
+        for instrument, stats in summary.items():
+            print(f"{instrument}-trades:{stats['trades']}-profit:{stats['points']}-position:{stats['position']}")
+        print("EXIT SYSTEM")
+        return summary
 
     def backtest(
             self
@@ -488,6 +875,8 @@ class LZCTrader:
         morning_start = (9, 1)
         night_start = (21, 1)
         bkresult_list = []
+        portfolio = issubclass(self.strategy_class, PortfolioStrategy)
+        universe = {}  # 组合策略：instrument -> (exchange, point_change, daily_test_time)
 
         testlist = self.strategy_config['BACKTESTLIST']
 
@@ -507,11 +896,11 @@ class LZCTrader:
             if morning and not night:
                 if len(stop) != 1:
                     raise ValueError("Stop time not matched")
-                daily_test_time = [morning_start, stop]
+                daily_test_time = [morning_start, stop[0]]
             elif night and not morning:
                 if len(stop) != 1:
                     raise ValueError("Stop time not matched")
-                daily_test_time = [night_start, stop]
+                daily_test_time = [night_start, stop[0]]
             elif morning and night:
                 if len(stop) != 2:
                     raise ValueError("Stop time not matched")
@@ -520,6 +909,10 @@ class LZCTrader:
                 raise ValueError("Invalid trade configuration")
 
             bkresult = Bkresult(instrument=instrument, balance=self.backtest_start_balance, value_per_point=pervalue, point_change=point_change)
+            bkresult_list.append(bkresult)
+            if portfolio:
+                universe[instrument] = (exchange, point_change, daily_test_time)
+                continue
 
             bot = LZCBot(
                 strategy=self.strategy_class(instrument=instrument,
@@ -529,11 +922,27 @@ class LZCTrader:
                                              broker=self.broker)
             )
             bot.backtest_thread = threading.Thread(target=self.backtest_loop, args=(bot, daily_test_time))
-            bot.backtest_thread.start()
             self.bot_list.append(bot)
-            bkresult_list.append(bkresult)
 
+        # 组合策略只建一个bot，统一按时间步推进全部品种
+        if portfolio:
+            schedules = {tuple(map(tuple, item[2])) for item in universe.values()}
+            if len(schedules) != 1:
+                raise ValueError("Portfolio instruments must share the same trading sessions")
+            bot = LZCBot(
+                strategy=self.strategy_class(instruments=list(universe),
+                                             exchanges={key: item[0] for key, item in universe.items()},
+                                             point_changes={key: item[1] for key, item in universe.items()},
+                                             parameters=self.strategy_config['PARAMETERS'],
+                                             broker=self.broker)
+            )
+            bot.backtest_thread = threading.Thread(target=self.backtest_loop, args=(bot, next(iter(universe.values()))[2]))
+            self.bot_list.append(bot)
+
+        # 先登记所有品种的结果对象，再启动回测线程
         self.broker.set_bklist(bkresult_list)
+        for bot in self.bot_list:
+            bot.backtest_thread.start()
 
         # 首先收集所有需要等待的线程
         threads_to_wait = {bot.backtest_thread for bot in self.bot_list}
@@ -549,11 +958,10 @@ class LZCTrader:
                 # 找到对应的bot
                 for bot in self.bot_list:
                     if bot.backtest_thread is thread:
-                        ins = bot.instrument
+                        instruments = bot.instrument if isinstance(bot.instrument, list) else [bot.instrument]
                         for bkresult in bkresult_list:
-                            if bkresult.instrument == ins:
+                            if bkresult.instrument in instruments:
                                 print(f'{bkresult.instrument}-balance:{bkresult.balance}-profit:{bkresult.point}')
-                                break
                     break
                 threads_to_wait.remove(thread)
 
@@ -561,6 +969,8 @@ class LZCTrader:
             if threads_to_wait:
                 time.sleep(0.1)  # 短暂休眠减少CPU占用
 
+        run_id = self.save_backtest_results(bkresult_list)
+        print(f"Backtest results saved as run {run_id}")
         print("EXIT SYSTEM")
         sys.exit(0)
 
@@ -575,10 +985,9 @@ class LZCTrader:
         if len(daily_test_time) not in (2, 4):
             raise ValueError("Daily_test_time must be [(h1,m1), (h2,m2)] or [(h1,m1), (h2,m2), (h3,m3), (h4,m4)] format")
 
-        base_dir = os.path.join(self.root_dir, "backtest_result")
-        instrument_dir = os.path.join(base_dir, bot.instrument)
-        # 创建文件夹（如果不存在）
-        os.makedirs(instrument_dir, exist_ok=True)
+        # 组合策略的bot同时推进其全部品种
+        instruments = bot.instrument if isinstance(bot.instrument, list) else [bot.instrument]
+        bkresults = [next(item for item in self.broker.bkresult_list if item.instrument == instrument) for instrument in instruments]
 
         # 时间间隔映射
         interval_delta = {
@@ -620,18 +1029,31 @@ class LZCTrader:
             periods
         )
 
+        vectorized = self.backtest_vectorized and bot.strategy.vectorized
+
         if self.backtest_min_granularity in ['1s', '5s', '1min']:
             with tqdm(total=total_hours, desc="Backtesting", unit="hour") as pbar:
                 while current_date <= end_date:
                     # 跳过周末（周六=5, 周日=6）
                     if current_date.weekday() < 5:
-                        self.broker.buff_1min_set(bot.instrument, current_date)
+                        for instrument in instruments:
+                            self.broker.buff_1min_set(instrument, current_date)
                         # time.sleep(1)
                         for start_time, end_time in periods:
                             # 构造当天的时间段起止点
                             period_start = datetime.combine(current_date, start_time)
                             period_end = datetime.combine(current_date, end_time)
 
+                            # 本地行情库中有当天数据时整段计算，策略在会话末自行平仓
+                            if vectorized:
+                                steps = step_grid(period_start, period_end, interval_delta)
+                                bars = self.broker.session_bars(bot.instrument, current_date) if len(steps) else None
+                                if bars is not None:
+                                    position, orders = bot.strategy.session_orders(steps, bars)
+                                    self.broker.fill_session(bot.instrument, steps, bars, position, orders)
+                                    pbar.update(len(np.unique(steps // (3600 * 10 ** 9))))
+                                    continue
+
                             # 按间隔生成时间点
                             current_dt = period_start
                             last_hour = None
@@ -641,31 +1063,67 @@ class LZCTrader:
                                 # 如果小时变化（新小时开始）
                                 if last_hour is None or current_hour != last_hour:
                                     # 执行每小时开始时的操作
-                                    self.broker.buff_1s_set(bot.instrument, current_dt)
+                                    for instrument in instruments:
+                                        self.broker.buff_1s_set(instrument, current_dt)
                                     pbar.update(1)
                                     # time.sleep(1)
 
+                                for bkresult in bkresults:
+                                    bkresult.set_time(current_dt)
                                 bot.update(current_dt)
+                                for bkresult in bkresults:
+                                    bkresult.mark(self.broker.last_price(bkresult.instrument, current_dt))
                                 #time.sleep(0.1)
                                 last_hour = current_hour
                                 current_dt += interval_delta
                             bot.reset()
+                            # 收盘平仓后的资金
+                            for bkresult in bkresults:
+                                bkresult.mark()
                     current_date += timedelta(days=1)
 
         else:
             raise ValueError('Temporarily unsupported backtest_min_granularity')
 
-        base_dir = os.path.join(self.root_dir, "backtest_result")
-        output_file = os.path.join(base_dir, "overall.txt")
-        with self.lock:
-            try:
-                # 写入文件
-                with open(output_file, "a", encoding="utf-8") as f:
-                    for bkresult in self.broker.bkresult_list:
-                        if bkresult.instrument == bot.instrument:
-                            line = f'{bkresult.instrument}-balance:{bkresult.balance}-profit:{bkresult.point}\n'
-                    f.write(line)
-            except Exception as e:
-                print(f"写入订单记录失败: {e}")
+    def save_backtest_results(
+        self,
+        bkresult_list: list
+    ) -> str:
+        """
+        Save the trade ledgers and equity curves of a backtest to the result
+        store (home_dir/backtest_result/runs). Returns the run id.
+        """
+        config = {
+            'strategy': self.strategy_name,
+            'strategy_config': self.strategy_config,
+            'start': self.backtest_start_time,
+            'end': self.backtest_end_time,
+            'granularity': self.backtest_min_granularity,
+            'start_balance': self.backtest_start_balance,
+        }
+        meta = {
+            'strategy': self.strategy_name,
+            'class': self.strategy_config.get('CLASS'),
+            'start': str(self.backtest_start_time),
+            'end': str(self.backtest_end_time),
+            'granularity': self.backtest_min_granularity,
+            'start_balance': self.backtest_start_balance,
+            'config': config,
+        }
+        results = {}
+        for bkresult in bkresult_list:
+            ledger, equity = bkresult.trade_ledger(), bkresult.equity_curve()
+            stats = analyze(ledger, equity)
+            stats.pop('hourly_points')
+            results[bkresult.instrument] = (
+                ledger,
+                equity,
+                dict(stats, **bkresult.risk_metrics(), balance=bkresult.balance, point=bkresult.point)
+            )
+            print(f"{bkresult.instrument}: sharpe {stats['sharpe']:.2f}, sortino {stats['sortino']:.2f}, "
+                  f"win rate {stats['win_rate']:.1%}, profit factor {stats['profit_factor']:.2f}, "
+                  f"max drawdown {stats['max_drawdown']:.1f}")
+        store = ResultStore(os.path.join(self.root_dir, "backtest_result", "runs"))
+        return store.write_run(meta, results)
 
 
@@ -0,0 +1,239 @@
+import asyncio
+import heapq
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from LZCTrader.lzcbot import LZCBot
+
+
+class BotScheduler:
+    """Drives every live bot from one asyncio event loop.
+
+    Each bot is updated on an absolute deadline grid (start + k * interval),
+    so the period does not drift with compute or network time. Blocking
+    strategy code runs on a bounded thread pool, and a bot is never updated
+    concurrently with itself: if an update overruns one or more deadlines,
+    those ticks are counted as missed and the bot resumes on the grid.
+
+    Methods
+    -------
+    add_bot(...)
+        Schedules a bot. Can be called before or after start().
+
+    start()
+        Starts the event loop thread.
+
+    shutdown()
+        Stops the event loop and the worker pool.
+    """
+
+    def __init__(self, max_workers: int = 8) -> None:
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lzcbot")
+        self.loop = asyncio.new_event_loop()
+        self.thread = None
+        self.finished = queue.Queue()
+        self.missed_ticks = {}
+        self.max_lateness = {}
+        self._pending = []
+        self._tasks = set()
+        self._stop_events = {}
+
+    def __repr__(self):
+        return f"BotScheduler ({len(self._tasks)} bots, {self.max_workers} workers)"
+
+    def add_bot(
+        self,
+        bot: LZCBot,
+        interval: float,
+        timestamp: datetime = datetime.min,
+        start_at: float = None
+    ) -> None:
+        """Schedules a bot.
+
+        Parameters
+        ----------
+        bot : LZCBot
+            The bot to update. Its stop_flag ends the schedule.
+
+        interval : float
+            Seconds between two updates.
+
+        timestamp : datetime, optional
+            The timestamp passed to bot.update.
+
+        start_at : float, optional
+            Epoch time (time.time()) of the first update. The default is now.
+        """
+        self.missed_ticks[bot] = 0
+        self.max_lateness[bot] = 0.0
+        args = (bot, interval, timestamp, start_at)
+        if self.thread is None:
+            self._pending.append(args)
+        else:
+            self.loop.call_soon_threadsafe(self._spawn, *args)
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self._run_loop, name="lzcbot-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop_bot(self, bot: LZCBot) -> None:
+        """Sets the bot's stop_flag and wakes its schedule immediately."""
+        bot.stop_flag.set()
+        stop_event = self._stop_events.get(bot)
+        if stop_event is not None:
+            self.loop.call_soon_threadsafe(stop_event.set)
+
+    def shutdown(self) -> None:
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        self.executor.shutdown(wait=True)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        for args in self._pending:
+            self._spawn(*args)
+        self._pending = []
+        self.loop.run_forever()
+
+    def _spawn(self, bot, interval, timestamp, start_at):
+        task = self.loop.create_task(self._drive(bot, interval, timestamp, start_at))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drive(self, bot, interval, timestamp, start_at):
+        loop = asyncio.get_running_loop()
+        stop_event = asyncio.Event()
+        self._stop_events[bot] = stop_event
+        deadline = loop.time()
+        if start_at is not None:
+            deadline += max(0.0, start_at - time.time())
+
+        try:
+            while not bot.stop_flag.is_set():
+                try:
+                    await asyncio.wait_for(stop_event.wait(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+                if bot.stop_flag.is_set():
+                    break
+
+                lateness = loop.time() - deadline
+                if lateness >= interval:
+                    # Whole periods already passed: skip them instead of bursting
+                    skipped = int(lateness // interval)
+                    deadline += skipped * interval
+                    self.missed_ticks[bot] += skipped
+                    print(f"Bot {bot.label} missed {skipped} tick(s), {lateness:.3f}s behind schedule")
+                self.max_lateness[bot] = max(self.max_lateness[bot], loop.time() - deadline)
+
+                try:
+                    await loop.run_in_executor(self.executor, bot.update, timestamp)
+                except Exception as e:
+                    print(f"Error when scheduling bot {bot.label}: {e}")
+                deadline += interval
+        finally:
+            self.finished.put(bot)
+
+    def report(self) -> dict:
+        """Missed ticks and worst observed lateness (s) per bot label (the instrument, or strategy/instrument)."""
+        return {
+            bot.label: {
+                "missed_ticks": self.missed_ticks[bot],
+                "max_lateness": self.max_lateness[bot],
+            }
+            for bot in self.missed_ticks
+        }
+
+
+class SessionCloseScheduler:
+    """Stops bots at their instruments' session close times.
+
+    All stop times from instrument_map.yaml live in one timer heap served by
+    a single thread, which sleeps until the earliest deadline and fires every
+    bot due at that moment. Stop times before 08:00 belong to the night
+    session of the previous day, so they only fire when that day is a weekday.
+    """
+
+    def __init__(self, on_close) -> None:
+        """
+        Parameters
+        ----------
+        on_close : callable
+            Called as on_close(bot) when a bot's session closes.
+        """
+        self.on_close = on_close
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self.thread = None
+
+    def __repr__(self):
+        return f"SessionCloseScheduler ({len(self._heap)} deadlines)"
+
+    @staticmethod
+    def next_close(stop_time: list, now: datetime) -> datetime:
+        """The next weekday-session occurrence of (hour, minute) after now."""
+        hour, minute = stop_time
+        deadline = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if deadline <= now:
+            deadline += timedelta(days=1)
+        while True:
+            trading_day = deadline - timedelta(days=1) if hour < 8 else deadline
+            if trading_day.weekday() < 5:
+                return deadline
+            deadline += timedelta(days=1)
+
+    def add(self, bot: LZCBot, stop_times: list) -> None:
+        """Registers every stop time of a bot's instrument."""
+        now = datetime.now()
+        with self._condition:
+            for stop_time in stop_times:
+                deadline = self.next_close(stop_time, now)
+                heapq.heappush(self._heap, (deadline, next(self._counter), tuple(stop_time), bot))
+            self._condition.notify()
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self._run, name="lzcbot-session-close", daemon=True)
+        self.thread.start()
+
+    def shutdown(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._heap:
+                        delay = (self._heap[0][0] - datetime.now()).total_seconds()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                if self._stopped:
+                    return
+                now = datetime.now()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, _, stop_time, bot = heapq.heappop(self._heap)
+                    due.append(bot)
+                    heapq.heappush(self._heap, (self.next_close(stop_time, now), next(self._counter), stop_time, bot))
+
+            for bot in due:
+                if bot.stop_flag.is_set():
+                    continue
+                print(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] Closing BOT {bot.label}")
+                try:
+                    self.on_close(bot)
+                except Exception as e:
+                    print(f"ERROR when closing market: {e}")
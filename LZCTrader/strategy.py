@@ -1,9 +1,21 @@
+import numpy as np
+import pandas as pd
 from abc import ABC, abstractmethod
 from brokers.broker import Broker
 from datetime import datetime
+from LZCTrader.classes.order import Order
+from LZCTrader.tools.vectorized import last_valid
 
 
 class Strategy(ABC):
+    # Names of the methods that compute indicators. With profiling enabled
+    # their time is reported as the 'indicators' stage of LZCBot.update.
+    indicator_methods = ()
+    # Strategies that can compute a whole backtest session from arrays set
+    # this and implement session_orders; the backtest then skips the
+    # step-by-step generate_signal calls for days in the local store.
+    vectorized = False
+
     @abstractmethod
     def __init__(
         self,
@@ -23,6 +35,14 @@ class Strategy(ABC):
         self.broker = broker
         self.point_change = point_change
 
+    def history_requests(self) -> list:
+        """Candle windows (granularity, count) fetched on every update.
+
+        LZCTrader preloads them for all bots in one batch before trading
+        starts, so the first update does not start cold.
+        """
+        return []
+
     @abstractmethod
     def generate_signal(self, timestamp: datetime):
         """Generate trading signals based on the data supplied."""
@@ -31,4 +51,137 @@ class Strategy(ABC):
     def reset(self):
         pass
 
+    def session_orders(self, steps, bars: dict) -> tuple:
+        """Orders of a whole backtest session, for vectorized strategies.
+
+        Parameters
+        ----------
+        steps : np.ndarray
+            The session's step times, int64 nanoseconds.
+        bars : dict
+            The day's rows by granularity ('1s', '1min'), TickStore arrays.
+
+        Returns
+        -------
+        tuple
+            (position, orders): the net position after every step, and a
+            dict of arrays step, direction, offset, price and volume. Orders
+            with step len(steps) are the closing orders of reset(). The
+            strategy is left as after reset().
+        """
+        raise NotImplementedError
+
+
+
+
+class PortfolioStrategy(Strategy):
+    """A cross-sectional strategy trading a universe of instruments from one bot.
+
+    At every rebalance the candles of the whole universe are fetched in one
+    broker call as instruments x time matrices (Broker.get_bar_matrix) and
+    handed to rebalance(), which returns the target net position of every
+    instrument. The difference to the current positions becomes closing
+    and opening orders per instrument, priced at its latest 1s close, and
+    the broker books each order on its instrument.
+
+    Parameters read from the configuration: rebalance_interval, in minutes
+    (default 5).
+    """
+    # 每次调仓取的K线粒度与根数，子类按因子窗口设置
+    granularity = '1min'
+    lookback = 1
+    # 定价时向前查找最新1s收盘价的秒数
+    quote_window = 60
+
+    def __init__(
+        self,
+        instruments: list,
+        exchanges: dict,
+        point_changes: dict,
+        parameters: dict,
+        broker: Broker
+    ) -> None:
+        """
+        Parameters
+        ----------
+        instruments : list
+            The universe, in the order of every matrix row.
+        exchanges, point_changes : dict
+            instrument -> exchange and price tick.
+        parameters : dict
+            The strategy's PARAMETERS.
+        broker : Broker
+            The broker shared with the other bots.
+        """
+        self.instruments = list(instruments)
+        self.instrument = self.instruments  # LZCBot以列表识别组合
+        self.exchanges = exchanges
+        self.point_changes = point_changes
+        self.parameters = parameters
+        self.broker = broker
+        self.rebalance_interval = pd.Timedelta(minutes=parameters.get('rebalance_interval', 5))
+        self.positions = np.zeros(len(self.instruments), dtype=np.int64)  # 各品种净持仓，多为正
+        self.prices = np.full(len(self.instruments), np.nan)  # 各品种最新价
+        self.last_rebalance = None
+        self.dt = None
+
+    @abstractmethod
+    def rebalance(self, dt: datetime, bars: dict):
+        """Target net positions (lots, long positive) in the order of self.instruments.
+
+        bars is the get_bar_matrix result for the last self.lookback candles
+        of self.granularity.
+        """
+
+    def generate_signal(self, dt: datetime):
+        self.dt = dt
+        if self.last_rebalance is not None and dt - self.last_rebalance < self.rebalance_interval:
+            return []
+        self.last_rebalance = dt
 
+        quotes = self.broker.get_bar_matrix(self.instruments, '1s', self.quote_window, dt)
+        prices = last_valid(quotes['Close'])
+        priced = ~np.isnan(prices)
+        self.prices[priced] = prices[priced]
+
+        bars = self.broker.get_bar_matrix(self.instruments, self.granularity, self.lookback, dt)
+        target = np.asarray(self.rebalance(dt, bars), dtype=np.int64)
+        if target.shape != self.positions.shape:
+            raise ValueError("Rebalance must return one target position per instrument")
+        # 没有报价的品种维持原仓位
+        target = np.where(priced, target, self.positions)
+        return self.orders_to(target)
+
+    def orders_to(self, target: np.ndarray) -> list:
+        """Orders moving the positions to target: closes first, then opens."""
+        held_long, held_short = np.maximum(self.positions, 0), np.maximum(-self.positions, 0)
+        want_long, want_short = np.maximum(target, 0), np.maximum(-target, 0)
+        legs = (
+            (np.maximum(held_long - want_long, 0), 3, 4),  # 平多
+            (np.maximum(held_short - want_short, 0), 2, 4),  # 平空
+            (np.maximum(want_long - held_long, 0), 2, 1),  # 开多
+            (np.maximum(want_short - held_short, 0), 3, 1),  # 开空
+        )
+        orders = []
+        for volume, direction, offset in legs:
+            for i in np.flatnonzero(volume):
+                instrument, price = self.instruments[i], float(self.prices[i])
+                orders.append(Order(
+                    instrument=instrument,
+                    exchange=self.exchanges[instrument],
+                    direction=direction,
+                    offset=offset,
+                    price=price,
+                    volume=int(volume[i]),
+                    stopPrice=0,
+                    orderPriceType=1
+                ))
+        self.positions = target.copy()
+        return orders
+
+    def reset(self):
+        """Flattens every instrument at its latest price."""
+        for i in np.flatnonzero(self.positions):
+            self.broker.clear_positions(self.instruments[i], float(self.prices[i]))
+        self.positions[:] = 0
+        self.last_rebalance = None
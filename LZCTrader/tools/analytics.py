@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+
+NS_PER_HOUR = 3600 * 10 ** 9
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+
+def fifo_match(keys: np.ndarray, is_open: np.ndarray, volume: np.ndarray = None):
+    """Pairs closing units with opening units first-in first-out.
+
+    Rows are trades in time order; keys identifies the book a row belongs to
+    (e.g. instrument and side). Every row is split into volume units, and a
+    closing unit takes the oldest open unit of its book. Closing units that
+    find the book empty are dropped, like popping an empty queue. Returns
+    the row of the opening and of the closing trade of every matched unit.
+    """
+    n = len(keys)
+    rows = np.arange(n) if volume is None else np.repeat(np.arange(n), np.asarray(volume, dtype=np.int64))
+    empty = np.empty(0, dtype=np.int64)
+    if len(rows) == 0:
+        return empty, empty
+
+    order = np.lexsort((rows, np.asarray(keys, dtype=np.int64)[rows]))
+    rows = rows[order]
+    keys = np.asarray(keys, dtype=np.int64)[rows]
+    opening = np.asarray(is_open, dtype=bool)[rows]
+
+    # 每个账本内开仓、平仓单位的累计数
+    first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    lengths = np.diff(np.r_[first, len(rows)])
+    group = np.repeat(np.arange(len(first)), lengths)
+    opens = np.cumsum(opening)
+    opens -= np.repeat(opens[first] - opening[first], lengths)
+    closes = np.cumsum(~opening)
+    closes -= np.repeat(closes[first] - ~opening[first], lengths)
+
+    # 空仓时的平仓被丢弃：累计丢弃数为 max(0, 平仓数-开仓数) 的账本内前缀最大值
+    offset = group * (2 * len(rows) + 2)
+    dropped = np.maximum(np.maximum.accumulate(closes - opens + offset) - offset, 0)
+    dropped_before = np.r_[0, dropped[:-1]]
+    dropped_before[first] = 0
+    matched = ~opening & (dropped == dropped_before)
+    if not matched.any():
+        return empty, empty
+
+    # 第k个有效平仓单位对应同一账本的第k个开仓单位
+    stride = len(rows) + 1
+    open_code = keys[opening] * stride + opens[opening] - 1
+    close_code = keys[matched] * stride + closes[matched] - dropped[matched] - 1
+    position = np.searchsorted(open_code, close_code)
+    return rows[opening][position], rows[matched]
+
+
+def ledger_books(trades: np.ndarray, instruments: np.ndarray = None):
+    """Book keys and open flags of a trade ledger (TRADE_DTYPE rows)."""
+    side = (trades['type'] > 2).astype(np.int64)  # 0多 1空
+    is_open = trades['type'] % 2 == 1
+    keys = side if instruments is None else np.asarray(instruments, dtype=np.int64) * 2 + side
+    return keys, is_open
+
+
+def drawdown(equity: np.ndarray, ts: np.ndarray = None):
+    """Max drawdown and its longest duration (seconds, from peak to recovery or end)."""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return 0.0, 0.0
+    peak = np.maximum.accumulate(equity)
+    max_drawdown = float((peak - equity).max())
+    if ts is None:
+        return max_drawdown, 0.0
+    ts = np.asarray(ts, dtype=np.int64)
+    at_peak = equity >= peak
+    last_peak = np.maximum.accumulate(np.where(at_peak, np.arange(len(equity)), 0))
+    duration = (ts - ts[last_peak]).max()
+    return max_drawdown, float(duration) / 1e9
+
+
+def period_pnl(equity: np.ndarray, ts: np.ndarray, period_ns: int = NS_PER_DAY) -> np.ndarray:
+    """P&L of each period (calendar day by default) from the last equity of every period."""
+    if len(equity) == 0:
+        return np.empty(0)
+    bucket = np.asarray(ts, dtype=np.int64) // period_ns
+    last = np.flatnonzero(np.r_[bucket[1:] != bucket[:-1], True])
+    closes = np.asarray(equity, dtype=np.float64)[last]
+    return np.diff(np.r_[equity[0], closes])
+
+
+def sharpe(pnl: np.ndarray, periods_per_year: float = 252) -> float:
+    """Annualised Sharpe ratio of per-period P&L (a constant capital cancels out)."""
+    if len(pnl) < 2:
+        return float('nan')
+    std = pnl.std(ddof=1)
+    return float(pnl.mean() / std * np.sqrt(periods_per_year)) if std > 0 else float('nan')
+
+
+def sortino(pnl: np.ndarray, periods_per_year: float = 252) -> float:
+    """Annualised Sortino ratio, using the downside deviation below zero."""
+    if len(pnl) < 2:
+        return float('nan')
+    downside = np.sqrt(np.mean(np.minimum(pnl, 0.0) ** 2))
+    return float(pnl.mean() / downside * np.sqrt(periods_per_year)) if downside > 0 else float('nan')
+
+
+def trade_stats(trades: np.ndarray) -> dict:
+    """Win rate, profit factor, average holding time and P&L by hour of a trade ledger.
+
+    P&L is counted in points (ledger points times volume) on closing trades.
+    Holding time is the volume-weighted time between matched FIFO entries
+    and exits.
+    """
+    closing = trades['type'] % 2 == 0
+    pnl = trades['points'][closing] * trades['volume'][closing]
+    wins, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+
+    keys, is_open = ledger_books(trades)
+    open_rows, close_rows = fifo_match(keys, is_open, trades['volume'])
+    holding = (trades['ts'][close_rows] - trades['ts'][open_rows]) / 1e9
+
+    hours = (trades['ts'][closing] % NS_PER_DAY) // NS_PER_HOUR
+    return {
+        'closed_trades': int(closing.sum()),
+        'win_rate': float((pnl > 0).mean()) if len(pnl) else float('nan'),
+        'profit_factor': float(wins / losses) if losses > 0 else (float('inf') if wins > 0 else float('nan')),
+        'avg_holding_s': float(holding.mean()) if len(holding) else float('nan'),
+        'hourly_points': np.bincount(hours.astype(np.int64), weights=pnl, minlength=24),
+    }
+
+
+def analyze(trades: np.ndarray, equity: np.ndarray, periods_per_year: float = 252) -> dict:
+    """Performance figures of one instrument's ledger and equity curve (EQUITY_DTYPE rows).
+
+    Sharpe and Sortino are computed from daily equity changes.
+    """
+    stats = trade_stats(trades)
+    values = equity['equity'] if 'equity' in equity.dtype.names else equity['balance']
+    daily = period_pnl(values, equity['ts'])
+    max_drawdown, duration = drawdown(values, equity['ts'])
+    stats.update({
+        'sharpe': sharpe(daily, periods_per_year),
+        'sortino': sortino(daily, periods_per_year),
+        'max_drawdown': max_drawdown,
+        'max_drawdown_duration_s': duration,
+    })
+    return stats
+
+
+def analyze_runs(store, run_ids: list = None) -> pd.DataFrame:
+    """analyze() for every instrument of the given runs of a ResultStore, indexed by (run_id, instrument)."""
+    rows = []
+    for run_id in store.run_ids() if run_ids is None else run_ids:
+        for instrument in store.meta(run_id)['instruments']:
+            stats = analyze(store.trade_array(run_id, instrument), store.equity_array(run_id, instrument))
+            hourly = stats.pop('hourly_points')
+            rows.append(dict(stats, run_id=run_id, instrument=instrument, best_hour=int(hourly.argmax())))
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).set_index(['run_id', 'instrument'])
+
+
+def cumulative_points(trades: pd.DataFrame) -> pd.DataFrame:
+    """Cumulative closed-trade points of a trade table, pairing entries and exits FIFO.
+
+    trades has timestamp, instrument, action ('open'/'close'), direction
+    ('long'/'short') and price columns, sorted by time; every row is one
+    unit unless a volume column is present.
+    """
+    if trades.empty:
+        return pd.DataFrame(columns=["timestamp", "cumulative_points"])
+    instruments = pd.factorize(trades["instrument"])[0]
+    short = (trades["direction"] == "short").to_numpy()
+    is_open = (trades["action"] == "open").to_numpy()
+    volume = trades["volume"].to_numpy() if "volume" in trades else None
+    open_rows, close_rows = fifo_match(instruments * 2 + short, is_open, volume)
+
+    price = trades["price"].to_numpy(dtype=np.float64)
+    sign = np.where(short[close_rows], -1.0, 1.0)
+    points = np.bincount(close_rows, weights=(price[close_rows] - price[open_rows]) * sign, minlength=len(trades))
+    closing = ~is_open
+    return pd.DataFrame({
+        "timestamp": trades["timestamp"].to_numpy()[closing],
+        "cumulative_points": np.cumsum(points)[closing],
+    })
@@ -0,0 +1,129 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+# 下单类型 -> 记录中的动作
+ACTIONS = {1: '买开', 2: '买平', 3: '卖开', 4: '卖平'}
+ORDER_BOOK = os.path.join("result", "order_book.txt")
+
+
+def order_book_line(instrument: str, type: int, point, time: datetime, profit=None) -> str:
+    """One line of the live order book, e.g. '07-01 21:05:03 rb2510，买开，3050.0，profit 0'."""
+    line = f"{time.strftime('%m-%d %H:%M:%S')} {instrument}，{ACTIONS[type]}，{point}"
+    if profit is not None:
+        line += f"，profit {profit}"
+    return line + " \n"
+
+
+class TradeJournal:
+    """Buffered writer for the trades reported by strategies.
+
+    trade() validates the record and puts it on a queue, so the signal path
+    never opens a file. A background thread formats the records and appends
+    them in batches, one open per file per flush. Paths are relative to
+    root_dir.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        order_book: str = ORDER_BOOK,
+        flush_interval: float = 1.0,
+        batch_lines: int = 1000
+    ) -> None:
+        """
+        Parameters
+        ----------
+        root_dir : str
+            The directory the journal paths are relative to, normally LZCTrader.root_dir.
+        order_book : str, optional
+            The live order book, relative to root_dir. The default is result/order_book.txt.
+        flush_interval : float, optional
+            Seconds between flushes. The default is 1.0.
+        batch_lines : int, optional
+            Flush early once this many lines are buffered. The default is 1000.
+        """
+        self.root_dir = root_dir
+        self.order_book = order_book
+        self.flush_interval = flush_interval
+        self.batch_lines = batch_lines
+        self._queue = queue.Queue()
+        self._buffers = {}
+        self._buffered_lines = 0
+        self._thread = threading.Thread(target=self._run, name="trade-journal", daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return f"TradeJournal ({self.root_dir})"
+
+    def trade(self, instrument: str, type: int, point, time: datetime = None, profit=None) -> None:
+        """Records a trade. type is 1 买开, 2 买平, 3 卖开, 4 卖平; time defaults to now."""
+        if type not in ACTIONS:
+            raise ValueError("Invalid type")
+        self._queue.put(('trade', (instrument, type, point, time or datetime.now(), profit)))
+
+    def write(self, path: str, line: str) -> None:
+        """Appends a preformatted line to path (relative to root_dir)."""
+        self._queue.put(('line', (path, line)))
+
+    def flush(self) -> None:
+        """Blocks until everything recorded so far is on disk."""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        done.wait()
+
+    def close(self) -> None:
+        """Flushes everything still buffered and stops the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                self._flush()
+                return
+            if item:
+                kind, payload = item
+                if kind == 'flush':
+                    self._flush()
+                    last_flush = time.monotonic()
+                    payload.set()
+                    continue
+                try:
+                    self._collect(kind, payload)
+                except Exception as e:
+                    print(f"Trade journal error: {e}")
+            if self._buffered_lines >= self.batch_lines or time.monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.monotonic()
+
+    def _collect(self, kind, payload):
+        if kind == 'line':
+            path, line = payload
+        else:
+            path = self.order_book
+            line = order_book_line(*payload)
+        self._buffers.setdefault(path, []).append(line)
+        self._buffered_lines += 1
+
+    def _flush(self):
+        for path, lines in self._buffers.items():
+            full_path = os.path.join(self.root_dir, path)
+            try:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            except Exception as e:
+                print(f"写入订单记录失败: {full_path}: {e}")
+        self._buffers = {}
+        self._buffered_lines = 0
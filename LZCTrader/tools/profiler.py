@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from API.tracker import LatencyHistogram
+
+
+STAGES = ('fetch', 'indicators', 'signal', 'orders', 'total')
+# 比下单延迟更细的桶边界（毫秒），便于看清亚毫秒级的计算耗时
+PROFILE_BUCKETS_MS = [0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 3000, 5000, 10000, 30000]
+
+
+class Tick:
+    """Time accumulated by one bot update on the current thread."""
+
+    __slots__ = ('start', 'fetch', 'indicators', 'signal_end')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.fetch = 0.0
+        self.indicators = 0.0
+        self.signal_end = None
+
+
+class StageProfiler:
+    """Per-stage timing of LZCBot.update.
+
+    Each update is split into data fetch (broker calls made by the
+    strategy), indicator computation (the strategy's indicator_methods),
+    signal logic (the rest of generate_signal) and order submission.
+    Durations go into histograms owned by the thread that ran the update,
+    so the hot path takes no locks. report() merges the per-thread
+    histograms into p50/p95/p99 per bot and stage, together with exception
+    counts by type and the number of updates that overran the interval.
+    """
+
+    def __init__(self, interval: float = None) -> None:
+        """
+        Parameters
+        ----------
+        interval : float, optional
+            The default strategy interval in seconds. Updates longer than
+            their bot's interval (this one for bots that pass none to end())
+            are counted as overruns.
+        """
+        self.interval = interval
+        # 各bot的运行间隔，用于报告超时
+        self._intervals = {}
+        self._local = threading.local()
+        self._threads = []
+
+    def __repr__(self):
+        return f"StageProfiler ({len(self._threads)} threads)"
+
+    def _state(self):
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            state = {'histograms': {}, 'exceptions': Counter(), 'overruns': Counter()}
+            # list.append 是原子操作，登记新线程无需加锁
+            self._threads.append(state)
+            self._local.state = state
+        return state
+
+    def begin(self) -> Tick:
+        tick = Tick()
+        self._local.tick = tick
+        return tick
+
+    def end(self, instrument: str, tick: Tick, interval: float = None) -> None:
+        now = time.perf_counter()
+        self._local.tick = None
+        signal_end = tick.signal_end or now
+        stages = {
+            'fetch': tick.fetch,
+            'indicators': tick.indicators,
+            'signal': max(signal_end - tick.start - tick.fetch - tick.indicators, 0.0),
+            'orders': now - signal_end,
+            'total': now - tick.start,
+        }
+        state = self._state()
+        histograms = state['histograms']
+        for stage, seconds in stages.items():
+            key = (instrument, stage)
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = LatencyHistogram(PROFILE_BUCKETS_MS)
+            histogram.add(seconds * 1000)
+        if interval is None:
+            interval = self.interval
+        elif instrument not in self._intervals:
+            self._intervals[instrument] = interval
+        if interval is not None and stages['total'] > interval:
+            state['overruns'][instrument] += 1
+
+    def exception(self, instrument: str, error: Exception) -> None:
+        self._state()['exceptions'][(instrument, type(error).__name__)] += 1
+
+    def timed(self, stage: str, func):
+        """Wraps func so its duration is added to the current update's stage."""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tick = getattr(self._local, 'tick', None)
+                if tick is not None:
+                    setattr(tick, stage, getattr(tick, stage) + time.perf_counter() - start)
+        return wrapper
+
+    def instrument(self, strategy) -> None:
+        """Times the strategy's broker calls and indicator methods."""
+        strategy.broker = TimedBroker(strategy.broker, self)
+        for name in getattr(strategy, 'indicator_methods', ()):
+            setattr(strategy, name, self.timed('indicators', getattr(strategy, name)))
+
+    def report(self) -> dict:
+        """instrument -> {stage: histogram dict, 'exceptions': {...}, 'overruns': n}"""
+        merged, exceptions, overruns = {}, Counter(), Counter()
+        for state in list(self._threads):
+            for key, histogram in list(state['histograms'].items()):
+                merged.setdefault(key, LatencyHistogram(PROFILE_BUCKETS_MS)).merge(histogram)
+            exceptions.update(dict(state['exceptions']))
+            overruns.update(dict(state['overruns']))
+
+        result = {}
+        for (instrument, stage), histogram in merged.items():
+            entry = result.setdefault(instrument, {'exceptions': {}, 'overruns': overruns[instrument]})
+            entry[stage] = histogram.to_dict()
+        for (instrument, name), count in exceptions.items():
+            entry = result.setdefault(instrument, {'exceptions': {}, 'overruns': overruns[instrument]})
+            entry['exceptions'][name] = count
+        return result
+
+    def print_report(self) -> None:
+        for instrument, entry in sorted(self.report().items()):
+            parts = [
+                f"{stage} p50={entry[stage]['p50']}ms p95={entry[stage]['p95']}ms p99={entry[stage]['p99']}ms"
+                for stage in STAGES if stage in entry
+            ]
+            print(f"Bot {instrument}: " + ", ".join(parts))
+            if entry['overruns']:
+                interval = self._intervals.get(instrument, self.interval)
+                print(f"Bot {instrument}: {entry['overruns']} update(s) longer than the {interval}s interval")
+            for name, count in entry['exceptions'].items():
+                print(f"Bot {instrument}: {count} x {name}")
+
+
+class TimedBroker:
+    """Broker proxy that counts the strategy's data requests as the 'fetch' stage."""
+
+    FETCH_METHODS = ('get_candles', 'get_position', 'get_backtest_candles')
+
+    def __init__(self, broker, profiler: StageProfiler) -> None:
+        self._broker = broker
+        for name in self.FETCH_METHODS:
+            setattr(self, name, profiler.timed('fetch', getattr(broker, name)))
+
+    def __getattr__(self, name):
+        return getattr(self._broker, name)
+
+    def __repr__(self):
+        return f"TimedBroker ({self._broker!r})"
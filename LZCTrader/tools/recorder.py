@@ -0,0 +1,180 @@
+import os
+import glob
+import queue
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+
+
+# 段文件由若干追加写入的数据块组成，每块为：块头 + zlib压缩的列数据
+# 块头: magic, 行数, 首行时间戳(ns), 末行时间戳(ns), 压缩数据长度
+BLOCK_HEADER = struct.Struct('<4sIqqI')
+BLOCK_MAGIC = b'LZCS'
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def segment_path(root: str, instrument: str, day: str, granularity: str) -> str:
+    return os.path.join(root, instrument, day, f"{granularity}.seg")
+
+
+def encode_block(ts: np.ndarray, values: np.ndarray) -> bytes:
+    """Encodes int64 timestamps and an (n, 5) float64 OHLCV array as one block."""
+    payload = zlib.compress(
+        np.ascontiguousarray(ts, dtype='<i8').tobytes()
+        + np.ascontiguousarray(values.T, dtype='<f8').tobytes()
+    )
+    return BLOCK_HEADER.pack(BLOCK_MAGIC, len(ts), int(ts[0]), int(ts[-1]), len(payload)) + payload
+
+
+def read_segment(path: str, start: pd.Timestamp = None, end: pd.Timestamp = None) -> pd.DataFrame:
+    """Reads one segment file, decompressing only the blocks that overlap [start, end]."""
+    start_ns = pd.Timestamp(start).value if start is not None else None
+    end_ns = pd.Timestamp(end).value if end is not None else None
+    ts_parts, value_parts = [], []
+
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(BLOCK_HEADER.size)
+            if len(header) < BLOCK_HEADER.size:
+                break
+            magic, nrows, first_ts, last_ts, length = BLOCK_HEADER.unpack(header)
+            if magic != BLOCK_MAGIC:
+                raise ValueError(f"Corrupted segment file: {path}")
+            if (start_ns is not None and last_ts < start_ns) or (end_ns is not None and first_ts > end_ns):
+                f.seek(length, os.SEEK_CUR)
+                continue
+            raw = zlib.decompress(f.read(length))
+            ts_parts.append(np.frombuffer(raw, dtype='<i8', count=nrows))
+            value_parts.append(np.frombuffer(raw, dtype='<f8', offset=8 * nrows).reshape(len(COLUMNS), nrows).T)
+
+    if not ts_parts:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([]), dtype=float)
+
+    ts = np.concatenate(ts_parts)
+    values = np.concatenate(value_parts)
+    mask = np.ones(len(ts), dtype=bool)
+    if start_ns is not None:
+        mask &= ts >= start_ns
+    if end_ns is not None:
+        mask &= ts <= end_ns
+    data = pd.DataFrame(values[mask], columns=COLUMNS, index=pd.to_datetime(ts[mask]))
+    # 同一根k线可能被多次写入（先是未走完的版本），以最后写入的为准
+    return data[~data.index.duplicated(keep='last')]
+
+
+def read_recorded(root: str, instrument: str, granularity: str, start=None, end=None) -> pd.DataFrame:
+    """Reads every recorded day of an instrument and granularity, optionally limited to [start, end]."""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(root, instrument, '*', f"{granularity}.seg"))):
+        day = pd.Timestamp(os.path.basename(os.path.dirname(path)))
+        if start is not None and day + pd.Timedelta(days=1) <= pd.Timestamp(start):
+            continue
+        if end is not None and day > pd.Timestamp(end):
+            continue
+        frames.append(read_segment(path, start, end))
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([]), dtype=float)
+    return pd.concat(frames)
+
+
+class MarketRecorder:
+    """Records the ticks and candles seen by live trading.
+
+    record() only puts the DataFrame on a queue, so it never blocks a bot
+    thread. A background thread drops rows that were already written (polls
+    return overlapping windows), buffers the rest, and appends them in
+    batches to one compressed, columnar segment file per instrument, day and
+    granularity. The newest candle of a window may still be forming; it is
+    written as seen and every later fetch of the same timestamp writes it
+    again, so readers keep the last version of each timestamp.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        flush_interval: float = 5.0,
+        batch_rows: int = 5000
+    ) -> None:
+        self.root = root
+        self.flush_interval = flush_interval
+        self.batch_rows = batch_rows
+        self._queue = queue.Queue()
+        self._last_ts = {}
+        self._buffers = {}
+        self._buffered_rows = 0
+        self._thread = threading.Thread(target=self._run, name="market-recorder", daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return f"MarketRecorder ({self.root})"
+
+    def record(self, instrument: str, granularity: str, data: pd.DataFrame) -> None:
+        if data is None or len(data) == 0:
+            return
+        self._queue.put((instrument, granularity, data))
+
+    def close(self) -> None:
+        """Flushes everything still buffered and stops the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                self._flush()
+                return
+            if item:
+                try:
+                    self._collect(*item)
+                except Exception as e:
+                    print(f"Market recorder error: {e}")
+            if self._buffered_rows >= self.batch_rows or time.monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.monotonic()
+
+    def _collect(self, instrument, granularity, data):
+        data = data.sort_index()
+        ts = data.index.asi8
+        values = data[COLUMNS].to_numpy(dtype=np.float64)
+
+        key = (instrument, granularity)
+        last_ts = self._last_ts.get(key)
+        if last_ts is not None:
+            # 最后一根k线可能尚未走完，同一时间戳的新版本覆盖旧版本
+            keep = ts >= last_ts if granularity != 'tick' else ts > last_ts
+            ts, values = ts[keep], values[keep]
+        if len(ts) == 0:
+            return
+
+        self._last_ts[key] = int(ts[-1])
+        self._buffers.setdefault(key, []).append((ts, values))
+        self._buffered_rows += len(ts)
+
+    def _flush(self):
+        for (instrument, granularity), parts in self._buffers.items():
+            ts = np.concatenate([part[0] for part in parts])
+            values = np.concatenate([part[1] for part in parts])
+            # 缓冲中同一时间戳只写最后一个版本
+            last = np.r_[ts[1:] != ts[:-1], True]
+            ts, values = ts[last], values[last]
+            days = pd.to_datetime(ts).strftime('%Y-%m-%d')
+            for day in np.unique(days):
+                in_day = days == day
+                path = segment_path(self.root, instrument, day, granularity)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                try:
+                    with open(path, 'ab') as f:
+                        f.write(encode_block(ts[in_day], values[in_day]))
+                except Exception as e:
+                    print(f"Market recorder failed to write {path}: {e}")
+        self._buffers = {}
+        self._buffered_rows = 0
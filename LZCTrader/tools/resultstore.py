@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# 成交记录：type与交易记录一致，1买开 2买平 3卖开 4卖平；points为该笔平仓的盈亏点数
+TRADE_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('type', 'i1'),
+    ('price', '<f8'),
+    ('volume', '<i4'),
+    ('points', '<f8'),
+    ('balance', '<f8'),
+])
+# 每个回测步长结束时的资金与持仓：balance为已实现资金，equity为按price盯市的权益，position为多仓减空仓
+EQUITY_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('price', '<f8'),
+    ('balance', '<f8'),
+    ('equity', '<f8'),
+    ('point', '<f8'),
+    ('position', '<i4'),
+])
+# type -> (开平, 方向)
+TRADE_TYPES = {1: ('open', 'long'), 2: ('close', 'long'), 3: ('open', 'short'), 4: ('close', 'short')}
+
+
+def config_hash(config: dict) -> str:
+    """Stable short hash of a run configuration, equal for equal settings."""
+    text = json.dumps(config, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class ResultStore:
+    """Columnar store of backtest runs.
+
+    Every run is one directory (root/run_id) with meta.json (strategy,
+    settings, config hash and per-instrument summary) and two structured
+    NumPy arrays: trades.npy, the trade ledger, and equity.npy, the
+    mark-to-market equity and position after every backtest step. Rows are grouped by instrument
+    and meta.json keeps each instrument's row range, so reading one run and
+    instrument is a slice of a memory-mapped file, and comparing many runs
+    only reads their meta.json.
+
+    Methods
+    -------
+    write_run(...)
+        Saves the results of one backtest and returns its run id.
+
+    runs(...)
+        Run metadata as a DataFrame, optionally filtered.
+
+    summary(...)
+        Final balance, points and trade count per run and instrument.
+
+    trades(...) / equity(...)
+        The ledger or equity rows of a run, as a DataFrame.
+
+    trade_array(...) / equity_array(...)
+        The same rows as a zero-copy structured array.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._meta = {}
+
+    def __repr__(self):
+        return f"ResultStore ({self.root})"
+
+    def write_run(self, meta: dict, results: dict) -> str:
+        """
+        Parameters
+        ----------
+        meta : dict
+            Run metadata. 'strategy' and 'config' are required; config_hash
+            is computed from 'config' unless given.
+        results : dict
+            instrument -> (trades, equity, summary), where trades and equity
+            are arrays of TRADE_DTYPE and EQUITY_DTYPE and summary is a dict
+            such as {'balance': ..., 'point': ...}.
+
+        Returns
+        -------
+        str
+            The run id, '<time>_<strategy>_<config hash>'.
+        """
+        meta = dict(meta)
+        meta.setdefault('config_hash', config_hash(meta['config']))
+        meta.setdefault('created', datetime.now().isoformat(timespec='seconds'))
+        base = f"{pd.Timestamp(meta['created']).strftime('%Y%m%d_%H%M%S')}_{meta['strategy']}_{meta['config_hash'][:8]}"
+        run_id, n = base, 1
+        while os.path.exists(os.path.join(self.root, run_id)):
+            n += 1
+            run_id = f"{base}_{n}"
+        meta['run_id'] = run_id
+
+        trades, equity, instruments = [], [], {}
+        trade_rows = equity_rows = 0
+        for instrument, (instrument_trades, instrument_equity, summary) in results.items():
+            instrument_trades = np.asarray(instrument_trades, dtype=TRADE_DTYPE)
+            instrument_equity = np.asarray(instrument_equity, dtype=EQUITY_DTYPE)
+            instruments[instrument] = dict(
+                summary,
+                trades=int(len(instrument_trades)),
+                trade_rows=[trade_rows, trade_rows + len(instrument_trades)],
+                equity_rows=[equity_rows, equity_rows + len(instrument_equity)],
+            )
+            trade_rows += len(instrument_trades)
+            equity_rows += len(instrument_equity)
+            trades.append(instrument_trades)
+            equity.append(instrument_equity)
+        meta['instruments'] = instruments
+
+        # 先写入临时目录再改名，读取方不会看到写了一半的结果
+        tmp = os.path.join(self.root, f".{run_id}.tmp")
+        os.makedirs(tmp, exist_ok=True)
+        np.save(os.path.join(tmp, "trades.npy"), np.concatenate(trades) if trades else np.empty(0, TRADE_DTYPE))
+        np.save(os.path.join(tmp, "equity.npy"), np.concatenate(equity) if equity else np.empty(0, EQUITY_DTYPE))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp, os.path.join(self.root, run_id))
+        return run_id
+
+    def run_ids(self) -> list:
+        """Every stored run id, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith('.') and os.path.exists(os.path.join(self.root, name, "meta.json"))
+        )
+
+    def meta(self, run_id: str) -> dict:
+        # 结果写入后不再改变，元数据可以缓存
+        meta = self._meta.get(run_id)
+        if meta is None:
+            with open(os.path.join(self.root, run_id, "meta.json"), encoding="utf-8") as f:
+                meta = self._meta[run_id] = json.load(f)
+        return meta
+
+    def runs(self, strategy: str = None, config_hash: str = None) -> pd.DataFrame:
+        """One row per run, indexed by run id."""
+        rows = []
+        for run_id in self.run_ids():
+            meta = self.meta(run_id)
+            if strategy is not None and meta.get('strategy') != strategy:
+                continue
+            if config_hash is not None and meta.get('config_hash') != config_hash:
+                continue
+            rows.append({key: value for key, value in meta.items() if key not in ('instruments', 'config')})
+        return pd.DataFrame(rows).set_index('run_id') if rows else pd.DataFrame()
+
+    def summary(self, run_ids: list = None) -> pd.DataFrame:
+        """Per-instrument summary of runs, indexed by (run_id, instrument)."""
+        rows = []
+        for run_id in self.run_ids() if run_ids is None else run_ids:
+            for instrument, summary in self.meta(run_id)['instruments'].items():
+                row = {key: value for key, value in summary.items() if not key.endswith('_rows')}
+                rows.append(dict(row, run_id=run_id, instrument=instrument))
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows).set_index(['run_id', 'instrument']).sort_index()
+
+    def _array(self, run_id, name, instrument):
+        data = np.load(os.path.join(self.root, run_id, f"{name}.npy"), mmap_mode='r')
+        if instrument is None:
+            return data
+        rows = self.meta(run_id)['instruments'].get(instrument)
+        if rows is None:
+            return data[:0]
+        begin, end = rows['trade_rows' if name == 'trades' else 'equity_rows']
+        return data[begin:end]
+
+    def trade_array(self, run_id: str, instrument: str = None) -> np.ndarray:
+        return self._array(run_id, 'trades', instrument)
+
+    def equity_array(self, run_id: str, instrument: str = None) -> np.ndarray:
+        return self._array(run_id, 'equity', instrument)
+
+    def _frame(self, run_id, name, instrument):
+        instruments = [instrument] if instrument is not None else list(self.meta(run_id)['instruments'])
+        parts = []
+        for item in instruments:
+            rows = pd.DataFrame(self._array(run_id, name, item))
+            rows.insert(0, 'instrument', item)
+            parts.append(rows)
+        if not parts:
+            dtype = TRADE_DTYPE if name == 'trades' else EQUITY_DTYPE
+            parts = [pd.DataFrame(np.empty(0, dtype)).assign(instrument=[])]
+        frame = pd.concat(parts, ignore_index=True)
+        frame.insert(0, 'timestamp', pd.to_datetime(frame.pop('ts')))
+        return frame
+
+    def trades(self, run_id: str, instrument: str = None) -> pd.DataFrame:
+        """The trade ledger with action ('open'/'close') and direction ('long'/'short') columns."""
+        frame = self._frame(run_id, 'trades', instrument)
+        types = frame['type'].map(TRADE_TYPES)
+        frame['action'] = types.str[0]
+        frame['direction'] = types.str[1]
+        return frame
+
+    def equity(self, run_id: str, instrument: str = None) -> pd.DataFrame:
+        return self._frame(run_id, 'equity', instrument)
@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from collections import defaultdict
+
+import pandas as pd
+from aiohttp import web
+
+from LZCTrader.tools.tickstore import TickStore, COLUMNS, to_frame
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 取逐笔行情时，本地库没有tick数据则依次退回到更粗的粒度
+TICK_FALLBACK = ['tick', '1s', '1min']
+
+
+def ok(data=None):
+    return web.json_response({"code": 0, "message": "success", "data": data})
+
+
+def fail(message):
+    return web.json_response({"code": 1, "message": message, "data": None})
+
+
+def parse_time(value) -> pd.Timestamp:
+    """Request times are either epoch seconds or date strings."""
+    if isinstance(value, (int, float)):
+        return pd.Timestamp.fromtimestamp(value)
+    return pd.Timestamp(value)
+
+
+class SimServer:
+    """Local stand-in for the market-data and trading services.
+
+    Serves the endpoints used by API.SSEClient and BKAPI.SSEClient
+    (queryData, login, logout, submitOrder, cancelOrder, queryPosition and
+    the tdConnect SSE stream) from a local TickStore. Every request is
+    delayed by latency_ms plus Gaussian jitter, and order/trade reports are
+    pushed on the SSE stream after the same delay, so the live code path can
+    be load-tested without the real services.
+
+    The market clock starts at start_time (default: the current time) and
+    runs speed times as fast as the wall clock. Orders fill completely at
+    the last price at or before that clock.
+    """
+
+    def __init__(
+        self,
+        store_dir: str,
+        start_time=None,
+        speed: float = 1.0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0
+    ) -> None:
+        self.store = TickStore(store_dir)
+        self.start_time = pd.Timestamp(start_time) if start_time is not None else pd.Timestamp.now()
+        self.speed = speed
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._wall_start = time.time()
+        self._order_ids = itertools.count(1)
+        # userId -> SSE事件队列
+        self._streams = defaultdict(asyncio.Queue)
+        # (userId, symbol, direction) -> {'td': 今仓, 'yd': 昨仓, 'exchange': 交易所}
+        self._positions = {}
+        self.app = self._build_app()
+
+    def __repr__(self):
+        return f"SimServer ({self.store.root}, latency {self.latency_ms}±{self.jitter_ms}ms)"
+
+    def _build_app(self):
+        app = web.Application()
+        app.router.add_post('/apollo-market/api/v1/futureData/queryData', self.query_data)
+        app.router.add_get('/{prefix}/sse/tdConnect', self.td_connect)
+        app.router.add_post('/{prefix}/api/v1/td/login', self.login)
+        app.router.add_post('/{prefix}/api/v1/td/logout', self.logout)
+        app.router.add_post('/{prefix}/api/v1/td/submitOrder', self.submit_order)
+        app.router.add_post('/{prefix}/api/v1/td/cancelOrder', self.cancel_order)
+        app.router.add_post('/{prefix}/api/v1/account/queryPosition', self.query_position)
+        return app
+
+    def now(self) -> pd.Timestamp:
+        """The simulated market time."""
+        return self.start_time + pd.Timedelta(seconds=(time.time() - self._wall_start) * self.speed)
+
+    async def _delay(self):
+        delay = random.gauss(self.latency_ms, self.jitter_ms) if self.jitter_ms else self.latency_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def _push(self, user_id, event, data):
+        self._streams[str(user_id)].put_nowait((event, data))
+
+    def _candles(self, symbol, granularity, count=None, start_time=None, end_time=None):
+        for candidate in (TICK_FALLBACK if granularity == 'tick' else [granularity]):
+            if count is not None:
+                frame = self.store.candles(symbol, candidate, self.now(), int(count))
+            else:
+                frame = to_frame(self.store.read(symbol, candidate, parse_time(start_time), parse_time(end_time)))
+            if len(frame):
+                break
+        return [
+            {
+                "actionTimestamp": timestamp.isoformat(),
+                "open": row[0],
+                "high": row[1],
+                "low": row[2],
+                "close": row[3],
+                "volume": row[4],
+            }
+            for timestamp, row in zip(frame.index, frame[COLUMNS].itertuples(index=False))
+        ]
+
+    async def query_data(self, request):
+        body = await request.json()
+        await self._delay()
+        symbol = body.get("symbol")
+        granularity = body.get("period")
+        if body.get("candleNums") is not None:
+            return ok(self._candles(symbol, granularity, count=body["candleNums"]))
+        if body.get("startTime") is None or body.get("endTime") is None:
+            return fail("缺少 candleNums 或 startTime/endTime")
+        return ok(self._candles(symbol, granularity, start_time=body["startTime"], end_time=body["endTime"]))
+
+    async def td_connect(self, request):
+        user_id = request.query.get("userId", "")
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        queue = self._streams[user_id]
+        await response.write(f"event: sseTdConnected\ndata: {user_id}\n\n".encode())
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # 心跳注释行，保持连接
+                    await response.write(b": keepalive\n\n")
+                    continue
+                payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+                await response.write(f"event: {event}\ndata: {payload}\n\n".encode())
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        return response
+
+    async def login(self, request):
+        body = await request.json()
+        await self._delay()
+        user_id = body.get("userId")
+        self._push(user_id, "logged_in", str(user_id))
+        self._push(user_id, "ready", str(user_id))
+        return ok()
+
+    async def logout(self, request):
+        body = await request.json()
+        await self._delay()
+        self._push(body.get("userId"), "logged_out", json.dumps({"userId": body.get("userId")}))
+        return ok()
+
+    async def submit_order(self, request):
+        body = await request.json()
+        await self._delay()
+        order_id = str(next(self._order_ids))
+        asyncio.get_running_loop().create_task(self._execute(order_id, body))
+        return ok(order_id)
+
+    async def _execute(self, order_id, body):
+        user_id = body.get("userId")
+        symbol = body.get("symbol")
+        volume = int(body.get("volume") or 0)
+        order = {"originOrderId": order_id, "symbol": symbol, "direction": body.get("direction"),
+                 "offset": body.get("offset"), "price": body.get("price"), "volume": volume}
+
+        await self._delay()
+        self._push(user_id, "order", order)
+
+        candles = self._candles(symbol, 'tick', count=1)
+        price = candles[-1]["close"] if candles else body.get("price")
+        direction = body.get("direction")
+        offset = body.get("offset")
+        if offset == 1:
+            position = self._positions.setdefault(
+                (str(user_id), symbol, direction), {"td": 0, "yd": 0, "exchange": body.get("exchange")})
+            position["td"] += volume
+        else:
+            # 买平平空仓，卖平平多仓
+            held = 3 if direction == 2 else 2
+            position = self._positions.get((str(user_id), symbol, held))
+            bucket = "td" if offset == 4 else "yd"
+            if position is None or position[bucket] < volume:
+                self._push(user_id, "excption", {"originOrderId": order_id, "message": "可平仓位不足"})
+                return
+            position[bucket] -= volume
+
+        await self._delay()
+        self._push(user_id, "trade", dict(order, price=price))
+
+    async def cancel_order(self, request):
+        await request.json()
+        await self._delay()
+        return fail("委托已全部成交，无法撤单")
+
+    async def query_position(self, request):
+        body = await request.json()
+        await self._delay()
+        user_id, symbol = str(body.get("userId")), body.get("symbol")
+        positions = [
+            {"symbol": symbol, "exchange": position["exchange"], "direction": direction,
+             "tdPosition": position["td"], "ydPosition": position["yd"]}
+            for direction in (2, 3)
+            for position in [self._positions.get((user_id, symbol, direction))]
+            if position is not None and position["td"] + position["yd"] > 0
+        ]
+        return ok(positions)
+
+    def run(self, host: str = "127.0.0.1", port: int = 8600) -> None:
+        web.run_app(self.app, host=host, port=port, print=lambda *_: None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the LZCTrader market-data and trading API")
+    parser.add_argument("--store", default=os.path.join(ROOT, "store"), help="TickStore directory to serve market data from.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--start-time", help="Market time at server start, e.g. '2025-07-01 09:00'. The default is now.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Market seconds per wall-clock second.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean delay of every request and order report.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Standard deviation of the delay.")
+    args = parser.parse_args()
+
+    server = SimServer(args.store, args.start_time, args.speed, args.latency_ms, args.jitter_ms)
+    print(f"Serving {server} on http://{args.host}:{args.port}")
+    server.run(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
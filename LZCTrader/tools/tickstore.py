@@ -0,0 +1,161 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+# 每行固定48字节：时间戳(ns) + OHLCV
+RECORD_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('Open', '<f8'),
+    ('High', '<f8'),
+    ('Low', '<f8'),
+    ('Close', '<f8'),
+    ('Volume', '<f8'),
+])
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# 时间索引每隔INDEX_STRIDE行记录一个时间戳
+INDEX_STRIDE = 1024
+
+
+class TickStore:
+    """Fixed-width binary store of ticks and bars, read through numpy.memmap.
+
+    Each instrument, day and granularity is one file of sorted RECORD_DTYPE
+    rows (root/instrument/day/granularity.bin) plus a small sparse index
+    (granularity.idx) holding every INDEX_STRIDE-th timestamp. Reads map the
+    file and return views into it, so slicing a range neither copies nor
+    parses anything, and every process reading the same file shares the OS
+    page cache.
+
+    Methods
+    -------
+    write(...)
+        Merges a DataFrame into the store.
+
+    slice(...)
+        Zero-copy view of the rows of one day in a time range.
+
+    read(...)
+        Rows of a time range that may span several days.
+
+    candles(...)
+        The last count rows at or before a time, as a DataFrame.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._maps = {}
+
+    def __repr__(self):
+        return f"TickStore ({self.root})"
+
+    def path(self, instrument: str, day, granularity: str) -> str:
+        return os.path.join(self.root, instrument, pd.Timestamp(day).strftime('%Y-%m-%d'), f"{granularity}.bin")
+
+    def has(self, instrument: str, day, granularity: str) -> bool:
+        return os.path.exists(self.path(instrument, day, granularity))
+
+    def days(self, instrument: str, granularity: str) -> list:
+        """Every stored day of an instrument and granularity, sorted."""
+        folder = os.path.join(self.root, instrument)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(
+            day for day in os.listdir(folder)
+            if os.path.exists(os.path.join(folder, day, f"{granularity}.bin"))
+        )
+
+    def write(self, instrument: str, granularity: str, data: pd.DataFrame) -> int:
+        """Merges OHLCV rows into the store, one file per day.
+
+        Rows already stored with the same timestamp are replaced. Files are
+        written to a temporary name and renamed, so readers never see a
+        partial file. Returns the number of rows written.
+        """
+        if data is None or len(data) == 0:
+            return 0
+        records = np.empty(len(data), dtype=RECORD_DTYPE)
+        records['ts'] = pd.DatetimeIndex(data.index).asi8
+        for column in COLUMNS:
+            records[column] = data[column].to_numpy(dtype=np.float64)
+
+        days = pd.to_datetime(records['ts']).strftime('%Y-%m-%d')
+        for day in np.unique(days):
+            rows = records[days == day]
+            path = self.path(instrument, day, granularity)
+            if os.path.exists(path):
+                rows = np.concatenate([np.fromfile(path, dtype=RECORD_DTYPE), rows])
+            # 按时间排序并去重，相同时间戳保留后写入的行
+            order = np.argsort(rows['ts'], kind='stable')
+            rows = rows[order]
+            keep = np.append(rows['ts'][1:] != rows['ts'][:-1], True)
+            rows = rows[keep]
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            rows.tofile(path + '.tmp')
+            rows['ts'][::INDEX_STRIDE].tofile(path[:-4] + '.idx.tmp')
+            os.replace(path[:-4] + '.idx.tmp', path[:-4] + '.idx')
+            os.replace(path + '.tmp', path)
+            self._maps.pop(path, None)
+        return len(records)
+
+    def _open(self, path):
+        entry = self._maps.get(path)
+        mtime = os.path.getmtime(path)
+        if entry is None or entry[0] != mtime:
+            rows = np.memmap(path, dtype=RECORD_DTYPE, mode='r') if os.path.getsize(path) else np.empty(0, RECORD_DTYPE)
+            index = np.fromfile(path[:-4] + '.idx', dtype='<i8')
+            entry = (mtime, rows, index)
+            self._maps[path] = entry
+        return entry[1], entry[2]
+
+    def _search(self, rows, index, value, side):
+        # 先在稀疏索引中定位块，再只在该块内二分查找，避免访问整列时间戳
+        block = max(np.searchsorted(index, value, side=side) - 1, 0)
+        lo = block * INDEX_STRIDE
+        hi = min(lo + 2 * INDEX_STRIDE, len(rows))
+        return lo + int(np.searchsorted(rows['ts'][lo:hi], value, side=side))
+
+    def slice(self, instrument: str, day, granularity: str, start=None, end=None) -> np.ndarray:
+        """Zero-copy view of one day's rows with start <= ts <= end."""
+        path = self.path(instrument, day, granularity)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=RECORD_DTYPE)
+        rows, index = self._open(path)
+        lo = 0 if start is None else self._search(rows, index, pd.Timestamp(start).value, 'left')
+        hi = len(rows) if end is None else self._search(rows, index, pd.Timestamp(end).value, 'right')
+        return rows[lo:hi]
+
+    def read(self, instrument: str, granularity: str, start, end) -> np.ndarray:
+        """Rows with start <= ts <= end. A view if they lie within one day, else a copy."""
+        parts = [
+            self.slice(instrument, day, granularity, start, end)
+            for day in pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D')
+        ]
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def candles(self, instrument: str, granularity: str, end, count: int) -> pd.DataFrame:
+        """The last count rows at or before end, searching back day by day."""
+        end = pd.Timestamp(end)
+        parts, found = [], 0
+        days = [day for day in self.days(instrument, granularity) if day <= end.strftime('%Y-%m-%d')]
+        for day in reversed(days):
+            part = self.slice(instrument, day, granularity, end=end)
+            parts.insert(0, part[-(count - found):])
+            found += len(parts[0])
+            if found >= count:
+                break
+        if not parts:
+            return to_frame(np.empty(0, dtype=RECORD_DTYPE))
+        return to_frame(parts[0] if len(parts) == 1 else np.concatenate(parts))
+
+
+def to_frame(rows: np.ndarray) -> pd.DataFrame:
+    """Builds an OHLCV DataFrame (indexed by time) from store rows."""
+    return pd.DataFrame(
+        {column: rows[column] for column in COLUMNS},
+        index=pd.to_datetime(rows['ts'])
+    )
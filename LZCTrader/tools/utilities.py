@@ -1,7 +1,16 @@
 import re
 import yaml
+import numpy as np
 from datetime import datetime, time, timedelta
 
+NS_PER_HOUR = 3600 * 10 ** 9
+NS_PER_DAY = 24 * NS_PER_HOUR
+# 相邻交易时段之间的切分时刻（距当日零点）：日盘开盘前8:00，夜盘开盘前20:00
+MORNING_CUT = 8 * NS_PER_HOUR
+NIGHT_CUT = 20 * NS_PER_HOUR
+# 不在instrument_map中的品种按有夜盘处理
+SESSION_CUTS = np.array([MORNING_CUT, NIGHT_CUT], dtype=np.int64)
+
 
 def read_yaml(file_path: str) -> dict:
     """Function to read and extract contents from .yaml file.
@@ -65,3 +74,32 @@ def get_trading_hours(start_date, end_date, periods):
                 total_hours += delta.total_seconds() / 3600
         current_date += timedelta(days=1)
     return int(total_hours)
+
+
+def session_cuts(instrument_map: dict) -> dict:
+    """product -> int64 offsets (ns after midnight) separating its sessions.
+
+    Every product has a session boundary before the morning open; products
+    with a night session also have one before the night open.
+    """
+    return {
+        product: np.array([MORNING_CUT, NIGHT_CUT] if config.get('night') else [MORNING_CUT], dtype=np.int64)
+        for product, config in instrument_map.items()
+    }
+
+
+def session_start_row(ts: np.ndarray, cuts: np.ndarray) -> int:
+    """Index of the first row of the session the last row belongs to.
+
+    ts are sorted wall-clock timestamps (int64 ns) and cuts the offsets from
+    session_cuts. The boundary is the last cut point at or before the last
+    row, so the rows of earlier days and sessions are dropped even when
+    they fall in the same hours of the day.
+    """
+    if len(ts) == 0:
+        return 0
+    last = int(ts[-1])
+    day = last - last % NS_PER_DAY
+    points = np.concatenate([day - NS_PER_DAY + cuts, day + cuts])
+    start = points[np.searchsorted(points, last, side='right') - 1]
+    return int(np.searchsorted(ts, start, side='left'))
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+def step_grid(start, end, interval) -> np.ndarray:
+    """Backtest step times from start to end inclusive, as int64 nanoseconds."""
+    start, end = pd.Timestamp(start).value, pd.Timestamp(end).value
+    if end < start:
+        return np.empty(0, dtype=np.int64)
+    return np.arange(start, end + 1, pd.Timedelta(interval).value, dtype=np.int64)
+
+
+def candle_windows(ts: np.ndarray, steps: np.ndarray, bin_ns: int, count: int):
+    """The windows Backtest.get_historical_data returns at every step.
+
+    For each step time dt the rows with dt - count*bin <= ts <= dt are
+    resampled into bins and the last count bins kept. Returns the index of
+    the last row at or before each step, and the first and last bin of its
+    window as bin numbers (ts // bin_ns); windows without rows have
+    length = last - first + 1 == 0.
+    """
+    ts = np.asarray(ts, dtype=np.int64)
+    last_row = np.searchsorted(ts, steps, side='right') - 1
+    first_row = np.searchsorted(ts, steps - count * bin_ns, side='left')
+    found = last_row >= first_row
+    last_bin = np.where(found, ts[np.maximum(last_row, 0)] // bin_ns, 0) if len(ts) else np.zeros(len(steps), dtype=np.int64)
+    first_bin = np.where(found, ts[np.minimum(first_row, len(ts) - 1)] // bin_ns, 1) if len(ts) else np.ones(len(steps), dtype=np.int64)
+    first_bin = np.maximum(first_bin, last_bin - count + 1)
+    return last_row, first_bin, last_bin
+
+
+def bin_grid(ts: np.ndarray, values: np.ndarray, bin_ns: int):
+    """values spread over consecutive bins, NaN where a bin has no row.
+
+    Returns the grid and the bin number of its first element. A bin with
+    several rows keeps the last, like resample(...).last().
+    """
+    bins = np.asarray(ts, dtype=np.int64) // bin_ns
+    if len(bins) == 0:
+        return np.empty(0), 0
+    grid = np.full(bins[-1] - bins[0] + 1, np.nan)
+    grid[bins - bins[0]] = values
+    return grid, int(bins[0])
+
+
+def window_matrix(grid: np.ndarray, origin: int, first_bin: np.ndarray, last_bin: np.ndarray):
+    """Windows of a bin grid as rows of a matrix, left aligned and NaN padded."""
+    lengths = last_bin - first_bin + 1
+    width = int(lengths.max()) if len(lengths) else 0
+    columns = np.arange(width)
+    index = (first_bin - origin)[:, None] + columns
+    inside = columns < lengths[:, None]
+    matrix = np.where(inside, grid[np.clip(index, 0, max(len(grid) - 1, 0))] if len(grid) else np.nan, np.nan)
+    return matrix, lengths
+
+
+def bar_matrix(rows: list, bin_ns: int, count: int, end: int, fields=('Open', 'High', 'Low', 'Close', 'Volume')) -> dict:
+    """Candles of several instruments aligned on the count bins ending with the bin of end.
+
+    rows holds one item per instrument with a 'ts' column (int64 ns) and
+    the fields, e.g. TickStore rows, one row per bin. Returns 'time', the
+    start of every bin, and an instruments x count array per field, NaN
+    where an instrument has no row in a bin.
+    """
+    last = end // bin_ns
+    first = last - count + 1
+    result = {field: np.full((len(rows), count), np.nan) for field in fields}
+    for i, item in enumerate(rows):
+        bins = np.asarray(item['ts'], dtype=np.int64) // bin_ns
+        inside = (bins >= first) & (bins <= last)
+        for field in fields:
+            result[field][i, bins[inside] - first] = np.asarray(item[field], dtype=np.float64)[inside]
+    result['time'] = (first + np.arange(count, dtype=np.int64)) * bin_ns
+    return result
+
+
+def last_valid(matrix: np.ndarray) -> np.ndarray:
+    """The last non-NaN element of every row (NaN if the row has none)."""
+    valid = ~np.isnan(matrix)
+    if matrix.shape[1] == 0:
+        return np.full(len(matrix), np.nan)
+    column = matrix.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    return np.where(valid.any(axis=1), matrix[np.arange(len(matrix)), column], np.nan)
+
+
+def take_last(matrix: np.ndarray, lengths: np.ndarray, offset: int = 0) -> np.ndarray:
+    """The element offset places before the end of every row (NaN if the row is too short)."""
+    column = lengths - 1 - offset
+    valid = column >= 0
+    values = matrix[np.arange(len(matrix)), np.maximum(column, 0)]
+    return np.where(valid, values, np.nan)
@@ -1,11 +1,11 @@
-import os
-import threading
+import numpy as np
 import pandas as pd
-from finta import TA
+from LZCTrader.indicators import bdwz_lines, ema_rows
 from datetime import datetime
 from LZCTrader.strategy import Strategy
 from brokers.broker import Broker
 from LZCTrader.classes.order import Order
+from LZCTrader.tools.vectorized import candle_windows, bin_grid, window_matrix, take_last
 
 
 class BDWZ(Strategy):
@@ -17,6 +17,9 @@ class BDWZ(Strategy):
     2. 做多条件：生命线为红
     """
 
+    indicator_methods = ('min_generate_features',)
+    vectorized = True
+
     def __init__(
         self, instrument: str, exchange: str, point_change: float, parameters: dict, broker: Broker
     ) -> None:
@@ -43,7 +46,6 @@ class BDWZ(Strategy):
         self.max_stop = self.max_stop * self.point_change
 
         self.cooling_count = self.cooling_count_num
-        self.lock = threading.Lock()
         self.profit = 0
         self.dt = None
         self.current_point = 0
@@ -51,39 +53,15 @@ class BDWZ(Strategy):
 
     def min_generate_features(self, data: pd.DataFrame):
         # 在此函数中，根据传入参数data，计算出你策略所需的MA，EMA等指标
-        if len(data) < 2*self.params["medium_ema_period"]:
-            if len(data) < 2:
-                empty_series = pd.Series(dtype=float, index=data.index)
-                return empty_series, empty_series, empty_series, empty_series
-            else:
-                ema_long = TA.EMA(data, len(data))
-                ema_medium = TA.EMA(data, len(data)//2)
-                ema_short = TA.EMA(data, len(data)//4)
-                temp_df = pd.DataFrame({
-                    'close': ema_medium,
-                    'open': ema_medium,
-                    'high': ema_medium,  # 补充high
-                    'low': ema_medium  # 补充low
-                })
-                life = TA.EMA(temp_df, len(data))
-                life = life.squeeze()
-                return ema_long, ema_medium, ema_short, life
-
-        ema_long = TA.EMA(data, self.params["long_ema_period"])
-        ema_medium = TA.EMA(data, self.params["medium_ema_period"])
-        ema_short = TA.EMA(data, self.params["short_ema_period"])
-
-        # ema = ema_medium.to_frame()
-        temp_df = pd.DataFrame({
-            'close': ema_medium,
-            'open': ema_medium,
-            'high': ema_medium,  # 补充high
-            'low': ema_medium  # 补充low
-        })
-        life = TA.EMA(temp_df, self.params["medium_ema_period"])
-        life = life.squeeze()
-
-        return ema_long, ema_medium, ema_short, life
+        return self.broker.indicator(
+            self.instrument,
+            data,
+            bdwz_lines,
+            self.params["long_ema_period"],
+            self.params["medium_ema_period"],
+            self.params["short_ema_period"],
+            granularity="1min"
+        )
 
     def generate_signal(self, dt: datetime):
         # 此为函数主体，根据指标进行计算，产生交易信号并下单，程序只会调用这一个函数进行不断循环
@@ -99,12 +77,12 @@ class BDWZ(Strategy):
 
         ema_long, ema_medium, ema_short, life_line = self.min_generate_features(min_data)
 
-        RED = life_line.iloc[-1] > life_line.iloc[-2]
-        BLUE = life_line.iloc[-1] < life_line.iloc[-2]
-        AA = ema_short.iloc[-1] > ema_long.iloc[-1]
-        BB = ema_short.iloc[-1] < ema_long.iloc[-1]
-        AAPLUS = ema_short.iloc[-1] > ema_long.iloc[-1] + self.add
-        BBPLUS = ema_short.iloc[-1] < ema_long.iloc[-1] - self.add
+        RED = life_line[-1] > life_line[-2]
+        BLUE = life_line[-1] < life_line[-2]
+        AA = ema_short[-1] > ema_long[-1]
+        BB = ema_short[-1] < ema_long[-1]
+        AAPLUS = ema_short[-1] > ema_long[-1] + self.add
+        BBPLUS = ema_short[-1] < ema_long[-1] - self.add
         WHITE = (AA and BLUE) or (BB and RED)
 
         temp = self.broker.get_backtest_candles(instrument=self.instrument, granularity="1s", count=1, current_time=dt)
@@ -125,7 +103,7 @@ class BDWZ(Strategy):
         self.avg = avg
 
         if self.kong_flag or self.duo_flag:
-            new_orders.extend(self.dynamic_stop(life_line.iloc[-1]))
+            new_orders.extend(self.dynamic_stop(life_line[-1]))
 
         if WHITE:
             if self.kong_flag:
@@ -141,7 +119,6 @@ class BDWZ(Strategy):
                     orderPriceType=1
                 )
                 new_orders.append(new_order)
-                self.write_order(dt, 4, kong_exit_point)
                 self.kong_flag = False
                 self.kong_enter_point = 0
             if self.duo_flag:
@@ -158,7 +135,6 @@ class BDWZ(Strategy):
                     orderPriceType=1
                 )
                 new_orders.append(new_order)
-                self.write_order(dt, 2, duo_exit_point)
                 self.duo_flag = False
                 self.duo_enter_point = 0
         if AA or RED:
@@ -175,11 +151,10 @@ class BDWZ(Strategy):
                     orderPriceType=1
                 )
                 new_orders.append(new_order)
-                self.write_order(dt, 4, kong_exit_point)
                 self.kong_flag = False
                 self.kong_enter_point = 0
             if not self.duo_flag:
-                if self.current_point > life_line.iloc[-1] + self.above and AAPLUS:
+                if self.current_point > life_line[-1] + self.above and AAPLUS:
                     self.duo_enter_point = current_point
                     duo_enter_point = self.duo_enter_point
                     new_order = Order(
@@ -193,7 +168,6 @@ class BDWZ(Strategy):
                         orderPriceType=1
                     )
                     new_orders.append(new_order)
-                    self.write_order(dt, 1, duo_enter_point)
                     self.duo_flag = True
         elif BB or BLUE:
             if self.duo_flag:
@@ -210,11 +184,10 @@ class BDWZ(Strategy):
                     orderPriceType=1
                 )
                 new_orders.append(new_order)
-                self.write_order(dt, 2, duo_exit_point)
                 self.duo_flag = False
                 self.duo_enter_point = 0
             if not self.kong_flag:
-                if self.current_point < life_line.iloc[-1] - self.above and BBPLUS:
+                if self.current_point < life_line[-1] - self.above and BBPLUS:
                     self.kong_enter_point = current_point
                     kong_enter_point = self.kong_enter_point
                     # 做空信号
@@ -229,13 +202,144 @@ class BDWZ(Strategy):
                         orderPriceType=1
                     )
                     new_orders.append(new_order)
-                    self.write_order(dt, 3, kong_enter_point)
                     self.kong_flag = True
         else:
             pass
 
         return new_orders
 
+    def session_features(self, steps: np.ndarray, bars: dict) -> dict:
+        """Everything generate_signal reads from the broker, for every step of a session.
+
+        The windows are those get_backtest_candles returns at each step, and
+        the EMAs are computed window by window as min_generate_features does.
+        """
+        minute, second = 60 * 10 ** 9, 10 ** 9
+        bars_1min, bars_1s = bars['1min'], bars['1s']
+
+        # 1分钟窗口：相同窗口只计算一次
+        _, first, last = candle_windows(bars_1min['ts'], steps, minute, 30)
+        size = last - first + 1
+        ready = size >= 16
+        key = last * 64 + size
+        windows, inverse = np.unique(key[ready], return_inverse=True)
+        window_last, window_size = windows // 64, windows % 64
+        grid, origin = bin_grid(bars_1min['ts'], bars_1min['Close'], minute)
+        matrix, _ = window_matrix(grid, origin, window_last - window_size + 1, window_last)
+        short_window = window_size < 2 * self.params["medium_ema_period"]
+        ema_long = ema_rows(matrix, np.where(short_window, window_size, self.params["long_ema_period"]))
+        ema_medium = ema_rows(matrix, np.where(short_window, window_size // 2, self.params["medium_ema_period"]))
+        ema_short = ema_rows(matrix, np.where(short_window, window_size // 4, self.params["short_ema_period"]))
+        life = ema_rows(ema_medium, np.where(short_window, window_size, self.params["medium_ema_period"]))
+
+        def per_step(values):
+            out = np.full(len(steps), np.nan)
+            out[ready] = values[inverse.ravel()]
+            return out
+
+        # 最新价与最近5秒均价
+        last_row, first_1s, last_1s = candle_windows(bars_1s['ts'], steps, second, 1)
+        has_point = last_1s >= first_1s
+        point = np.where(has_point, bars_1s['Close'][np.maximum(last_row, 0)] if len(bars_1s) else np.nan, np.nan)
+        _, first_5s, last_5s = candle_windows(bars_1s['ts'], steps, second, 5)
+        has_avg = last_5s - first_5s + 1 >= 5
+        grid_1s, origin_1s = bin_grid(bars_1s['ts'], bars_1s['Close'], second)
+        recent, _ = window_matrix(grid_1s, origin_1s, first_5s[has_avg], last_5s[has_avg])
+        avg = np.full(len(steps), np.nan)
+        avg[has_avg] = np.nan_to_num(recent).sum(axis=1) / (~np.isnan(recent)).sum(axis=1)
+
+        return {
+            'ready': ready,
+            'has_point': has_point,
+            'has_avg': has_avg,
+            'life': per_step(take_last(life, window_size)),
+            'life_before': per_step(take_last(life, window_size, 1)),
+            'ema_long': per_step(take_last(ema_long, window_size)),
+            'ema_short': per_step(take_last(ema_short, window_size)),
+            'point': point,
+            'avg': avg,
+        }
+
+    def session_orders(self, steps: np.ndarray, bars: dict) -> tuple:
+        """generate_signal for a whole session, then reset().
+
+        The indicators come from session_features in one pass; the entries,
+        exits and stops still walk the steps in order, since each depends on
+        the position held.
+        """
+        features = self.session_features(steps, bars)
+        n = len(steps)
+        life, life_before = features['life'], features['life_before']
+        ema_long, ema_short = features['ema_long'], features['ema_short']
+        RED = life > life_before
+        BLUE = life < life_before
+        AA = ema_short > ema_long
+        BB = ema_short < ema_long
+        AAPLUS = ema_short > ema_long + self.add
+        BBPLUS = ema_short < ema_long - self.add
+        WHITE = (AA & BLUE) | (BB & RED)
+
+        # generate_signal在没有最新价时返回，在没有5秒均价时只更新最新价
+        priced = features['ready'] & features['has_point']
+        active = priced & features['has_avg']
+        orders = []  # (步长, 方向, 开平, 价格)
+        for i in np.flatnonzero(active).tolist():
+            current_point, avg, life_i = features['point'][i], features['avg'][i], life[i]
+            if self.duo_flag and (avg < life_i - 1 or avg < self.duo_enter_point - self.max_stop):
+                orders.append((i, 3, 4, current_point))
+                self.duo_flag = False
+                self.duo_enter_point = 0
+            if self.kong_flag and (avg > life_i + 1 or avg > self.kong_enter_point + self.max_stop):
+                orders.append((i, 2, 4, current_point))
+                self.kong_flag = False
+                self.kong_enter_point = 0
+            if WHITE[i]:
+                if self.kong_flag:
+                    orders.append((i, 2, 4, current_point))
+                    self.kong_flag = False
+                    self.kong_enter_point = 0
+                if self.duo_flag:
+                    orders.append((i, 3, 4, current_point))
+                    self.duo_flag = False
+                    self.duo_enter_point = 0
+            if AA[i] or RED[i]:
+                if self.kong_flag:
+                    orders.append((i, 2, 4, current_point))
+                    self.kong_flag = False
+                    self.kong_enter_point = 0
+                if not self.duo_flag and current_point > life_i + self.above and AAPLUS[i]:
+                    orders.append((i, 2, 1, current_point))
+                    self.duo_enter_point = current_point
+                    self.duo_flag = True
+            elif BB[i] or BLUE[i]:
+                if self.duo_flag:
+                    orders.append((i, 3, 4, current_point))
+                    self.duo_flag = False
+                    self.duo_enter_point = 0
+                if not self.kong_flag and current_point < life_i - self.above and BBPLUS[i]:
+                    orders.append((i, 3, 1, current_point))
+                    self.kong_enter_point = current_point
+                    self.kong_flag = True
+
+        # reset()：按最后的最新价平掉剩余持仓，先多后空与clear_positions一致
+        if priced.any():
+            self.current_point = features['point'][np.flatnonzero(priced)[-1]]
+        if self.duo_flag:
+            orders.append((n, 3, 4, self.current_point))
+        if self.kong_flag:
+            orders.append((n, 2, 4, self.current_point))
+        self.dt = pd.Timestamp(int(steps[-1])).to_pydatetime() if n else self.dt
+        self.duo_flag = self.kong_flag = False
+        self.duo_enter_point = self.kong_enter_point = 0
+        self.current_point = 0
+        self.avg = 0
+
+        step, direction, offset, price = (np.array(column) for column in zip(*orders)) if orders else (np.empty(0, dtype=np.int64),) * 4
+        volume = np.full(len(step), self.trade_num)
+        change = np.where(direction == 2, volume, -volume)
+        position = np.cumsum(np.bincount(step[step < n], weights=change[step < n], minlength=n)).astype(np.int64)
+        return position, {'step': step, 'direction': direction, 'offset': offset, 'price': price, 'volume': volume}
+
     def dynamic_stop(self, life):
         new_orders = []
         # 多仓动态止损
@@ -256,7 +360,6 @@ class BDWZ(Strategy):
                     orderPriceType=1
                 )
                 new_orders.append(new_order)
-                self.write_order(self.dt, 2, duo_exit_point)
                 self.duo_flag = False
                 self.duo_enter_point = 0
 
@@ -276,46 +379,15 @@ class BDWZ(Strategy):
                     orderPriceType=1
                 )
                 new_orders.append(new_order)
-                self.write_order(self.dt, 4, kong_exit_point)
                 self.kong_flag = False
                 self.kong_enter_point = 0
 
         return new_orders
 
-    def write_order(self, dt, type, point):
-        time = dt.strftime("%m-%d %H:%M:%S")
-
-        # 根据类型生成不同的订单行
-        if type == 1:  # 买开
-            line = f"{time},{self.instrument},open,long,{point}\n"
-        elif type == 2:  # 买平
-            line = f"{time},{self.instrument},close,long,{point}\n"
-        elif type == 3:  # 卖开
-            line = f"{time},{self.instrument},open,short,{point}\n"
-        elif type == 4:  # 卖平
-            line = f"{time},{self.instrument},close,short,{point}\n"
-        else:
-            raise ValueError("Invalid type")
-
-        # 创建目标文件夹路径
-        base_dir = r"H:\Quant_Proj\LeopardBKT\backtest_result"
-        instrument_dir = os.path.join(base_dir, self.instrument)
-        output_file = os.path.join(instrument_dir, "result.txt")
-
-        with self.lock:
-            try:
-                # 写入文件
-                with open(output_file, "a", encoding="utf-8") as f:
-                    f.write(line)
-            except Exception as e:
-                print(f"写入订单记录失败: {e}")
-
     def reset(self):
         if self.kong_flag:
-            self.write_order(self.dt, 4, self.current_point)
             self.kong_flag = False
         if self.duo_flag:
-            self.write_order(self.dt, 2, self.current_point)
             self.duo_flag = False
         self.kong_enter_point = 0
         self.duo_enter_point = 0
@@ -0,0 +1,54 @@
+import numpy as np
+from datetime import datetime
+from LZCTrader.strategy import PortfolioStrategy
+from LZCTrader.indicators import zscore, long_short
+from brokers.broker import Broker
+
+
+class MomentumReversal(PortfolioStrategy):
+    """动量+反转截面策略（股指期货组合）
+
+    策略逻辑
+    --------
+    1. 对组合内全部品种同时计算动量因子、反转因子和成交量冲击因子
+    2. 各因子在品种间标准化后加权
+    3. 截面排序，做多最强的long_short个品种，做空最弱的long_short个品种
+    4. 每rebalance_interval分钟调仓，收盘前平仓
+    """
+
+    indicator_methods = ('calculate_factors',)
+    # 动量、反转、成交量冲击的权重
+    weights = np.array([1.0, 1.0, 0.5])
+
+    def __init__(
+        self, instruments: list, exchanges: dict, point_changes: dict, parameters: dict, broker: Broker
+    ) -> None:
+        super().__init__(instruments, exchanges, point_changes, parameters, broker)
+        self.momentum_period = parameters.get('momentum_period', 15)  # 动量周期（分钟）
+        self.reversal_period = parameters.get('reversal_period', 5)  # 反转周期（分钟）
+        self.volume_period = parameters.get('volume_period', 30)  # 成交量周期（分钟）
+        self.trade_num = parameters.get('trade_num', 1)  # 每个品种的手数
+        self.long_short = parameters.get('long_short', 1)  # 多空各持有的品种数
+        self.lookback = max(self.momentum_period, self.reversal_period, self.volume_period) + 1
+
+    def calculate_factors(self, bars: dict) -> np.ndarray:
+        """品种 x 因子矩阵，缺少K线的品种为NaN"""
+        close = bars['Close']
+        volume = bars['Volume']
+
+        # 动量因子：(当前价格 - N分钟前价格) / N分钟前价格
+        momentum = close[:, -1] / close[:, -self.momentum_period - 1] - 1
+        # 反转因子：-(当前价格 - N分钟前价格) / N分钟前价格
+        reversal = 1 - close[:, -1] / close[:, -self.reversal_period - 1]
+        # 成交量冲击因子：当前成交量 / N分钟平均成交量
+        volume_ma = volume[:, -self.volume_period:].mean(axis=1)
+        volume_shock = np.where(volume_ma > 0, volume[:, -1] / np.where(volume_ma > 0, volume_ma, 1), 0)
+        volume_shock[np.isnan(volume_ma)] = np.nan
+
+        return np.column_stack([momentum, reversal, volume_shock])
+
+    def rebalance(self, dt: datetime, bars: dict) -> np.ndarray:
+        """调仓：标准化因子加权打分，截面排序决定多空"""
+        factors = self.calculate_factors(bars)
+        score = zscore(factors, axis=0) @ self.weights
+        return long_short(score, self.long_short) * self.trade_num
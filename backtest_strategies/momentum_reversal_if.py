@@ -1,5 +1,3 @@
-import os
-import threading
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -19,6 +17,8 @@ class MomentumReversal_IF(Strategy):
     4. 每5/15分钟调仓
     """
 
+    indicator_methods = ('calculate_factors',)
+
     def __init__(
         self, instrument: str, exchange: str, point_change: float, parameters: dict, broker: Broker
     ) -> None:
@@ -39,9 +39,7 @@ class MomentumReversal_IF(Strategy):
         self.volume_period = parameters.get('volume_period', 30)  # 成交量周期（分钟）
         self.stop_loss_pct = parameters.get('stop_loss_pct', 0.005)  # 止损比例
         
-        self.lock = threading.Lock()
         self.current_point = 0
-        self.root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
     def calculate_factors(self, data: pd.DataFrame):
         """计算因子"""
@@ -133,7 +131,6 @@ class MomentumReversal_IF(Strategy):
                 orderPriceType=1
             )
             new_orders.append(new_order)
-            self.write_order(dt, 2, current_point)
             self.duo_flag = False
             self.duo_enter_point = 0
         
@@ -150,7 +147,6 @@ class MomentumReversal_IF(Strategy):
                 orderPriceType=1
             )
             new_orders.append(new_order)
-            self.write_order(dt, 4, current_point)
             self.kong_flag = False
             self.kong_enter_point = 0
         
@@ -173,7 +169,6 @@ class MomentumReversal_IF(Strategy):
                 orderPriceType=1
             )
             new_orders.append(new_order)
-            self.write_order(dt, 1, current_point)
             self.duo_flag = True
         elif score < 0:
             # 做空
@@ -189,7 +184,6 @@ class MomentumReversal_IF(Strategy):
                 orderPriceType=1
             )
             new_orders.append(new_order)
-            self.write_order(dt, 3, current_point)
             self.kong_flag = True
         # score=0时不操作
         
@@ -217,7 +211,6 @@ class MomentumReversal_IF(Strategy):
                     orderPriceType=1
                 )
                 new_orders.append(new_order)
-                self.write_order(self.dt, 2, self.current_point)
                 self.duo_flag = False
                 self.duo_enter_point = 0
         
@@ -235,49 +228,16 @@ class MomentumReversal_IF(Strategy):
                     orderPriceType=1
                 )
                 new_orders.append(new_order)
-                self.write_order(self.dt, 4, self.current_point)
                 self.kong_flag = False
                 self.kong_enter_point = 0
         
         return new_orders
 
-    def write_order(self, dt, type, point):
-        """写入订单记录"""
-        time_str = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-        # 根据类型生成不同的订单行
-        if type == 1:  # 买开
-            line = f"{time_str},{self.instrument},open,long,{point}\n"
-        elif type == 2:  # 买平
-            line = f"{time_str},{self.instrument},close,long,{point}\n"
-        elif type == 3:  # 卖开
-            line = f"{time_str},{self.instrument},open,short,{point}\n"
-        elif type == 4:  # 卖平
-            line = f"{time_str},{self.instrument},close,short,{point}\n"
-        else:
-            raise ValueError("Invalid type")
-
-        # 创建目标文件夹路径
-        base_dir = os.path.join(self.root_dir, "backtest_result")
-        instrument_dir = os.path.join(base_dir, self.instrument)
-        os.makedirs(instrument_dir, exist_ok=True)
-        output_file = os.path.join(instrument_dir, "result.txt")
-
-        with self.lock:
-            try:
-                # 写入文件
-                with open(output_file, "a", encoding="utf-8") as f:
-                    f.write(line)
-            except Exception as e:
-                print(f"写入订单记录失败: {e}")
-
     def reset(self):
         """重置仓位"""
         if self.kong_flag:
-            self.write_order(self.dt, 4, self.current_point)
             self.kong_flag = False
         if self.duo_flag:
-            self.write_order(self.dt, 2, self.current_point)
             self.duo_flag = False
         self.kong_enter_point = 0
         self.duo_enter_point = 0
@@ -0,0 +1,313 @@
+"""Backtest throughput benchmark on deterministic synthetic data.
+
+Generates 1s and 1min candles for N instruments x D trading days into a
+temporary TickStore, runs the shipped backtest strategies through the
+offline Backtest broker and backtest_loop, and writes a JSON report to
+benchmarks/results/.
+
+Strategies that support it run vectorized, a session at a time, like a
+default backtest; --no-vectorized runs every strategy step by step. Each
+result is labelled with the mode it actually ran in, and --compare only
+compares runs of the same mode.
+
+    python benchmarks/backtest_bench.py --instruments 2 --days 1
+    python benchmarks/backtest_bench.py --no-vectorized
+    python benchmarks/backtest_bench.py --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from brokers.backtest import Backtest  # noqa: E402
+from LZCTrader.classes.bkresult import Bkresult  # noqa: E402
+from LZCTrader.lzcbot import LZCBot  # noqa: E402
+from LZCTrader.lzctrader import LZCTrader  # noqa: E402
+from LZCTrader.tools.tickstore import TickStore  # noqa: E402
+from LZCTrader.tools.utilities import extract_letters, read_yaml  # noqa: E402
+from LZCTrader.tools.vectorized import step_grid  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+STRATEGIES = ["bdwz", "momentum_reversal_if"]
+# 合成数据覆盖的时段（含日盘与夜盘），回测只会用到其中的交易时段
+SESSIONS = [("08:59:00", "15:00:00"), ("20:59:00", "23:00:00")]
+
+
+class CallTimer:
+    """Wraps a bound method and keeps the duration of every call."""
+
+    def __init__(self, owner, name):
+        self.durations = []
+        self.method = getattr(owner, name)
+        setattr(owner, name, self)
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.method(*args, **kwargs)
+        finally:
+            self.durations.append(time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        return summarize(self.durations)
+
+
+def summarize(durations: list) -> dict:
+    """Count, total and latency percentiles of call durations (seconds)."""
+    if not durations:
+        return {"count": 0}
+    ms = np.array(durations) * 1000
+    return {
+        "count": int(len(ms)),
+        "total_s": float(ms.sum() / 1000),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def trading_days(start: date, count: int) -> list:
+    days, current = [], start
+    while len(days) < count:
+        if current.weekday() < 5:
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def synthetic_day(day: date, seed: int, base: float, tick: float):
+    """A reproducible random walk of 1s candles over SESSIONS and its 1min candles."""
+    index = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(f"{day} {start}", f"{day} {end}", freq="1s").asi8 for start, end in SESSIONS
+    ]))
+    rng = np.random.default_rng(seed)
+    steps = rng.choice([-1, 0, 0, 0, 1], size=len(index)) * tick
+    close = base + np.cumsum(steps)
+    open_ = np.concatenate([[base], close[:-1]])
+    spread = rng.integers(0, 2, size=len(index)) * tick
+    second = pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Volume": rng.integers(1, 50, size=len(index)).astype(float),
+    }, index=index)
+    minute = second.resample("1min").agg({
+        "Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"
+    }).dropna()
+    return second, minute
+
+
+def instrument_names(config_list: list, count: int) -> list:
+    # 超出配置数量时，用同一品种的后续合约补足
+    names = []
+    for i in range(count):
+        name = config_list[i % len(config_list)]
+        product = extract_letters(name)
+        names.append(name if i < len(config_list) else f"{product}{int(name[len(product):]) + i // len(config_list)}")
+    return names
+
+
+def build_store(store_dir: str, instruments: list, days: list, instrument_map: dict, seed: int) -> float:
+    start = time.perf_counter()
+    store = TickStore(store_dir)
+    for i, instrument in enumerate(instruments):
+        config = instrument_map[extract_letters(instrument)]
+        for j, day in enumerate(days):
+            second, minute = synthetic_day(day, seed * 1_000_003 + i * 1009 + j, 3000.0, config["pointChange"])
+            store.write(instrument, "1s", second)
+            store.write(instrument, "1min", minute)
+    return time.perf_counter() - start
+
+
+def session_steps(days: list, daily_test_time: list, step: str) -> int:
+    """Backtest steps of one instrument, the same in both modes: the step_grid of every session of every day."""
+    sessions = [(daily_test_time[i], daily_test_time[i + 1]) for i in range(0, len(daily_test_time), 2)]
+    return sum(
+        len(step_grid(datetime.combine(day, datetime.min.time()).replace(hour=start[0], minute=start[1]),
+                      datetime.combine(day, datetime.min.time()).replace(hour=end[0], minute=end[1]),
+                      pd.Timedelta(step)))
+        for day in days
+        for start, end in sessions
+    )
+
+
+def run_strategy(strategy: str, instruments: list, days: list, store_dir: str, work_dir: str, step: str,
+                 vectorized: bool = True) -> dict:
+    zc = LZCTrader()
+    zc.set_backtest_strategy(strategy)
+    # 回测结果写入临时目录，不污染仓库下的 backtest_result
+    zc.root_dir = work_dir
+    zc.backtest_start_time = datetime.combine(days[0], datetime.min.time())
+    zc.backtest_end_time = datetime.combine(days[-1], datetime.min.time())
+    zc.backtest_min_granularity = step
+    zc.backtest_vectorized = vectorized
+    zc.broker = Backtest(enter_license="", store_dir=store_dir, offline=True)
+
+    timers = {
+        "get_backtest_candles": CallTimer(zc.broker, "get_backtest_candles"),
+        "get_historical_data": CallTimer(zc.broker, "get_historical_data"),
+        "session_bars": CallTimer(zc.broker, "session_bars"),
+        "fill_session": CallTimer(zc.broker, "fill_session"),
+    }
+    signal_timers, session_timers = [], []
+    bkresults, runs = [], []
+    updates = 0
+    for instrument in instruments:
+        config = zc.instrument_map[extract_letters(instrument)]
+        stop = config["stop"]
+        if config["morning"] and config["night"]:
+            daily_test_time = [(9, 1), stop[0], (21, 1), stop[1]]
+        else:
+            daily_test_time = [(21, 1) if config["night"] else (9, 1), stop[0]]
+        bkresults.append(Bkresult(instrument=instrument, balance=0, value_per_point=config["perValue"],
+                                  point_change=config["pointChange"]))
+        bot = LZCBot(strategy=zc.strategy_class(instrument=instrument, exchange=config["exchange"],
+                                                point_change=config["pointChange"],
+                                                parameters=zc.strategy_config["PARAMETERS"], broker=zc.broker))
+        signal_timers.append(CallTimer(bot.strategy, "generate_signal"))
+        session_timers.append(CallTimer(bot.strategy, "session_orders"))
+        runs.append((bot, daily_test_time))
+        updates += session_steps(days, daily_test_time, step)
+    zc.broker.set_bklist(bkresults)
+
+    start = time.perf_counter()
+    # 策略的打印输出会淹没结果，且打印本身的开销不属于被测对象
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for bot, daily_test_time in runs:
+            zc.backtest_loop(bot, daily_test_time)
+    wall = time.perf_counter() - start
+
+    calls = {name: timer.summary() for name, timer in timers.items()}
+    calls["generate_signal"] = summarize([duration for timer in signal_timers for duration in timer.durations])
+    calls["session_orders"] = summarize([duration for timer in session_timers for duration in timer.durations])
+    # 模拟时长按回测步数计，与策略是否逐步调用generate_signal无关
+    simulated = updates * pd.Timedelta(step).total_seconds()
+    return {
+        "mode": "vectorized" if vectorized and zc.strategy_class.vectorized else "event",
+        "instruments": instruments,
+        "updates": updates,
+        "wall_s": wall,
+        "simulated_s": simulated,
+        "sim_s_per_wall_s": simulated / wall if wall else None,
+        "calls": calls,
+        "points": {bk.instrument: bk.point for bk in bkresults},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current: dict, baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    print(f"\nCompared with {baseline_path} ({baseline.get('commit')}):")
+    for strategy, result in current["results"].items():
+        old = baseline.get("results", {}).get(strategy)
+        if not old:
+            continue
+        # 早期的结果文件没有mode，均为逐步回测
+        if old.get("mode", "event") != result["mode"]:
+            print(f"  {strategy}: skipped, the baseline ran {old.get('mode', 'event')}, this run {result['mode']}")
+            continue
+        ratio = result["sim_s_per_wall_s"] / old["sim_s_per_wall_s"]
+        print(f"  {strategy}: throughput x{ratio:.2f}")
+        for name, stats in result["calls"].items():
+            old_stats = old["calls"].get(name, {})
+            if stats.get("count") and old_stats.get("count"):
+                print(f"    {name}: p50 {old_stats['p50_ms']:.3f} -> {stats['p50_ms']:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest throughput benchmark on synthetic data")
+    parser.add_argument("--instruments", type=int, default=2, help="Instruments per strategy.")
+    parser.add_argument("--days", type=int, default=1, help="Trading days per instrument.")
+    parser.add_argument("--step", default="5s", help="backtest_min_granularity, one of 1s, 5s, 1min.")
+    parser.add_argument("--seed", type=int, default=20250707)
+    parser.add_argument("--start", default="2025-07-07", help="First synthetic trading day.")
+    parser.add_argument("--strategies", nargs="+", default=STRATEGIES, choices=STRATEGIES)
+    parser.add_argument("--no-vectorized", action="store_true",
+                        help="Run every strategy step by step instead of vectorized where supported.")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also report the Python heap peak via tracemalloc (slows the run down).")
+    parser.add_argument("--output", type=Path, help="Result file. The default is benchmarks/results/<time>.json.")
+    parser.add_argument("--compare", type=Path, help="Earlier result file to compare against.")
+    args = parser.parse_args()
+
+    days = trading_days(date.fromisoformat(args.start), args.days)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {"instruments": args.instruments, "days": args.days, "step": args.step, "seed": args.seed,
+                   "start": args.start, "vectorized": not args.no_vectorized},
+        "results": {},
+    }
+
+    if args.trace_memory:
+        tracemalloc.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        store_dir = os.path.join(tmp, "store")
+        trader = LZCTrader()
+        for strategy in args.strategies:
+            config = read_yaml(str(ROOT / "backtest_config" / f"{strategy}.yaml"))
+            instruments = instrument_names(config["BACKTESTLIST"], args.instruments)
+            build_s = build_store(store_dir, instruments, days, trader.instrument_map, args.seed)
+            result = run_strategy(strategy, instruments, days, store_dir, tmp, args.step,
+                                  vectorized=not args.no_vectorized)
+            result["data_build_s"] = build_s
+            report["results"][strategy] = result
+            print(f"{strategy} [{result['mode']}]: {result['updates']} updates, "
+                  f"{result['sim_s_per_wall_s']:.1f} sim-s/wall-s")
+            for name, stats in result["calls"].items():
+                if stats.get("count"):
+                    print(f"  {name}: n={stats['count']} p50={stats['p50_ms']:.3f}ms "
+                          f"p95={stats['p95_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms")
+
+    memory = {}
+    if resource is not None:
+        # Linux 以KB为单位，macOS 以字节为单位
+        scale = 1 if sys.platform == "darwin" else 1024
+        memory["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    if args.trace_memory:
+        memory["python_heap_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    report["memory"] = memory
+    print(f"memory: {memory}")
+
+    output = args.output or RESULTS_DIR / f"backtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"saved {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
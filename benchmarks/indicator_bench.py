@@ -0,0 +1,101 @@
+"""Microbenchmark of LZCTrader.indicators against finta and pandas.
+
+Times each indicator on random-walk closes of several lengths, the way the
+strategies call them (finta through a DataFrame, LZCTrader.indicators on the
+Close array), checks that both give the same values and writes a JSON report
+to benchmarks/results/.
+
+    python benchmarks/indicator_bench.py
+    python benchmarks/indicator_bench.py --sizes 30 1000 --repeat 2000
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from finta import TA
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from LZCTrader import indicators  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def finta_life(data: pd.DataFrame, period: int):
+    # 策略原先的写法：中期EMA再放进一个四列DataFrame求EMA
+    ema_medium = TA.EMA(data, period)
+    temp_df = pd.DataFrame({'close': ema_medium, 'open': ema_medium, 'high': ema_medium, 'low': ema_medium})
+    return TA.EMA(temp_df, period)
+
+
+def finta_macd(data: pd.DataFrame, fast: int, slow: int, signal: int):
+    dif = TA.EMA(data, fast) - TA.EMA(data, slow)
+    temp_df = pd.DataFrame({'close': dif, 'open': dif, 'high': dif, 'low': dif})
+    return dif, TA.EMA(temp_df, signal)
+
+
+def cases(data: pd.DataFrame, close: np.ndarray) -> dict:
+    """name -> (finta/pandas call, indicators call, exact)."""
+    return {
+        "ema(10)": (lambda: TA.EMA(data, 10).to_numpy(), lambda: indicators.ema(close, 10), True),
+        "life_line(10)": (lambda: finta_life(data, 10).to_numpy(),
+                          lambda: indicators.life_line(indicators.ema(close, 10), 10), True),
+        "macd(12,26,9)": (lambda: np.concatenate([s.to_numpy() for s in finta_macd(data, 12, 26, 9)]),
+                          lambda: np.concatenate(indicators.macd(close, 12, 26, 9)), True),
+        "sma(20)": (lambda: data['Close'].rolling(20).mean().to_numpy(), lambda: indicators.sma(close, 20), False),
+        "rolling_std(20)": (lambda: data['Close'].rolling(20).std().to_numpy(),
+                            lambda: indicators.rolling_std(close, 20), False),
+    }
+
+
+def time_call(call, repeat: int) -> float:
+    """Best per-call time of a few rounds, in microseconds."""
+    return min(timeit.repeat(call, number=repeat, repeat=5)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indicator microbenchmark against finta")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 1000, 100000], help="Bars per call.")
+    parser.add_argument("--repeat", type=int, default=200, help="Calls per timing round.")
+    parser.add_argument("--seed", type=int, default=20250707)
+    parser.add_argument("--output", type=Path, help="Result file. The default is benchmarks/results/<time>.json.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {"sizes": args.sizes, "repeat": args.repeat, "seed": args.seed},
+        "results": {},
+    }
+    for size in args.sizes:
+        close = 3000 + np.cumsum(rng.normal(0, 1, size)).round(1)
+        data = pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': 1.0})
+        # 长序列时减少调用次数，保持每轮耗时相近
+        repeat = max(1, args.repeat * 30 // max(size, 30))
+        results = report["results"][str(size)] = {}
+        for name, (reference, candidate, exact) in cases(data, close).items():
+            expected, actual = reference(), candidate()
+            same = np.array_equal(expected, actual, equal_nan=True) if exact else np.allclose(expected, actual, equal_nan=True)
+            finta_us, numpy_us = time_call(reference, repeat), time_call(candidate, repeat)
+            results[name] = {"finta_us": finta_us, "numpy_us": numpy_us, "speedup": finta_us / numpy_us,
+                             "identical" if exact else "close": bool(same)}
+            print(f"{size:>7} bars {name:<16} finta {finta_us:10.1f}us  numpy {numpy_us:10.1f}us  "
+                  f"x{finta_us / numpy_us:6.1f}  {'identical' if exact else 'close'}: {same}")
+
+    output = args.output or RESULTS_DIR / f"indicators_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"saved {output}")
+
+
+if __name__ == "__main__":
+    main()
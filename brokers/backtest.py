@@ -1,18 +1,33 @@
+import os
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta, date, time
 from brokers.broker import Broker
+from LZCTrader.tools.utilities import read_yaml, extract_letters, session_cuts, session_start_row, SESSION_CUTS
 from LZCTrader.classes.order import Order
 from LZCTrader.classes.bkresult import Bkresult
+from LZCTrader.tools.tickstore import TickStore, to_frame
+from LZCTrader.tools.resultstore import TRADE_DTYPE, EQUITY_DTYPE
+from LZCTrader.tools.vectorized import bar_matrix
 import BKAPI
 
 
 class Backtest(Broker):
-    def __init__(self, enter_license: str):
+    def __init__(self, enter_license: str, store_dir: str = None, offline: bool = False, base_url: str = None):
 
         self.lisence = enter_license
-        self.api = BKAPI.Context(lisence=self.lisence)
+        if offline and store_dir is None:
+            raise ValueError("Offline backtest requires a store directory")
+        # 离线回测只读取本地行情库，不连接接口
+        self.api = None if offline else BKAPI.Context(lisence=self.lisence, base_url=base_url)
         self.timer_thread = None
         self.bkresult_list = []
+        # 本地行情库中已有的日期直接从内存映射文件切片，不再请求接口
+        self.store = TickStore(store_dir) if store_dir is not None else None
+
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        # 品种 -> 交易时段切分时刻，供cut_yesterday使用
+        self.session_cuts = session_cuts(read_yaml(os.path.join(root_dir, "LZCTrader/tools/instrument_map.yaml")))
 
     def __repr__(self):
         return "Futures Broker Interface"
@@ -64,11 +79,11 @@ class Backtest(Broker):
                 instrument, granularity=granularity, start_time=start_time, end_time=end_time
             )
             # try to get data
-        data = self.response_to_df(response, cut_yesterday)
+        data = self.response_to_df(response, cut_yesterday, instrument)
 
         return data
 
-    def response_to_df(self, response, cut_yesterday):
+    def response_to_df(self, response, cut_yesterday, instrument: str = None):
         """将API响应转换为Pandas DataFrame的函数。"""
         try:
             candles = response
@@ -104,29 +119,16 @@ class Backtest(Broker):
         dataframe.index = pd.to_datetime(times, format='ISO8601')
 
         if cut_yesterday:
-            hours = dataframe.index.hour
-            get_morning = (hours >= 8) & (hours <= 16)  # 8:00 - 16:00
-            get_night = ((hours >= 20) & (hours <= 23)) | ((hours >= 0) & (hours <= 5))  # 20:00 - 5:00
-
-            # 检查是否同时包含 morning 和 night 数据
-            has_morning = any(get_morning)
-            has_night = any(get_night)
-
-            if has_morning and has_night:
-                # 如果同时存在，则根据当前时间决定保留哪一组
-                current_hour = pd.Timestamp.now().hour  # 获取当前时间的小时
-                if 8 <= current_hour <= 16:
-                    selected_group = dataframe[get_morning]  # 当前是早上，保留 morning 数据
-                else:
-                    selected_group = dataframe[get_night]  # 当前是晚上，保留 night 数据
-            elif has_morning:
-                selected_group = dataframe[get_morning]  # 只有 morning 数据
-            elif has_night:
-                selected_group = dataframe[get_night]  # 只有 night 数据
-            else:
-                raise ValueError("Wrong Data!")  # 都不满足，返回完整数据
-
-            return selected_group
+            # 只保留最后一根K线所在交易时段的数据，时段边界按品种是否有夜盘预先算好
+            index = dataframe.index
+            wall = (index.tz_localize(None) if index.tz is not None else index).asi8
+            ordered = wall if index.is_monotonic_increasing else np.sort(wall)
+            cuts = self.session_cuts.get(extract_letters(instrument) if instrument else None, SESSION_CUTS)
+            start = session_start_row(ordered, cuts)
+            if start == 0:
+                return dataframe
+            # 保持接口返回的顺序（实盘接口为由近到远），只去掉时段起点之前的K线
+            return dataframe[wall >= ordered[start]]
 
         return dataframe
 
@@ -142,7 +144,7 @@ class Backtest(Broker):
         self.bkresult_list = bkresult_list
 
     def relog(self):
-        pass
+        return True
 
     def get_position(self, instrument: str) -> dict:
         return {}
@@ -167,6 +169,11 @@ class Backtest(Broker):
         if granularity not in supported_granularity:
             raise ValueError("Unsupported Granularity")
 
+        if self.store is not None and self.store.has(instrument, current_time, granularity):
+            delta = pd.Timedelta(granularity) * count
+            rows = self.store.slice(instrument, current_time, granularity, start=current_time - delta, end=current_time)
+            return self.get_historical_data(df=to_frame(rows), end_time=current_time, granularity=granularity, num_periods=count)
+
         for bkresult in self.bkresult_list:
             if bkresult.instrument == instrument:
                 if granularity == '1s':
@@ -181,20 +188,37 @@ class Backtest(Broker):
                     raise ValueError("Unsupported Granularity")
         raise ValueError("Instrument Not Found")
 
+    def get_bar_matrix(self, instruments: list, granularity: str, count: int, current_time: datetime = None) -> dict:
+        """Aligned candles of several instruments, sliced straight from the local store when it has the day."""
+        if current_time is None or self.store is None or not all(
+                self.store.has(instrument, current_time, granularity) for instrument in instruments):
+            return super().get_bar_matrix(instruments, granularity, count, current_time)
+        bin_ns = pd.Timedelta(granularity).value
+        end = pd.Timestamp(current_time).value
+        start = pd.Timestamp((end // bin_ns - count + 1) * bin_ns)
+        rows = [self.store.slice(instrument, current_time, granularity, start=start, end=current_time) for instrument in instruments]
+        return bar_matrix(rows, bin_ns, count, end)
+
     def buff_1s_set(self, instrument: str, dt: datetime):
         granularity = '1s'
+        if self.store is not None and self.store.has(instrument, dt, granularity):
+            return
 
-        hour_start = dt.replace(minute=0, second=0, microsecond=0)
-        hour_end = hour_start + timedelta(hours=1)
+        if self.api is None:
+            # 离线且本地无此日数据（如节假日），当作无行情
+            hour_data = to_frame(self.store.slice(instrument, dt, granularity))
+        else:
+            hour_start = dt.replace(minute=0, second=0, microsecond=0)
+            hour_end = hour_start + timedelta(hours=1)
 
-        # 这里不需要异步，可以直接调用
-        response = self.api.instrument.candles_according_time(
-            instrument=instrument,
-            granularity=granularity,
-            start_time=hour_start,
-            end_time=hour_end
-        )
-        hour_data = self.response_to_df(response, False)
+            # 这里不需要异步，可以直接调用
+            response = self.api.instrument.candles_according_time(
+                instrument=instrument,
+                granularity=granularity,
+                start_time=hour_start,
+                end_time=hour_end
+            )
+            hour_data = self.response_to_df(response, False)
 
         for bkresult in self.bkresult_list:
             if bkresult.instrument == instrument:
@@ -204,18 +228,23 @@ class Backtest(Broker):
 
     def buff_1min_set(self, instrument: str, current_date: date):
         granularity = '1min'
+        if self.store is not None and self.store.has(instrument, current_date, granularity):
+            return
 
-        day_start = datetime.combine(current_date, time.min)
-        day_end = datetime.combine(current_date, time.max)
+        if self.api is None:
+            day_data = to_frame(self.store.slice(instrument, current_date, granularity))
+        else:
+            day_start = datetime.combine(current_date, time.min)
+            day_end = datetime.combine(current_date, time.max)
 
-        # 这里不需要异步，可以直接调用
-        response = self.api.instrument.candles_according_time(
-            instrument=instrument,
-            granularity=granularity,
-            start_time=day_start,
-            end_time=day_end
-        )
-        day_data = self.response_to_df(response, False)
+            # 这里不需要异步，可以直接调用
+            response = self.api.instrument.candles_according_time(
+                instrument=instrument,
+                granularity=granularity,
+                start_time=day_start,
+                end_time=day_end
+            )
+            day_data = self.response_to_df(response, False)
 
         for bkresult in self.bkresult_list:
             if bkresult.instrument == instrument:
@@ -223,6 +252,155 @@ class Backtest(Broker):
                 return
         raise ValueError("Instrument Not Found")
 
+    def last_price(self, instrument: str, current_time: datetime):
+        """The last 1s close at or before current_time, or None."""
+        if self.store is not None and self.store.has(instrument, current_time, '1s'):
+            rows = self.store.slice(instrument, current_time, '1s', end=current_time)
+            return float(rows['Close'][-1]) if len(rows) else None
+
+        for bkresult in self.bkresult_list:
+            if bkresult.instrument == instrument:
+                buff_data = bkresult.get_1s_buff()
+                if buff_data is None or len(buff_data) == 0:
+                    return None
+                i = buff_data.index.searchsorted(pd.Timestamp(current_time), side='right')
+                return float(buff_data['Close'].iloc[i - 1]) if i else None
+        raise ValueError("Instrument Not Found")
+
+    def session_bars(self, instrument: str, day) -> dict:
+        """The 1s and 1min rows of one stored day, or None if the store lacks either."""
+        if self.store is None:
+            return None
+        if not (self.store.has(instrument, day, '1s') and self.store.has(instrument, day, '1min')):
+            return None
+        return {granularity: self.store.slice(instrument, day, granularity) for granularity in ('1s', '1min')}
+
+    def fill_session(self, instrument: str, steps: np.ndarray, bars: dict, position: np.ndarray, orders: dict):
+        """Fills the orders of a whole session at once and books them in the instrument's Bkresult.
+
+        The vectorized counterpart of the event loop: every order fills at its
+        price like place_order, equity is marked at the last 1s close after
+        every step, and a final row follows the orders placed at the close.
+
+        Parameters
+        ----------
+        instrument : str
+            The instrument.
+        steps : np.ndarray
+            Step times of the session, int64 nanoseconds.
+        bars : dict
+            The session's rows by granularity, as from session_bars.
+        position : np.ndarray
+            Net position (long minus short) the strategy holds after every step.
+        orders : dict
+            Arrays step, direction, offset, price and volume, in fill order.
+            step indexes steps; len(steps) marks orders at the session close.
+        """
+        bkresult = next((item for item in self.bkresult_list if item.instrument == instrument), None)
+        if bkresult is None:
+            raise ValueError("Instrument Not Found")
+
+        n = len(steps)
+        step = np.asarray(orders['step'], dtype=np.int64)
+        direction = np.asarray(orders['direction'])
+        offset = np.asarray(orders['offset'])
+        price = np.asarray(orders['price'], dtype=np.float64)
+        volume = np.asarray(orders['volume'], dtype=np.int64)
+        if np.any((offset != 1) & (offset != 4)):
+            raise ValueError("Invalid offset")
+        if np.any(np.diff(step) < 0) or np.any(step > n):
+            raise ValueError("Orders must be sorted by step")
+
+        opening = offset == 1
+        long_side = opening == (direction == 2)  # 买开、卖平为多仓
+        books = {
+            True: self._fill_book(opening, price, volume, long_side, bkresult.long_position, bkresult.long_enter_price),
+            False: self._fill_book(opening, price, volume, ~long_side, bkresult.short_position, bkresult.short_enter_price),
+        }
+        enter_price = np.where(long_side, books[True][2], books[False][2])
+        profit = np.where(opening, 0, np.where(long_side, price - enter_price, enter_price - price)) / bkresult.point_change
+        balance = np.cumsum(np.r_[bkresult.balance, profit * bkresult.value_per_point * volume])[1:]
+        point = np.cumsum(np.r_[bkresult.point, profit])[1:]
+
+        trades = np.empty(len(step), dtype=TRADE_DTYPE)
+        trades['ts'] = steps[np.minimum(step, n - 1)]
+        trades['type'] = np.where(long_side, np.where(opening, 1, 2), np.where(opening, 3, 4))
+        trades['price'] = price
+        trades['volume'] = volume
+        trades['points'] = profit
+        trades['balance'] = balance
+
+        # 每个步长结束时的最新价，无成交的时间沿用上一价格
+        close_ts, close = bars['1s']['ts'], bars['1s']['Close']
+        last = np.searchsorted(close_ts, steps, side='right') - 1
+        known = np.maximum.accumulate(np.where(last >= 0, np.arange(n), -1))
+        initial = np.nan if bkresult.last_price is None else bkresult.last_price
+        mark_price = np.where(known >= 0, close[last[np.maximum(known, 0)]], initial)
+        mark_price = np.r_[mark_price, mark_price[-1]]
+
+        # 每行权益对应的成交笔数，0为会话开始时的状态；最后一行为收盘平仓之后
+        state = np.searchsorted(step, np.r_[np.arange(n), n], side='right')
+        long_position = np.r_[bkresult.long_position, books[True][0]][state]
+        long_price = np.r_[bkresult.long_enter_price, books[True][1]][state]
+        short_position = np.r_[bkresult.short_position, books[False][0]][state]
+        short_price = np.r_[bkresult.short_enter_price, books[False][1]][state]
+        equity_balance = np.r_[bkresult.balance, balance][state]
+        points = ((mark_price - long_price) * long_position + (short_price - mark_price) * short_position) / bkresult.point_change * bkresult.value_per_point
+        holding = (long_position > 0) | (short_position > 0)
+
+        equity = np.empty(n + 1, dtype=EQUITY_DTYPE)
+        equity['ts'] = np.r_[steps, steps[-1]]
+        equity['price'] = mark_price
+        equity['balance'] = equity_balance
+        equity['equity'] = np.where(holding & ~np.isnan(mark_price), equity_balance + points, equity_balance)
+        equity['point'] = np.r_[bkresult.point, point][state]
+        equity['position'] = long_position - short_position
+        if not np.array_equal(equity['position'][:n], np.asarray(position)):
+            raise ValueError("Strategy positions do not match its orders")
+
+        bkresult.extend(trades, equity, int(long_position[-1]), float(long_price[-1]),
+                        int(short_position[-1]), float(short_price[-1]))
+
+    @staticmethod
+    def _fill_book(opening, price, volume, mine, position, enter_price):
+        """Position and average entry price of one side after every order, and
+        the entry price each order of that side closes against.
+
+        Orders of the other side leave the side unchanged. The average is
+        updated open by open with the same formula as Bkresult.update_result.
+        """
+        rows = np.flatnonzero(mine)
+        opens = opening[rows]
+        signed = np.where(opens, volume[rows], -volume[rows])
+        after = position + np.cumsum(signed)
+        if np.any(after < 0):
+            raise ValueError("Invalid position")
+        before = np.r_[position, after[:-1]]
+
+        # 空仓后的开仓开始新的一段持仓；逐段按开仓次序更新均价
+        segment = np.cumsum(opens & (before == 0))
+        open_rows = np.flatnonzero(opens)
+        rank = np.arange(len(open_rows)) - np.searchsorted(segment[open_rows], segment[open_rows])
+        average = np.empty(len(open_rows))
+        for k in range(int(rank.max()) + 1 if len(rank) else 0):
+            current = rank == k
+            if k == 0:
+                previous = np.where(segment[open_rows[current]] == 0, enter_price, 0)
+            else:
+                previous = average[np.flatnonzero(current) - 1]
+            i = open_rows[current]
+            average[current] = (previous * before[i] + price[rows[i]] * volume[rows[i]]) / (before[i] + volume[rows[i]])
+        held = np.r_[enter_price, average][np.cumsum(opens)]
+        held_after = np.where(after == 0, 0, held)
+
+        # 扩展到全部订单，另一方向的订单处沿用前值
+        count = np.cumsum(mine)
+        full_position = np.r_[position, after][count]
+        full_price = np.r_[enter_price, held_after][count]
+        closing_price = np.zeros(len(opening))
+        closing_price[rows] = held
+        return full_position, full_price, closing_price
+
     def get_historical_data(self, df, end_time, granularity, num_periods):
         """
         从指定时间开始，按时间粒度向前获取指定数量的数据
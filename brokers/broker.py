@@ -1,10 +1,18 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from abc import ABC, abstractmethod
 from LZCTrader.classes.order import Order
+from LZCTrader.tools.tickstore import COLUMNS
+from LZCTrader.tools.vectorized import bar_matrix
 
 
 class Broker(ABC):
+    # 交易记录服务，由LZCTrader在configure时设置
+    journal = None
+    # 各bot共享的指标缓存，由LZCTrader在configure时设置
+    indicator_cache = None
+
     @abstractmethod
     def place_order(self, order: Order) -> None:
         """Translate order and place via exchange API."""
@@ -37,3 +45,87 @@ class Broker(ABC):
     def clear_positions(self, instrument: str):
         return
 
+    def get_bar_matrix(self, instruments: list, granularity: str, count: int, current_time: datetime = None) -> dict:
+        """Candles of several instruments aligned on one time grid, for portfolio strategies.
+
+        Returns 'time', the start of the count bins ending with the bin of
+        current_time (or of the newest candle when it is None), and an
+        instruments x count array per OHLCV column, NaN where an instrument
+        has no candle. This default fetches the instruments one by one;
+        brokers with local data override it.
+        """
+        rows = []
+        for instrument in instruments:
+            if current_time is None:
+                candles = self.get_candles(instrument, granularity=granularity, count=count)
+            else:
+                candles = self.get_backtest_candles(instrument, granularity, count, current_time)
+            if candles is None or len(candles) == 0:
+                rows.append({'ts': np.empty(0, dtype=np.int64), **{column: np.empty(0) for column in COLUMNS}})
+            else:
+                rows.append({'ts': candles.index.asi8, **{column: candles[column].to_numpy() for column in COLUMNS}})
+        if current_time is not None:
+            end = pd.Timestamp(current_time).value
+        else:
+            stamps = [item['ts'].max() for item in rows if len(item['ts'])]
+            end = int(max(stamps)) if stamps else pd.Timestamp.now().value
+        return bar_matrix(rows, pd.Timedelta(granularity).value, count, end)
+
+    def flatten_all(self, instruments: list) -> dict:
+        for instrument in instruments:
+            self.clear_positions(instrument)
+        return {}
+
+    def preload_candles(self, requests: list, valid_until: float = None):
+        return
+
+    def warm_up(self, requests: list) -> None:
+        """Loads the history before the session for (instrument, granularity, count) windows.
+
+        Afterwards get_candles(..., cut_yesterday=True) fills a window that
+        has fewer than count candles of the session from that history.
+        """
+        return
+
+    def on_filled(self, order: Order, order_id, callback) -> None:
+        """Calls callback(volume) once with the volume filled of an order placed under order_id.
+
+        This default suits brokers that fill synchronously and return an id
+        only for orders they filled; order_id None means nothing was filled.
+        """
+        if order_id is not None:
+            callback(order.volume)
+
+    def latency_summary(self) -> dict:
+        return {}
+
+    def reset_latency(self) -> int:
+        return 0
+
+    def set_journal(self, journal) -> None:
+        self.journal = journal
+
+    def set_indicator_cache(self, cache) -> None:
+        self.indicator_cache = cache
+
+    def indicator(self, instrument: str, candles: pd.DataFrame, function, *params, granularity: str = None):
+        """function(candles['Close'] as an array, *params), shared through the indicator cache if one is set.
+
+        Bots computing the same indicator with the same parameters on the
+        same candles (e.g. several strategies on one instrument) compute it
+        once. granularity is that of the candles. The result must not be
+        modified.
+        """
+        if self.indicator_cache is None:
+            return function(candles['Close'].to_numpy(), *params)
+        return self.indicator_cache.get(instrument, candles, function, params, granularity=granularity)
+
+    def journal_trade(self, instrument: str, type: int, point, time: datetime = None, profit=None) -> None:
+        """Records a strategy's trade in the trade journal, if one is set.
+
+        type is 1 买开, 2 买平, 3 卖开, 4 卖平. time defaults to now; the
+        replay broker uses its virtual clock.
+        """
+        if self.journal is not None:
+            self.journal.trade(instrument, type, point, time=time, profit=profit)
+
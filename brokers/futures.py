@@ -1,5 +1,9 @@
 import os
-from LZCTrader.tools.utilities import read_yaml, extract_letters
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from LZCTrader.tools.utilities import read_yaml, extract_letters, session_cuts, session_start_row, SESSION_CUTS
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from brokers.broker import Broker
@@ -8,7 +12,7 @@ import API
 
 
 class Futures(Broker):
-    def __init__(self, enter_license: str, fc_code: str, account: str, password: str):
+    def __init__(self, enter_license: str, fc_code: str, account: str, password: str, base_url: str = None):
 
         self.lisence = enter_license
         self.account_id = account
@@ -19,16 +23,34 @@ class Futures(Broker):
         self.data_broker = self
         self.allow_dancing_bears = False
 
-        self.api = API.Context(lisence=self.lisence, fc_code=self.fc_code, user_id=self.account_id, password=self.password)
+        self.api = API.Context(lisence=self.lisence, fc_code=self.fc_code, user_id=self.account_id, password=self.password,
+                               base_url=base_url)
 
         self.long_position = 0
         self.short_position = 0
         self.timer_thread = None
 
+        # (instrument, granularity, count) -> (response, valid_until)，预取和刚取到的窗口在有效期内由所有bot共用
+        self._preloaded = {}
+        self._preload_lock = threading.Lock()
+        # 正在请求的窗口，相同的并发请求等待同一次结果
+        self._inflight = {}
+        # 取到的窗口在此秒数内供其他bot复用（多个策略交易同一品种时）
+        self.candle_ttl = 0.5
+        # (instrument, granularity) -> 开盘前取回的历史K线，见 warm_up
+        self._history = {}
+
+        # instrument -> (最新价, 取得时间)，由每次取到的行情更新
+        self.last_prices = {}
+        # 可选的行情记录器，见 set_recorder
+        self.recorder = None
+
         root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
         map_file_path = os.path.join(root_dir, "LZCTrader/tools/instrument_map")
         self.instrument_map = read_yaml(map_file_path + ".yaml")
+        # 品种 -> 交易时段切分时刻，供cut_yesterday使用
+        self.session_cuts = session_cuts(self.instrument_map)
 
     def __repr__(self):
         return "Futures Broker Interface"
@@ -48,10 +70,13 @@ class Futures(Broker):
 
         if count is not None:
 
-            response = self.api.instrument.candles(
-                instrument, granularity=granularity, count=count
-            )
-            data = self.response_to_df(response, cut_yesterday)
+            response = self._shared_candles(instrument, granularity, count)
+            data = self.response_to_df(response, cut_yesterday, instrument)
+            if cut_yesterday:
+                data = self._fill_from_history(instrument, granularity, count, data)
+            # 只有最新的窗口才更新最新价，历史区间查询不会覆盖它
+            if data is not None and len(data) > 0:
+                self.last_prices[instrument] = (float(data['Close'].iloc[data.index.argmax()]), time.time())
 
         else:
             # count is None
@@ -64,11 +89,140 @@ class Futures(Broker):
                 instrument, granularity=granularity, start_time=from_time, end_time=to_time
             )
 
-            data = self.response_to_df(response, cut_yesterday)
+            data = self.response_to_df(response, cut_yesterday, instrument)
+
+        if data is not None and len(data) > 0 and self.recorder is not None:
+            self.recorder.record(instrument, granularity, data)
 
         return data
 
-    def response_to_df(self, response, cut_yesterday):
+    def set_recorder(self, recorder):
+        """Attach a MarketRecorder that receives every tick and candle fetched."""
+        self.recorder = recorder
+
+    def last_price(self, instrument: str, max_age: float = 10) -> float:
+        """Latest price seen by get_candles, fetched again if older than max_age seconds."""
+        cached = self.last_prices.get(instrument)
+        if cached is not None and time.time() - cached[1] <= max_age:
+            return cached[0]
+        temp = self.get_candles(instrument, granularity="tick", count=1)
+        return float(temp.iloc[0]['Close'])
+
+    def preload_candles(self, requests: list, valid_until: float = None, max_workers: int = 8):
+        """Fetch many candle windows concurrently ahead of the first update.
+
+        Parameters
+        ----------
+        requests : list
+            (instrument, granularity, count) tuples.
+
+        valid_until : float, optional
+            Epoch time after which a preloaded window is considered stale and
+            is fetched again. The default is 10 seconds from now.
+
+        max_workers : int, optional
+            Number of concurrent requests. The default is 8.
+        """
+        if valid_until is None:
+            valid_until = time.time() + 10
+        requests = list(dict.fromkeys(requests))
+
+        def fetch(request):
+            instrument, granularity, count = request
+            return self.api.instrument.candles(instrument, granularity=granularity, count=count)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            responses = list(executor.map(fetch, requests))
+
+        with self._preload_lock:
+            for request, response in zip(requests, responses):
+                if response is not None:
+                    self._preloaded[request] = (response, valid_until)
+
+    def warm_up(self, requests: list, max_workers: int = 8) -> None:
+        """Fetches the history of many candle windows in one concurrent batch before the open.
+
+        Until the session has count candles of its own, get_candles(...,
+        cut_yesterday=True) fills the front of the window from this history
+        instead of returning a short one, so the strategies' indicators are
+        fully formed from the first update without extra requests. Tick
+        windows are skipped.
+
+        Parameters
+        ----------
+        requests : list
+            (instrument, granularity, count) tuples.
+
+        max_workers : int, optional
+            Number of concurrent requests. The default is 8.
+        """
+        counts = {}
+        for instrument, granularity, count in requests:
+            if granularity != 'tick':
+                counts[(instrument, granularity)] = max(count, counts.get((instrument, granularity), 0))
+
+        def fetch(item):
+            (instrument, granularity), count = item
+            try:
+                response = self.api.instrument.candles(instrument, granularity=granularity, count=count)
+                return self.response_to_df(response, False)
+            except Exception as e:
+                print(f"Warm-up of {instrument} {granularity} failed: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(fetch, counts.items()))
+        self._history = {key: frame.sort_index() for key, frame in zip(counts, frames) if frame is not None and len(frame) > 0}
+
+    def _fill_from_history(self, instrument, granularity, count, data):
+        """data with its front filled from the warm-up history up to count candles."""
+        history = self._history.get((instrument, granularity))
+        if history is None or data is None or len(data) >= count:
+            return data
+        if len(data) > 0:
+            history = history[history.index < data.index.min()]
+        if len(history) == 0:
+            return data
+        history = history.iloc[-(count - len(data)):]
+        if len(data) > 1 and data.index[0] > data.index[-1]:
+            # 由近到远的窗口，历史补在末尾，顺序与接口返回的一致
+            return pd.concat([data, history.iloc[::-1]])
+        return pd.concat([history, data])
+
+    def _shared_candles(self, instrument, granularity, count):
+        """The response of one candle window, fetched once for all bots asking for it at about the same time.
+
+        A preloaded or recently fetched window is reused until it goes
+        stale, and a request for a window already being fetched waits for
+        that fetch instead of sending its own.
+        """
+        key = (instrument, granularity, count)
+        with self._preload_lock:
+            entry = self._preloaded.get(key)
+            if entry is not None and time.time() <= entry[1]:
+                return entry[0]
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[key] = Future()
+        if not owner:
+            return pending.result()
+
+        try:
+            response = self.api.instrument.candles(instrument, granularity=granularity, count=count)
+        except Exception as e:
+            with self._preload_lock:
+                self._inflight.pop(key, None)
+            pending.set_exception(e)
+            raise
+        with self._preload_lock:
+            self._inflight.pop(key, None)
+            if response is not None and self.candle_ttl > 0:
+                self._preloaded[key] = (response, time.time() + self.candle_ttl)
+        pending.set_result(response)
+        return response
+
+    def response_to_df(self, response, cut_yesterday, instrument: str = None):
         """将API响应转换为Pandas DataFrame的函数。"""
         try:
             candles = response
@@ -104,29 +258,16 @@ class Futures(Broker):
         dataframe.index = pd.to_datetime(times, format='ISO8601')
 
         if cut_yesterday:
-            hours = dataframe.index.hour
-            get_morning = (hours >= 8) & (hours <= 16)  # 8:00 - 16:00
-            get_night = ((hours >= 20) & (hours <= 23)) | ((hours >= 0) & (hours <= 5))  # 20:00 - 5:00
-
-            # 检查是否同时包含 morning 和 night 数据
-            has_morning = any(get_morning)
-            has_night = any(get_night)
-
-            if has_morning and has_night:
-                # 如果同时存在，则根据当前时间决定保留哪一组
-                current_hour = pd.Timestamp.now().hour  # 获取当前时间的小时
-                if 8 <= current_hour <= 16:
-                    selected_group = dataframe[get_morning]  # 当前是早上，保留 morning 数据
-                else:
-                    selected_group = dataframe[get_night]  # 当前是晚上，保留 night 数据
-            elif has_morning:
-                selected_group = dataframe[get_morning]  # 只有 morning 数据
-            elif has_night:
-                selected_group = dataframe[get_night]  # 只有 night 数据
-            else:
-                raise ValueError("Wrong Data!")  # 都不满足，返回完整数据
-
-            return selected_group
+            # 只保留最后一根K线所在交易时段的数据，时段边界按品种是否有夜盘预先算好
+            index = dataframe.index
+            wall = (index.tz_localize(None) if index.tz is not None else index).asi8
+            ordered = wall if index.is_monotonic_increasing else np.sort(wall)
+            cuts = self.session_cuts.get(extract_letters(instrument) if instrument else None, SESSION_CUTS)
+            start = session_start_row(ordered, cuts)
+            if start == 0:
+                return dataframe
+            # 保持接口返回的顺序（实盘接口为由近到远），只去掉时段起点之前的K线
+            return dataframe[wall >= ordered[start]]
 
         return dataframe
 
@@ -193,6 +334,118 @@ class Futures(Broker):
             self.clear_position(instrument, exchange, direction, ydPosition, tdPosition)
         return
     
+    def flatten_all(self, instruments: list, timeout: float = 10, retries: int = 3, max_workers: int = 8) -> dict:
+        """Close every position of several instruments at once.
+
+        Each instrument's position is queried and its close orders are
+        priced from a fresh tick concurrently; an instrument whose query or
+        tick fails does not hold up the others and is retried in the next
+        round. The orders are submitted concurrently and their fills are
+        confirmed from the SSE trade stream. Close
+        orders not filled within timeout are cancelled and what is still
+        open is closed again from a new tick, three ticks further through
+        the market each round.
+
+        Parameters
+        ----------
+        instruments : list
+            The instruments to flatten.
+
+        timeout : float, optional
+            Seconds to wait for fill confirmations in each round. The default is 10.
+
+        retries : int, optional
+            Rounds of close orders before giving up. The default is 3.
+
+        max_workers : int, optional
+            Number of concurrent requests. The default is 8.
+
+        Returns
+        -------
+        dict
+            instrument -> list of order ids of the last round that were not
+            confirmed filled (None for orders rejected on submission, and for
+            instruments whose close orders could not be priced).
+        """
+        instruments = list(dict.fromkeys(instruments))
+        unfilled = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for attempt in range(retries):
+                unfilled = self._close_round(executor, instruments, timeout, slippage=3 * (attempt + 1))
+                if not unfilled:
+                    return {}
+                for instrument, ids in unfilled.items():
+                    print(f"Close orders of {instrument} not confirmed filled within {timeout}s: {ids}")
+                if attempt == retries - 1:
+                    break
+
+                # 撤掉未成交的平仓单，等撤单回报后按剩余仓位重新平仓
+                order_ids = [order_id for ids in unfilled.values() for order_id in ids if order_id is not None]
+                list(executor.map(self.cancel_order, order_ids))
+                records = [self.order_tracker.get(order_id) for order_id in order_ids]
+                wait([record.future for record in records if record is not None], timeout=timeout)
+                instruments = list(unfilled)
+
+        for instrument in unfilled:
+            print(f"FAILED to flatten {instrument} after {retries} rounds of close orders, check its position!")
+        return unfilled
+
+    def _close_round(self, executor, instruments, timeout, slippage):
+        """Submits close orders for every open position and returns instrument -> ids not filled within timeout."""
+        batches = executor.map(lambda instrument: self._instrument_close_orders(instrument, slippage), instruments)
+
+        close_orders = []
+        unfilled = {}
+        for instrument, orders in zip(instruments, batches):
+            if orders is None:
+                # 取仓位或定价失败的品种计入未平，下一轮重试，其他品种照常平仓
+                unfilled[instrument] = [None]
+            else:
+                close_orders.extend(orders)
+
+        order_ids = list(executor.map(self._submit_close_order, close_orders))
+
+        pending = {}
+        for order, order_id in zip(close_orders, order_ids):
+            record = self.order_tracker.get(order_id) if order_id is not None else None
+            if record is None:
+                print(f"Close order for {order.instrument} was rejected")
+                unfilled.setdefault(order.instrument, []).append(order_id)
+                continue
+            pending[record.future] = (order.instrument, order_id)
+
+        done, not_done = wait(pending, timeout=timeout)
+        for future, (instrument, order_id) in pending.items():
+            # 撤单或被拒的平仓单同样需要重新平仓
+            if future in not_done or future.result().status != 'filled':
+                unfilled.setdefault(instrument, []).append(order_id)
+        return unfilled
+
+    def _instrument_close_orders(self, instrument, slippage):
+        """Close orders for every open position of one instrument, or None if its position or price could not be fetched."""
+        try:
+            close_orders = []
+            for positions_information in self.get_positions(instrument) or []:
+                exchange = positions_information["exchange"]
+                direction = 3 if positions_information["direction"] == 2 else 2
+                if positions_information["tdPosition"] > 0:
+                    close_orders.append(self.close_position(
+                        instrument, exchange, direction, 4, positions_information["tdPosition"], slippage))
+                if positions_information["ydPosition"] > 0:
+                    close_orders.append(self.close_position(
+                        instrument, exchange, direction, 5, positions_information["ydPosition"], slippage))
+            return close_orders
+        except Exception as e:
+            print(f"Pricing close orders of {instrument} failed: {e}")
+            return None
+
+    def _submit_close_order(self, order):
+        try:
+            return self.place_order(order)
+        except Exception as e:
+            print(f"Submitting close order for {order.instrument} failed: {e}")
+            return None
+
     def clear_position(self, instrument: str = None, exchange: str = 'SHFE', direction: int = 2, ydPosition: int = 0, tdPosition: int = 0):
         # ！！！！在多品种时，此函数需修改
         close_orders = []
@@ -204,7 +457,7 @@ class Futures(Broker):
             self.place_order(order)
         return
 
-    def close_position(self, instrument: str = None, exchange: str = 'SHFE', direction: int = 2, offset: int = 4, volume: int = 1):
+    def close_position(self, instrument: str = None, exchange: str = 'SHFE', direction: int = 2, offset: int = 4, volume: int = 1, slippage: int = 3):
         instrument_type = extract_letters(instrument)
         try:
             instrument_config = self.instrument_map[f'{instrument_type}']
@@ -213,9 +466,8 @@ class Futures(Broker):
         point_change = instrument_config['pointChange']
 
         if direction == 2:
-            temp = self.get_candles(instrument, granularity="tick", count=1)
-            kong_exit_point = temp.iloc[0]['Close'] + 3 * point_change
-            self.relog()
+            # 平仓价取自不超过1秒的最新价，加slippage跳保证成交
+            kong_exit_point = self.last_price(instrument, max_age=1) + slippage * point_change
             close_order = Order(
                 instrument=instrument,
                 direction=direction,
@@ -227,9 +479,7 @@ class Futures(Broker):
                 orderPriceType=1
             )
         elif direction == 3:
-            temp = self.get_candles(instrument, granularity="1s", count=1)
-            duo_exit_point = temp.iloc[0]['Close'] - 3 * point_change
-            self.relog()
+            duo_exit_point = self.last_price(instrument, max_age=1) - slippage * point_change
             close_order = Order(
                 instrument=instrument,
                 direction=direction,
@@ -251,8 +501,56 @@ class Futures(Broker):
 
         return response
 
-    def relog(self):
-        self.api.sse_client.login(self.password)
+    def cancel_order(self, order_id) -> bool:
+        try:
+            return self.api.order.cancel(order_id)
+        except Exception as e:
+            print(f"Cancel of order {order_id} failed: {e}")
+            return False
+
+    def on_filled(self, order: Order, order_id, callback) -> None:
+        """Calls callback(volume) once the order is filled, or cancelled/rejected after a partial fill, from the SSE trade stream."""
+        if order_id is None:
+            return
+
+        def filled(record, stage):
+            if stage in ('fill', 'cancelled', 'rejected') and record.filled_volume > 0:
+                callback(record.filled_volume)
+
+        try:
+            self.order_tracker.add_callback(order_id, filled)
+        except KeyError:
+            print(f"Order {order_id} is not tracked, its fills are not booked")
+
+    def relog(self) -> bool:
+        """Re-login only if the SSE stream reported the session as logged out.
+
+        Order submission already does this lazily, so strategies no longer need
+        to call it before building orders. If the stream itself died (its
+        listener stopped), it is reconnected first. Returns whether the
+        session is ready to trade.
+        """
+        sse_client = self.api.sse_client
+        if not sse_client.is_alive() and not sse_client.reconnect():
+            print("SSE stream could not be reconnected")
+            return False
+        return sse_client.ensure_login(self.password)
+
+    @property
+    def order_tracker(self):
+        return self.api.sse_client.order_tracker
+
+    def order_latency(self, order_id) -> dict:
+        """Submit -> response/ack/fill latencies (ms) of a single order."""
+        return self.order_tracker.latency(order_id)
+
+    def latency_summary(self) -> dict:
+        """Aggregate latency histograms of all orders sent in this session."""
+        return self.order_tracker.summary()
+
+    def reset_latency(self) -> int:
+        """Start a new session's statistics: drop finished order records and clear the histograms."""
+        return self.order_tracker.reset()
 
     def get_backtest_candles(self, instrument, granularity, count, current_time) :
         return None
@@ -0,0 +1,228 @@
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from brokers.broker import Broker
+from LZCTrader.classes.order import Order
+from LZCTrader.tools.recorder import COLUMNS, read_recorded
+
+
+class Replay(Broker):
+    """Replays recorded market data to the live strategy classes.
+
+    Candles and ticks are read from the segment files written by
+    MarketRecorder and served up to a virtual clock, which the caller moves
+    forward with set_time(). Every call of the live Broker interface
+    (get_candles, get_position, place_order) is answered from the recording,
+    so the strategies in strategies/ run unmodified.
+
+    Orders are filled immediately at the last recorded price if they are
+    marketable (a buy priced at or above it, a sell at or below it), and are
+    dropped otherwise.
+    """
+
+    # 逐笔/1s数据用于重建尚未走完的k线以及取最新价，按由细到粗的顺序查找
+    PRICE_GRANULARITIES = ['tick', '1s', '1min']
+
+    def __init__(self, record_dir: str, session_start: datetime) -> None:
+        """
+        Parameters
+        ----------
+        record_dir : str
+            The root directory of the recording (home_dir/record by default).
+
+        session_start : datetime
+            Start of the replayed session. cut_yesterday=True drops the data
+            recorded before it, and the virtual clock starts there.
+        """
+        self.record_dir = record_dir
+        self.session_start = pd.Timestamp(session_start)
+        self.now = self.session_start
+        self.trades = []
+        self._series = {}
+        self._books = {}
+        self._warm = set()  # warm_up过的 (instrument, granularity)
+        self._data_lock = threading.Lock()
+        self._order_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Replay Broker Interface ({self.record_dir})"
+
+    def __str__(self):
+        return "Replay Broker Interface"
+
+    def set_time(self, now: datetime) -> None:
+        """Moves the virtual clock."""
+        self.now = pd.Timestamp(now)
+
+    def journal_trade(self, instrument: str, type: int, point, time: datetime = None, profit=None) -> None:
+        # 交易记录使用虚拟时钟的时间
+        super().journal_trade(instrument, type, point, time=time or self.now.to_pydatetime(), profit=profit)
+
+    def warm_up(self, requests: list) -> None:
+        """Lets cut_yesterday windows of these (instrument, granularity, count) requests reach back before the session, as in live trading."""
+        self._warm = {(instrument, granularity) for instrument, granularity, _ in requests if granularity != 'tick'}
+
+    def _load(self, instrument, granularity):
+        key = (instrument, granularity)
+        series = self._series.get(key)
+        if series is None:
+            with self._data_lock:
+                series = self._series.get(key)
+                if series is None:
+                    # 只读取会话开始前一天起的数据，足够计算首批指标
+                    data = read_recorded(self.record_dir, instrument, granularity,
+                                         start=self.session_start - pd.Timedelta(days=1))
+                    data = data[~data.index.duplicated(keep='last')].sort_index()
+                    series = (data.index.asi8, data[COLUMNS].to_numpy(dtype=np.float64))
+                    self._series[key] = series
+        return series
+
+    def _visible(self, instrument, granularity, start_time=None):
+        """Rows recorded at or before the virtual clock (and at or after start_time)."""
+        ts, values = self._load(instrument, granularity)
+        end = np.searchsorted(ts, self.now.value, side='right')
+        begin = 0 if start_time is None else np.searchsorted(ts, pd.Timestamp(start_time).value, side='left')
+        return ts[begin:end], values[begin:end]
+
+    def _forming_bar(self, instrument, granularity, bar_ts):
+        """Rebuilds a bar that has not closed yet at the virtual clock from finer data."""
+        step = pd.Timedelta(granularity).value
+        for finer in self.PRICE_GRANULARITIES:
+            if finer == granularity or (finer != 'tick' and pd.Timedelta(finer).value >= step):
+                continue
+            ts, values = self._visible(instrument, finer, start_time=pd.Timestamp(bar_ts))
+            if len(ts) == 0:
+                continue
+            return np.array([values[0, 0], values[:, 1].max(), values[:, 2].min(), values[-1, 3], values[:, 4].sum()])
+        # 没有更细的记录：只能返回完整的k线
+        return None
+
+    def get_candles(
+            self,
+            instrument: str,
+            granularity: str = None,
+            count: int = None,
+            start_time: datetime = None,
+            end_time: datetime = None,
+            cut_yesterday: bool = False
+    ) -> pd.DataFrame:
+        if cut_yesterday:
+            start_time = max(self.session_start, pd.Timestamp(start_time)) if start_time is not None else self.session_start
+        ts, values = self._visible(instrument, granularity, start_time)
+        if end_time is not None:
+            keep = np.searchsorted(ts, pd.Timestamp(end_time).value, side='right')
+            ts, values = ts[:keep], values[:keep]
+
+        if granularity != 'tick' and len(ts) > 0 and ts[-1] + pd.Timedelta(granularity).value > self.now.value:
+            forming = self._forming_bar(instrument, granularity, ts[-1])
+            if forming is not None:
+                values = np.vstack([values[:-1], forming])
+
+        if count is not None:
+            ts, values = ts[-count:], values[-count:]
+            if cut_yesterday and len(ts) < count and (instrument, granularity) in self._warm:
+                # 会话开始前的记录补足窗口
+                past_ts, past_values = self._visible(instrument, granularity)
+                before = np.searchsorted(past_ts, pd.Timestamp(start_time).value, side='left')
+                first = max(before - (count - len(ts)), 0)
+                ts = np.concatenate([past_ts[first:before], ts])
+                values = np.vstack([past_values[first:before], values])
+        return pd.DataFrame(values, columns=COLUMNS, index=pd.to_datetime(ts))
+
+    def last_price(self, instrument: str) -> float:
+        for granularity in self.PRICE_GRANULARITIES:
+            ts, values = self._visible(instrument, granularity)
+            if len(ts) > 0:
+                return float(values[-1, 3])
+        raise ValueError(f"No recorded data for {instrument} before {self.now}")
+
+    def _book(self, instrument):
+        return self._books.setdefault(instrument, {
+            2: {'td': 0, 'yd': 0, 'cost': 0.0},
+            3: {'td': 0, 'yd': 0, 'cost': 0.0},
+            'points': 0.0,
+        })
+
+    def place_order(self, order: Order):
+        price = self.last_price(order.instrument)
+        if order.direction == 2:
+            marketable = order.price is None or order.price >= price
+        elif order.direction == 3:
+            marketable = order.price is None or order.price <= price
+        else:
+            raise ValueError(order.direction)
+        if not marketable:
+            print(f"[{self.now}] Replay order not filled: {order.instrument} price {order.price}, last {price}")
+            return
+
+        with self._order_lock:
+            book = self._book(order.instrument)
+            if order.offset == 1:
+                side = book[order.direction]
+                side['td'] += order.volume
+                side['cost'] += price * order.volume
+            elif order.offset in (4, 5):
+                # 买平平空仓，卖平平多仓
+                held = 3 if order.direction == 2 else 2
+                side = book[held]
+                bucket = 'td' if order.offset == 4 else 'yd'
+                if side[bucket] < order.volume:
+                    print(f"[{self.now}] Replay close rejected: {order.instrument} holds {side[bucket]}, close {order.volume}")
+                    return
+                total = side['td'] + side['yd']
+                avg_price = side['cost'] / total
+                side[bucket] -= order.volume
+                side['cost'] -= avg_price * order.volume
+                sign = 1 if held == 2 else -1
+                book['points'] += sign * (price - avg_price) * order.volume
+            else:
+                raise ValueError(order.offset)
+
+            self.trades.append({
+                'time': self.now,
+                'instrument': order.instrument,
+                'direction': order.direction,
+                'offset': order.offset,
+                'price': price,
+                'volume': order.volume,
+            })
+            # 成交的委托返回单号，未成交或被拒的返回None，与实盘接口一致
+            return str(len(self.trades))
+
+    def relog(self):
+        return True
+
+    def get_position(self, instrument: str) -> dict:
+        with self._order_lock:
+            book = self._book(instrument)
+            return {
+                "long_tdPosition": book[2]['td'],
+                "long_ydPosition": book[2]['yd'],
+                "short_tdPosition": book[3]['td'],
+                "short_ydPosition": book[3]['yd'],
+            }
+
+    def clear_positions(self, instrument: str):
+        position = self.get_position(instrument)
+        for direction, prefix in ((3, 'long'), (2, 'short')):
+            for offset, bucket in ((4, 'tdPosition'), (5, 'ydPosition')):
+                volume = position[f"{prefix}_{bucket}"]
+                if volume > 0:
+                    self.place_order(Order(instrument=instrument, direction=direction, offset=offset,
+                                           price=None, volume=volume, stopPrice=0, orderPriceType=1))
+
+    def get_backtest_candles(self, instrument, granularity, count, current_time):
+        return None
+
+    def summary(self) -> dict:
+        """Fills, realized points and open net position per instrument."""
+        with self._order_lock:
+            return {
+                instrument: {
+                    "trades": sum(1 for trade in self.trades if trade['instrument'] == instrument),
+                    "points": book['points'],
+                    "position": book[2]['td'] + book[2]['yd'] - book[3]['td'] - book[3]['yd'],
+                }
+                for instrument, book in self._books.items()
+            }
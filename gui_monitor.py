@@ -1,7 +1,7 @@
 import argparse
 import math
 import re
-from collections import Counter, defaultdict, deque
+from collections import Counter
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
@@ -14,8 +14,12 @@ try:
 except ImportError:
     yaml = None
 
+from LZCTrader.tools.analytics import cumulative_points
+from LZCTrader.tools.resultstore import ResultStore
+
 
 ROOT = Path(__file__).resolve().parent
+BACKTEST_RUNS = ROOT / "backtest_result" / "runs"
 BACKTEST_OVERALL = ROOT / "backtest_result" / "overall.txt"
 BACKTEST_TRADES = ROOT / "backtest_result" / "result.txt"
 LIVE_ORDER_BOOK = ROOT / "result" / "order_book.txt"
@@ -156,6 +160,30 @@ def parse_overall_results(path: Path):
     return groups
 
 
+def load_run_groups(store: ResultStore, run_ids: list):
+    """One group per stored backtest run, in the format of parse_overall_results."""
+    summary = store.summary(run_ids)
+    groups = []
+    for run_id in run_ids:
+        rows = summary.loc[run_id] if run_id in summary.index.get_level_values(0) else summary.iloc[:0]
+        groups.append(
+            {
+                "name": run_id,
+                "rows": [
+                    {"instrument": instrument, "balance": float(row.balance), "profit": float(row.point)}
+                    for instrument, row in rows.iterrows()
+                ],
+            }
+        )
+    return groups
+
+
+def load_run_trades(store: ResultStore, run_id: str):
+    """The trade ledger of a stored run, in the format of parse_backtest_trades."""
+    trades = store.trades(run_id)
+    return trades[["timestamp", "instrument", "action", "direction", "price"]].sort_values("timestamp").reset_index(drop=True)
+
+
 def parse_backtest_trades(path: Path):
     cols = ["timestamp", "instrument", "action", "direction", "price"]
     if not path.exists():
@@ -215,24 +243,7 @@ def parse_live_order_book(path: Path):
 
 
 def build_cumulative_pnl(trades: pd.DataFrame):
-    if trades.empty:
-        return pd.DataFrame(columns=["timestamp", "cumulative_points"])
-    open_positions = defaultdict(lambda: {"long": deque(), "short": deque()})
-    points = []
-    total = 0.0
-    for row in trades.itertuples(index=False):
-        book = open_positions[row.instrument]
-        if row.action == "open":
-            book[row.direction].append(row.price)
-            continue
-        if row.direction == "long" and book["long"]:
-            entry = book["long"].popleft()
-            total += row.price - entry
-        elif row.direction == "short" and book["short"]:
-            entry = book["short"].popleft()
-            total += entry - row.price
-        points.append({"timestamp": row.timestamp, "cumulative_points": total})
-    return pd.DataFrame(points)
+    return cumulative_points(trades)
 
 
 def compute_overview(groups, trades, live_orders):
@@ -263,14 +274,21 @@ def file_status_row(path: Path):
 
 
 def load_monitor_data():
-    groups = parse_overall_results(BACKTEST_OVERALL)
-    trades = parse_backtest_trades(BACKTEST_TRADES)
+    store = ResultStore(str(BACKTEST_RUNS))
+    run_ids = store.run_ids()
+    if run_ids:
+        groups = load_run_groups(store, run_ids)
+        trades = load_run_trades(store, run_ids[-1])
+        backtest_rows = [dict(file_status_row(BACKTEST_RUNS / run_ids[-1] / "meta.json"), name=run_ids[-1])]
+    else:
+        # 旧版本回测写出的文本结果
+        groups = parse_overall_results(BACKTEST_OVERALL)
+        trades = parse_backtest_trades(BACKTEST_TRADES)
+        backtest_rows = [file_status_row(BACKTEST_OVERALL), file_status_row(BACKTEST_TRADES)]
     live_orders = parse_live_order_book(LIVE_ORDER_BOOK)
     live_cfg = read_yaml(LIVE_CONFIG)
     backtest_cfg = read_yaml(BACKTEST_CONFIG)
-    status_rows = [
-        file_status_row(BACKTEST_OVERALL),
-        file_status_row(BACKTEST_TRADES),
+    status_rows = backtest_rows + [
         file_status_row(LIVE_ORDER_BOOK),
         file_status_row(LIVE_CONFIG),
         file_status_row(BACKTEST_CONFIG),
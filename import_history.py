@@ -0,0 +1,81 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from LZCTrader.tools.tickstore import COLUMNS, TickStore
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_STORE = ROOT / "store"
+SUFFIXES = (".txt", ".csv")
+
+
+def find_files(paths):
+    """Every .txt/.csv file under the given files or directories, sorted."""
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files.extend(p for p in path.rglob("*") if p.suffix.lower() in SUFFIXES)
+        elif path.suffix.lower() in SUFFIXES:
+            files.append(path)
+    return sorted(set(files))
+
+
+def parse_file(path: Path) -> pd.DataFrame:
+    """Reads one candle file with a datetime first column and OHLC(V) columns."""
+    data = pd.read_csv(path, index_col=0)
+    data.columns = [str(column).strip().capitalize() for column in data.columns]
+    missing = [column for column in COLUMNS[:4] if column not in data.columns]
+    if missing:
+        raise ValueError(f"{path}: missing columns {missing}")
+    if "Volume" not in data.columns:
+        data["Volume"] = 0.0
+    data.index = pd.to_datetime(data.index, format="ISO8601")
+    return data[COLUMNS].astype(float).dropna()
+
+
+def import_files(files, store: TickStore, granularity: str, instrument: str = None, workers: int = None) -> dict:
+    """Parses files in parallel and merges them into the store, grouped by instrument.
+
+    The instrument of a file is its parent directory name (data_source/rb2510/2025-07-01.txt)
+    unless given explicitly. Returns instrument -> number of rows imported.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(parse_file, files))
+
+    grouped = {}
+    for path, frame in zip(files, frames):
+        grouped.setdefault(instrument or path.parent.name, []).append(frame)
+
+    imported = {}
+    for name, parts in grouped.items():
+        # TickStore.write 会按时间排序并去重
+        imported[name] = store.write(name, granularity, pd.concat(parts))
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import CSV/text candle files into the local market-data store")
+    parser.add_argument("paths", nargs="+", type=Path, help="Files or directories (searched recursively) to import.")
+    parser.add_argument("--granularity", default="1min", help="Granularity of the imported candles, e.g. 1s or 1min. The default is 1min.")
+    parser.add_argument("--instrument", help="Instrument of every file. The default is each file's parent directory name.")
+    parser.add_argument("--store", type=Path, default=DEFAULT_STORE, help=f"Store directory. The default is {DEFAULT_STORE}.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of parsing processes.")
+    args = parser.parse_args()
+
+    files = find_files(args.paths)
+    if not files:
+        print("No .txt or .csv files found")
+        return
+    imported = import_files(files, TickStore(str(args.store)), args.granularity, args.instrument, args.workers)
+    for instrument, rows in sorted(imported.items()):
+        print(f"{instrument}: {rows} rows")
+    print(f"Imported {len(files)} files into {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ zc.configure(broker_name='futures',  # 期货券商接口，目前有'future',
              trade_type='within')  # 交易类型，日内为'within'，日间为'across'。选择日内交易时，会在休市前平掉单日所有仓。日间则不会。
 
 zc.set_preliminary_select('preliminary')  # 此处引入初筛策略。注意：必须和初筛策略py文件的命名严格一致
-zc.set_strategy('mafast')  # 此处引入策略。注意：必须和交易策略py文件的命名严格一致
+zc.set_strategy('mafast')  # 此处引入策略。注意：必须和交易策略py文件的命名严格一致。同时运行多个策略时传入列表，如['mabd', 'eaglebd']
 zc.run()
 
 # 此为系统主运行文件。以上的所有函数，均为必需。
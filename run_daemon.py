@@ -0,0 +1,15 @@
+from LZCTrader.lzctrader import LZCTrader
+
+zc = LZCTrader()
+zc.configure(broker_name='futures',  # 期货券商接口，目前有'future',‘backtest’两个选项
+             mode='virtualtrading',  # 模式选择，虚拟为'virtualtrading'，实盘为'realtrading'
+             enter_license='',  # 登录通行证
+             account='',  # 账号。虚拟盘中，为simnow投资者代码
+             password='',  # 密码
+             trade_type='within')  # 交易类型，日内为'within'，日间为'across'。选择日内交易时，会在休市前平掉单日所有仓。日间则不会。
+
+zc.set_preliminary_select('preliminary')  # 此处引入初筛策略。注意：必须和初筛策略py文件的命名严格一致
+zc.set_strategy('mafast')  # 此处引入策略。注意：必须和交易策略py文件的命名严格一致。同时运行多个策略时传入列表，如['mabd', 'eaglebd']
+zc.daemon(warmup=120)  # 常驻运行，每个交易日的日盘、夜盘开盘前warmup秒完成登录检查、建bot和行情预取，开盘准点开始交易
+
+# 此为常驻运行文件，可代替day_and_night.py定时启动run.py。按Ctrl+C退出。
@@ -0,0 +1,15 @@
+from LZCTrader.lzctrader import LZCTrader
+
+zc = LZCTrader()
+zc.configure(broker_name='replay',  # 回放券商接口，读取实盘时记录的行情（record_market_data=True）
+             mode='replay',  # 模式选择，回放为'replay'
+             replay_start_time='1/7/2025 21:00',  # 回放的交易时段开始时间
+             replay_end_time='2/7/2025 02:30',  # 回放的交易时段结束时间
+             replay_speed=0,  # 虚拟时钟最快为真实时间的多少倍，0为不限速
+             trade_type='within')  # 交易类型，日内为'within'，日间为'across'
+
+zc.set_preliminary_select('preliminary')  # 此处引入初筛策略。注意：必须和初筛策略py文件的命名严格一致
+zc.set_strategy('mafast')  # 此处引入策略，策略文件无需修改
+zc.replay()
+
+# 此为回放运行文件。以上的所有函数，均为必需。
@@ -1,7 +1,6 @@
 import os
-import threading
 import pandas as pd
-from finta import TA
+from LZCTrader.indicators import bdwz_lines
 from datetime import datetime
 from LZCTrader.strategy import Strategy
 from brokers.broker import Broker
@@ -17,6 +16,8 @@ class BDWZ(Strategy):
     2. 做多条件：生命线为红
     """
 
+    indicator_methods = ('min_generate_features',)
+
     def __init__(
         self, instrument: str, exchange: str, point_change: float, parameters: dict, broker: Broker
     ) -> None:
@@ -45,48 +46,27 @@ class BDWZ(Strategy):
         self.trade_offset = self.trade_offset * self.point_change
 
         self.cooling_count = self.cooling_count_num
-        self.lock = threading.Lock()
         self.profit = 0
         self.dt = None
         self.current_point = 0
         self.avg = 0
         self.cooling = 0
 
+    def history_requests(self):
+        # 每次运行generate_signal时所取的k线窗口 (granularity, count)，启动时会一次性预取
+        return [("1min", 30), ("tick", 1), ("1s", 5)]
+
     def min_generate_features(self, data: pd.DataFrame):
         # 在此函数中，根据传入参数data，计算出你策略所需的MA，EMA等指标
-        if len(data) < 2*self.params["medium_ema_period"]:
-            if len(data) < 2:
-                empty_series = pd.Series(dtype=float, index=data.index)
-                return empty_series, empty_series, empty_series, empty_series
-            else:
-                ema_long = TA.EMA(data, len(data))
-                ema_medium = TA.EMA(data, len(data)//2)
-                ema_short = TA.EMA(data, len(data)//4)
-                temp_df = pd.DataFrame({
-                    'close': ema_medium,
-                    'open': ema_medium,
-                    'high': ema_medium,  # 补充high
-                    'low': ema_medium  # 补充low
-                })
-                life = TA.EMA(temp_df, len(data))
-                life = life.squeeze()
-                return ema_long, ema_medium, ema_short, life
-
-        ema_long = TA.EMA(data, self.params["long_ema_period"])
-        ema_medium = TA.EMA(data, self.params["medium_ema_period"])
-        ema_short = TA.EMA(data, self.params["short_ema_period"])
-
-        # ema = ema_medium.to_frame()
-        temp_df = pd.DataFrame({
-            'close': ema_medium,
-            'open': ema_medium,
-            'high': ema_medium,  # 补充high
-            'low': ema_medium  # 补充low
-        })
-        life = TA.EMA(temp_df, self.params["medium_ema_period"])
-        life = life.squeeze()
-
-        return ema_long, ema_medium, ema_short, life
+        return self.broker.indicator(
+            self.instrument,
+            data,
+            bdwz_lines,
+            self.params["long_ema_period"],
+            self.params["medium_ema_period"],
+            self.params["short_ema_period"],
+            granularity="1min"
+        )
 
     def generate_signal(self, dt: datetime):
         # 此为函数主体，根据指标进行计算，产生交易信号并下单，程序只会调用这一个函数进行不断循环
@@ -101,12 +81,12 @@ class BDWZ(Strategy):
 
         ema_long, ema_medium, ema_short, life_line = self.min_generate_features(min_data)
 
-        RED = life_line.iloc[-1] > life_line.iloc[-2]
-        BLUE = life_line.iloc[-1] < life_line.iloc[-2]
-        AA = ema_short.iloc[-1] > ema_long.iloc[-1]
-        BB = ema_short.iloc[-1] < ema_long.iloc[-1]
-        AAPLUS = ema_short.iloc[-1] > ema_long.iloc[-1] + self.add
-        BBPLUS = ema_short.iloc[-1] < ema_long.iloc[-1] - self.add
+        RED = life_line[-1] > life_line[-2]
+        BLUE = life_line[-1] < life_line[-2]
+        AA = ema_short[-1] > ema_long[-1]
+        BB = ema_short[-1] < ema_long[-1]
+        AAPLUS = ema_short[-1] > ema_long[-1] + self.add
+        BBPLUS = ema_short[-1] < ema_long[-1] - self.add
         WHITE = (AA and BLUE) or (BB and RED)
 
         temp = self.broker.get_candles(instrument=self.instrument, granularity="tick", count=1, cut_yesterday=True)
@@ -127,9 +107,9 @@ class BDWZ(Strategy):
         self.avg = avg
 
         if self.kong_flag or self.duo_flag:
-            new_orders.extend(self.dynamic_stop(life_line.iloc[-1]))
+            new_orders.extend(self.dynamic_stop(life_line[-1]))
 
-        print(f"{self.instrument} life {life_line.iloc[-1]}")
+        print(f"{self.instrument} life {life_line[-1]}")
 
         if self.duo_stopping:
             print(f"remaining count {self.cooling_count}")
@@ -143,7 +123,6 @@ class BDWZ(Strategy):
             if self.kong_flag:
                 print(f"{self.instrument} CLOSING SHORT! enter: {self.kong_enter_point} exit: {current_point}")
                 kong_exit_point = current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -162,7 +141,6 @@ class BDWZ(Strategy):
             if self.duo_flag:
                 print(f"{self.instrument} CLOSING LONG! enter: {self.duo_enter_point} exit: {current_point}")
                 duo_exit_point = current_point - self.trade_offset
-                self.broker.relog()
                 # 做空信号
                 new_order = Order(
                     instrument=self.instrument,
@@ -183,7 +161,6 @@ class BDWZ(Strategy):
             if self.kong_flag:
                 print(f"{self.instrument} CLOSING SHORT! enter: {self.kong_enter_point} exit: {current_point}")
                 kong_exit_point = current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -203,11 +180,10 @@ class BDWZ(Strategy):
                 if self.duo_stopping:
                     self.cooling_count = self.cooling_count - 1
                 else:
-                    if self.current_point > life_line.iloc[-1] + self.above and AAPLUS:
+                    if self.current_point > life_line[-1] + self.above and AAPLUS:
                         print(f"{self.instrument} OPENING LONG! enter: {current_point}")
                         self.duo_enter_point = current_point
                         duo_enter_point = self.duo_enter_point + self.trade_offset
-                        self.broker.relog()
                         new_order = Order(
                             instrument=self.instrument,
                             exchange=self.symbol_exchange,
@@ -225,7 +201,6 @@ class BDWZ(Strategy):
             if self.duo_flag:
                 print(f"{self.instrument} CLOSING LONG! enter: {self.duo_enter_point} exit: {current_point}")
                 duo_exit_point = current_point - self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -245,12 +220,11 @@ class BDWZ(Strategy):
                 if self.kong_stopping:
                     self.cooling_count = self.cooling_count - 1
                 else:
-                    if self.current_point < life_line.iloc[-1] - self.above and BBPLUS:
+                    if self.current_point < life_line[-1] - self.above and BBPLUS:
                         print(f"{self.instrument} OPENING SHORT! enter: {current_point}")
                         self.kong_enter_point = current_point
                         kong_enter_point = self.kong_enter_point - self.trade_offset
                         # 做空信号
-                        self.broker.relog()
                         new_order = Order(
                             instrument=self.instrument,
                             exchange=self.symbol_exchange,
@@ -278,7 +252,6 @@ class BDWZ(Strategy):
                 print(f"{self.instrument} STOPPING LONG! enter: {self.duo_enter_point} exit: {self.current_point}")
 
                 duo_exit_point = self.current_point - self.trade_offset
-                self.broker.relog()
                 # 做空信号
                 new_order = Order(
                     instrument=self.instrument,
@@ -305,7 +278,6 @@ class BDWZ(Strategy):
                 print(f"{self.instrument} STOPPING SHORT! enter: {self.kong_enter_point} exit: {self.current_point}")
 
                 kong_exit_point = self.current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -327,21 +299,7 @@ class BDWZ(Strategy):
         return new_orders
 
     def write_order(self, type, point):
-        now = datetime.now().strftime("%m-%d %H:%M:%S")
-        if type == 1:  # 买开
-            line = f"{now} {self.instrument}，买开，{point}，profit {self.profit} \n"
-        elif type == 2:  # 买平
-            line = f"{now} {self.instrument}，买平，{point}，profit {self.profit}  \n"
-        elif type == 3:  # 卖开
-            line = f"{now} {self.instrument}，卖开，{point}，profit {self.profit}  \n"
-        elif type == 4:  # 卖平
-            line = f"{now} {self.instrument}，卖平，{point}，profit {self.profit} \n"
-        else:
-            raise ValueError("Invalid type")
-
-        with self.lock:
-            with open(r"H:\Quant_Proj\LZCTrader/result/order_book.txt", "a", encoding="utf-8") as f:
-                f.write(line)
+        self.broker.journal_trade(self.instrument, type, point, profit=self.profit)
 
     def reset(self):
         pass
@@ -1,6 +1,5 @@
-import threading
 import pandas as pd
-from finta import TA
+from LZCTrader.indicators import bdwz_lines
 from datetime import datetime
 from LZCTrader.strategy import Strategy
 from brokers.broker import Broker
@@ -16,8 +15,10 @@ class EAGLEBD(Strategy):
     2. 做多条件：生命线为红
     """
 
+    indicator_methods = ('min_generate_features',)
+
     def __init__(
-        self, instrument: str, exchange: str, parameters: dict, broker: Broker
+        self, instrument: str, exchange: str, point_change: float, parameters: dict, broker: Broker
     ) -> None:
         self.name = "EAGLEBD Strategy"
         self.params = parameters
@@ -31,50 +32,30 @@ class EAGLEBD(Strategy):
         self.kong_enter_bottom = 0
         self.trade_num = 10  # 交易手数
         self.symbol_exchange = exchange  # 交易所
+        self.point_change = point_change
         self.trade_offset = 3  # 取买几卖几
         self.duo_stopping = False
         self.kong_stopping = False
         self.above = 6
         self.cooling_count_num = 40
         self.cooling_count = self.cooling_count_num
-        self.lock = threading.Lock()
         self.profit = 0
 
+    def history_requests(self):
+        # 每次运行generate_signal时所取的k线窗口 (granularity, count)，启动时会一次性预取
+        return [("1min", 30), ("1s", 1), ("1s", 5), ("1min", 1)]
+
     def min_generate_features(self, data: pd.DataFrame):
         # 在此函数中，根据传入参数data，计算出你策略所需的MA，EMA等指标
-        if len(data) < 2*self.params["medium_ema_period"]:
-            if len(data) < 2:
-                empty_series = pd.Series(dtype=float, index=data.index)
-                return empty_series, empty_series, empty_series, empty_series
-            else:
-                ema_long = TA.EMA(data, len(data))
-                ema_medium = TA.EMA(data, len(data)//2)
-                ema_short = TA.EMA(data, len(data)//4)
-                temp_df = pd.DataFrame({
-                    'close': ema_medium,
-                    'open': ema_medium,
-                    'high': ema_medium,  # 补充high
-                    'low': ema_medium  # 补充low
-                })
-                life = TA.EMA(temp_df, len(data))
-                life = life.squeeze()
-                return ema_long, ema_medium, ema_short, life
-
-        ema_long = TA.EMA(data, self.params["long_ema_period"])
-        ema_medium = TA.EMA(data, self.params["medium_ema_period"])
-        ema_short = TA.EMA(data, self.params["short_ema_period"])
-
-        # ema = ema_medium.to_frame()
-        temp_df = pd.DataFrame({
-            'close': ema_medium,
-            'open': ema_medium,
-            'high': ema_medium,  # 补充high
-            'low': ema_medium  # 补充low
-        })
-        life = TA.EMA(temp_df, self.params["medium_ema_period"])
-        life = life.squeeze()
-
-        return ema_long, ema_medium, ema_short, life
+        return self.broker.indicator(
+            self.instrument,
+            data,
+            bdwz_lines,
+            self.params["long_ema_period"],
+            self.params["medium_ema_period"],
+            self.params["short_ema_period"],
+            granularity="1min"
+        )
 
     def generate_signal(self, dt: datetime):
         # 此为函数主体，根据指标进行计算，产生交易信号并下单，程序只会调用这一个函数进行不断循环
@@ -92,15 +73,15 @@ class EAGLEBD(Strategy):
         position_dict = self.broker.get_position(self.instrument)
         print(f"{self.instrument} position", position_dict["long_tdPosition"], position_dict["long_ydPosition"], position_dict["short_tdPosition"], position_dict["short_ydPosition"] )
 
-        print("life -1 life -2", life_line.iloc[-1], life_line.iloc[-2])
+        print("life -1 life -2", life_line[-1], life_line[-2])
         print(f"{self.instrument}", min_data[-1:])
 
-        RED = life_line.iloc[-1] > life_line.iloc[-2]
-        BLUE = life_line.iloc[-1] < life_line.iloc[-2]
-        AA = ema_short.iloc[-1] > ema_long.iloc[-1]
-        BB = ema_short.iloc[-1] < ema_long.iloc[-1]
-        AAPLUS = ema_short.iloc[-1] > ema_long.iloc[-1] + 2.5
-        BBPLUS = ema_short.iloc[-1] < ema_long.iloc[-1] - 2.5
+        RED = life_line[-1] > life_line[-2]
+        BLUE = life_line[-1] < life_line[-2]
+        AA = ema_short[-1] > ema_long[-1]
+        BB = ema_short[-1] < ema_long[-1]
+        AAPLUS = ema_short[-1] > ema_long[-1] + 2.5
+        BBPLUS = ema_short[-1] < ema_long[-1] - 2.5
         WHITE = (AA and BLUE) or (BB and RED)
 
         temp = self.broker.get_candles(self.instrument, granularity="1s", count=1)
@@ -111,7 +92,7 @@ class EAGLEBD(Strategy):
         now_life = avg_life.mean()
 
         if self.kong_flag or self.duo_flag:
-            new_orders.append(self.dynamic_stop(life_line.iloc[-1]))
+            new_orders.append(self.dynamic_stop(life_line[-1]))
 
         if self.duo_stopping:
             print("remain", self.cooling_count)
@@ -126,9 +107,8 @@ class EAGLEBD(Strategy):
             self.kong_stopping = False
             if self.kong_flag:
                 print("开始平空仓！！！！！！！！！！！")
-                print("life_line.iloc[-1] > life_line.iloc[-2]", life_line.iloc[-1], life_line.iloc[-2])
-                print("ema_short.iloc[-1] > ema_long.iloc[-1]", ema_short.iloc[-1], ema_long.iloc[-1])
-                self.broker.relog()
+                print("life_line[-1] > life_line[-2]", life_line[-1], life_line[-2])
+                print("ema_short[-1] > ema_long[-1]", ema_short[-1], ema_long[-1])
                 kong_exit_point = current_point + self.trade_offset
                 print("kong exit point", current_point)
                 new_order = Order(
@@ -149,9 +129,8 @@ class EAGLEBD(Strategy):
                 self.write_order(type=4, point=current_point)
             if self.duo_flag:
                 print("开始平多仓！！！！！！！！！！！")
-                print("life_line.iloc[-1] < life_line.iloc[-2]", life_line.iloc[-1], life_line.iloc[-2])
-                print("ema_short.iloc[-1] < ema_long.iloc[-1]", ema_short.iloc[-1], ema_long.iloc[-1])
-                self.broker.relog()
+                print("life_line[-1] < life_line[-2]", life_line[-1], life_line[-2])
+                print("ema_short[-1] < ema_long[-1]", ema_short[-1], ema_long[-1])
                 duo_exit_point = current_point - self.trade_offset
                 print("duo exit point", current_point)
                 # 做空信号
@@ -176,9 +155,8 @@ class EAGLEBD(Strategy):
                 self.kong_stopping = False
             if self.kong_flag:
                 print("开始平空仓！！！！！！！！！！！")
-                print("life_line.iloc[-1] > life_line.iloc[-2]", life_line.iloc[-1], life_line.iloc[-2])
-                print("ema_short.iloc[-1] > ema_long.iloc[-1]", ema_short.iloc[-1], ema_long.iloc[-1])
-                self.broker.relog()
+                print("life_line[-1] > life_line[-2]", life_line[-1], life_line[-2])
+                print("ema_short[-1] > ema_long[-1]", ema_short[-1], ema_long[-1])
                 kong_exit_point = current_point + self.trade_offset
                 print("kong exit point", current_point)
                 new_order = Order(
@@ -201,12 +179,11 @@ class EAGLEBD(Strategy):
                 if self.duo_stopping:
                     self.cooling_count = self.cooling_count - 1
                 else:
-                    print("avg, nowlife, lifeline", [x for x in avg_life], now_life, life_line.iloc[-1])
-                    if now_life > life_line.iloc[-1] + self.above and AAPLUS:
+                    print("avg, nowlife, lifeline", [x for x in avg_life], now_life, life_line[-1])
+                    if now_life > life_line[-1] + self.above and AAPLUS:
                         print("开始做多！！！！！！！！！！！")
-                        print("life_line.iloc[-1] > life_line.iloc[-2]", life_line.iloc[-1], life_line.iloc[-2])
-                        print("ema_short.iloc[-1] > ema_long.iloc[-1]", ema_short.iloc[-1], ema_long.iloc[-1])
-                        self.broker.relog()
+                        print("life_line[-1] > life_line[-2]", life_line[-1], life_line[-2])
+                        print("ema_short[-1] > ema_long[-1]", ema_short[-1], ema_long[-1])
                         self.duo_enter_point = current_point
                         duo_enter_point = self.duo_enter_point + self.trade_offset
 
@@ -230,17 +207,16 @@ class EAGLEBD(Strategy):
                         self.write_order(type=1, point=current_point)
             new_orders = [x for x in new_orders if x is not None]
             if len(new_orders) == 0:
-                print("life_line.iloc[-1]  life_line.iloc[-2]", life_line.iloc[-1], life_line.iloc[-2])
-                print("ema_short.iloc[-1]  ema_long.iloc[-1]", ema_short.iloc[-1], ema_long.iloc[-1])
+                print("life_line[-1]  life_line[-2]", life_line[-1], life_line[-2])
+                print("ema_short[-1]  ema_long[-1]", ema_short[-1], ema_long[-1])
                 new_orders = None
         elif BB or BLUE:
             if self.duo_stopping:
                 self.duo_stopping = False
             if self.duo_flag:
                 print("开始平多仓！！！！！！！！！！！")
-                print("life_line.iloc[-1] < life_line.iloc[-2]", life_line.iloc[-1], life_line.iloc[-2])
-                print("ema_short.iloc[-1] < ema_long.iloc[-1]", ema_short.iloc[-1], ema_long.iloc[-1])
-                self.broker.relog()
+                print("life_line[-1] < life_line[-2]", life_line[-1], life_line[-2])
+                print("ema_short[-1] < ema_long[-1]", ema_short[-1], ema_long[-1])
                 duo_exit_point = current_point - self.trade_offset
                 print("duo exit point", current_point)
                 # 做空信号
@@ -264,12 +240,11 @@ class EAGLEBD(Strategy):
                 if self.kong_stopping:
                     self.cooling_count = self.cooling_count - 1
                 else:
-                    print("avg, nowlife, lifeline", [x for x in avg_life], now_life, life_line.iloc[-1])
-                    if now_life < life_line.iloc[-1] - self.above and BBPLUS:
+                    print("avg, nowlife, lifeline", [x for x in avg_life], now_life, life_line[-1])
+                    if now_life < life_line[-1] - self.above and BBPLUS:
                         print("开始做空！！！！！！！！！！！")
-                        print("life_line.iloc[-1] < life_line.iloc[-2]", life_line.iloc[-1], life_line.iloc[-2])
-                        print("ema_short.iloc[-1] < ema_long.iloc[-1]", ema_short.iloc[-1], ema_long.iloc[-1])
-                        self.broker.relog()
+                        print("life_line[-1] < life_line[-2]", life_line[-1], life_line[-2])
+                        print("ema_short[-1] < ema_long[-1]", ema_short[-1], ema_long[-1])
                         self.kong_enter_point = current_point
                         kong_enter_point = self.kong_enter_point - self.trade_offset
 
@@ -294,14 +269,14 @@ class EAGLEBD(Strategy):
                         self.write_order(type=3, point=current_point)
             new_orders = [x for x in new_orders if x is not None]
             if len(new_orders) == 0:
-                print("life_line.iloc[-1]  life_line.iloc[-2]", life_line.iloc[-1], life_line.iloc[-2])
-                print("ema_short.iloc[-1]  ema_long.iloc[-1]", ema_short.iloc[-1], ema_long.iloc[-1])
+                print("life_line[-1]  life_line[-2]", life_line[-1], life_line[-2])
+                print("ema_short[-1]  ema_long[-1]", ema_short[-1], ema_long[-1])
                 new_orders = None
         else:
             new_orders = [x for x in new_orders if x is not None]
             if len(new_orders) == 0:
-                print("life_line.iloc[-1]  life_line.iloc[-2]", life_line.iloc[-1], life_line.iloc[-2])
-                print("ema_short.iloc[-1]  ema_long.iloc[-1]", ema_short.iloc[-1], ema_long.iloc[-1])
+                print("life_line[-1]  life_line[-2]", life_line[-1], life_line[-2])
+                print("ema_short[-1]  ema_long[-1]", ema_short[-1], ema_long[-1])
                 new_orders = None
 
         # print("new_orders", new_orders)
@@ -327,7 +302,6 @@ class EAGLEBD(Strategy):
             if self.duo_flag:
                 print("多仓止损")
                 print("avg,life", avg, life)
-                self.broker.relog()
                 temp = self.broker.get_candles(self.instrument, granularity="1s", count=1)
                 duo_stopping_point = temp.iloc[0]['Close'] - self.trade_offset
                 print("duo enter point", self.duo_enter_point)
@@ -355,7 +329,6 @@ class EAGLEBD(Strategy):
             if self.kong_flag:
                 print("空仓止损")
                 print("avg,life", avg, life)
-                self.broker.relog()
                 temp = self.broker.get_candles(self.instrument, granularity="1s", count=1)
                 kong_stopping_point = temp.iloc[0]['Close'] + self.trade_offset
                 print("kong enter point", self.kong_enter_point)
@@ -381,18 +354,7 @@ class EAGLEBD(Strategy):
         return new_order
 
     def write_order(self, type, point):
-        now = datetime.now().strftime("%m-%d %H:%M:%S")
-        if type == 1:  # 买开
-            line = f"{now} {self.instrument}，买开，{point}，profit {self.profit} \n"
-        elif type == 2:  # 买平
-            line = f"{now} {self.instrument}，买平，{point}，profit {self.profit}  \n"
-        elif type == 3:  # 卖开
-            line = f"{now} {self.instrument}，卖开，{point}，profit {self.profit}  \n"
-        elif type == 4:  # 卖平
-            line = f"{now} {self.instrument}，卖平，{point}，profit {self.profit} \n"
-        else:
-            raise ValueError("Invalid type")
+        self.broker.journal_trade(self.instrument, type, point, profit=self.profit)
 
-        with self.lock:
-            with open(r"H:\Quant_Proj\LeopardSeek/result/order_book.txt", "a", encoding="utf-8") as f:
-                f.write(line)
+    def reset(self):
+        pass
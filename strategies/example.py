@@ -1,4 +1,3 @@
-import threading
 import pandas as pd
 from datetime import datetime
 from LZCTrader.strategy import Strategy
@@ -13,6 +12,8 @@ class Example(Strategy):
     请根据此文件的规范格式，写出自定义策略
     """
 
+    indicator_methods = ('min_generate_features',)  # 计算指标的函数，开启profile时计入indicators阶段
+
     def __init__(
         self, instrument: str, exchange: str, parameters: dict, broker: Broker  # 这四个是必需参数
     ) -> None:
@@ -25,7 +26,10 @@ class Example(Strategy):
         # 自定义：
         self.trade_num = 1  # 交易手数
         self.trade_offset = 3  # 取买几卖几
-        self.lock = threading.Lock()  # 线程锁
+
+    def history_requests(self):
+        # 每次运行generate_signal时所取的k线窗口 (granularity, count)，启动时会一次性预取
+        return [("1min", 30), ("1s", 1)]
 
     def min_generate_features(self, data: pd.DataFrame):
         # 在此函数中，根据传入参数data，计算出你策略所需的MA，EMA等指标，非必需
@@ -52,7 +56,7 @@ class Example(Strategy):
         current_point = temp.iloc[0]['Close']  # 取最近一根秒级k线，作为当前价格
 
         if some_condition:
-            self.broker.relog()  # 由于一段时间不登录，交易所可能会自动下线，所以每次下单前先登录
+            # 下单前无需手动登录：会话被交易所下线时，broker 会在下单时自动重新登录
             duo_enter_point = current_point + self.trade_offset  # 下单价。为保证立刻成交，在此取买三、卖三报单，按照价格优先原则，会按当前价成交。取买几、卖几可自定义。
             new_order = Order(
                 instrument=self.instrument,
@@ -67,7 +71,6 @@ class Example(Strategy):
             new_orders.append(new_order)
             self.write_order(type=1, point=current_point)  # 记录下单结果
         else:
-            self.broker.relog()
             kong_enter_point = current_point - self.trade_offset
             new_order = Order(
                 instrument=self.instrument,
@@ -84,20 +87,4 @@ class Example(Strategy):
         return new_orders
 
     def write_order(self, type, point):  # 记录下单结果函数，非必需
-        now = datetime.now().strftime("%m-%d %H:%M:%S")
-        if type == 1:  # 买开
-            line = f"{now} {self.instrument}，买开，{point} \n"
-        elif type == 2:  # 买平
-            line = f"{now} {self.instrument}，买平，{point} \n"
-        elif type == 3:  # 卖开
-            line = f"{now} {self.instrument}，卖开，{point} \n"
-        elif type == 4:  # 卖平
-            line = f"{now} {self.instrument}，卖平，{point} \n"
-        else:
-            raise ValueError("Invalid type")
-
-        with self.lock:
-            with open("L:/Quantification/LeopardSeek/result/order_book.txt", "a", encoding="utf-8") as f:
-                f.write(line)
-
-
+        self.broker.journal_trade(self.instrument, type, point)  # 由交易记录服务在后台批量写入result/order_book.txt
@@ -1,7 +1,6 @@
 import os
-import threading
 import pandas as pd
-from finta import TA
+from LZCTrader.indicators import bdwz_lines, macd
 from datetime import datetime
 from LZCTrader.strategy import Strategy
 from brokers.broker import Broker
@@ -17,6 +16,8 @@ class MABD(Strategy):
     2. 做多条件：生命线为红
     """
 
+    indicator_methods = ('generate_bdwz', 'generate_macd')
+
     def __init__(
         self, instrument: str, exchange: str, point_change: float, parameters: dict, broker: Broker
     ) -> None:
@@ -47,64 +48,32 @@ class MABD(Strategy):
         self.trade_offset = self.trade_offset * self.point_change
 
         self.cooling_count = self.cooling_count_num
-        self.lock = threading.Lock()
         self.profit = 0
         self.dt = None
         self.current_point = 0
         self.avg = 0
         self.cooling = 0
 
+    def history_requests(self):
+        # 每次运行generate_signal时所取的k线窗口 (granularity, count)，启动时会一次性预取
+        return [("1min", 30), ("tick", 1), ("1s", 5)]
+
 
     def generate_bdwz(self, data: pd.DataFrame):
         # 在此函数中，根据传入参数data，计算出你策略所需的MA，EMA等指标
-        if len(data) < 2*self.params["medium_ema_period"]:
-            if len(data) < 2:
-                empty_series = pd.Series(dtype=float, index=data.index)
-                return empty_series, empty_series, empty_series, empty_series
-            else:
-                ema_long = TA.EMA(data, len(data))
-                ema_medium = TA.EMA(data, len(data)//2)
-                ema_short = TA.EMA(data, len(data)//4)
-                temp_df = pd.DataFrame({
-                    'close': ema_medium,
-                    'open': ema_medium,
-                    'high': ema_medium,  # 补充high
-                    'low': ema_medium  # 补充low
-                })
-                life = TA.EMA(temp_df, len(data))
-                life = life.squeeze()
-                return ema_long, ema_medium, ema_short, life
-
-        ema_long = TA.EMA(data, self.params["long_ema_period"])
-        ema_medium = TA.EMA(data, self.params["medium_ema_period"])
-        ema_short = TA.EMA(data, self.params["short_ema_period"])
-
-        # ema = ema_medium.to_frame()
-        temp_df = pd.DataFrame({
-            'close': ema_medium,
-            'open': ema_medium,
-            'high': ema_medium,  # 补充high
-            'low': ema_medium  # 补充low
-        })
-        life = TA.EMA(temp_df, self.params["medium_ema_period"])
-        life = life.squeeze()
-
-        return ema_long, ema_medium, ema_short, life
+        return self.broker.indicator(
+            self.instrument,
+            data,
+            bdwz_lines,
+            self.params["long_ema_period"],
+            self.params["medium_ema_period"],
+            self.params["short_ema_period"],
+            granularity="1min"
+        )
 
     def generate_macd(self, data: pd.DataFrame):
-        DIF = TA.EMA(data, self.params["ema_short"]) - TA.EMA(data, self.params["ema_long"])
-
-        # ema = ema_medium.to_frame()
-        temp_df = pd.DataFrame({
-            'close': DIF,
-            'open': DIF,
-            'high': DIF,  # 补充high
-            'low': DIF  # 补充low
-        })
-        DEA = TA.EMA(temp_df, self.params["smooth"])
-        # DEA = DEA.squeeze()
-
-        return DIF, DEA
+        return self.broker.indicator(self.instrument, data, macd, self.params["ema_short"], self.params["ema_long"], self.params["smooth"],
+                                     granularity="1min")
 
     def generate_signal(self, dt: datetime):
         # 此为函数主体，根据指标进行计算，产生交易信号并下单，程序只会调用这一个函数进行不断循环
@@ -120,12 +89,12 @@ class MABD(Strategy):
         DIF, DEA = self.generate_macd(min_data)
         ema_long, ema_medium, ema_short, life_line = self.generate_bdwz(min_data)
 
-        last_DIF = DIF.iloc[-1]
-        last_DEA = DEA.iloc[-1]
-        RED = life_line.iloc[-1] > life_line.iloc[-2]
-        BLUE = life_line.iloc[-1] < life_line.iloc[-2]
-        AA = ema_short.iloc[-1] > ema_long.iloc[-1]
-        BB = ema_short.iloc[-1] < ema_long.iloc[-1]
+        last_DIF = DIF[-1]
+        last_DEA = DEA[-1]
+        RED = life_line[-1] > life_line[-2]
+        BLUE = life_line[-1] < life_line[-2]
+        AA = ema_short[-1] > ema_long[-1]
+        BB = ema_short[-1] < ema_long[-1]
         WHITE = (AA and BLUE) or (BB and RED)
 
         temp = self.broker.get_candles(instrument=self.instrument, granularity="tick", count=1, cut_yesterday=True)
@@ -146,9 +115,9 @@ class MABD(Strategy):
         self.avg = avg
 
         if self.kong_flag or self.duo_flag:
-            new_orders.extend(self.dynamic_stop(life_line.iloc[-1]))
+            new_orders.extend(self.dynamic_stop(life_line[-1]))
 
-        #print(f"{self.instrument} life {life_line.iloc[-1]}")
+        #print(f"{self.instrument} life {life_line[-1]}")
 
         if self.duo_stopping:
             #print(f"remaining count {self.cooling_count}")
@@ -162,7 +131,6 @@ class MABD(Strategy):
             if self.kong_flag:
                 print(f"{self.instrument} CLOSING SHORT! enter: {self.kong_enter_point} exit: {current_point}")
                 kong_exit_point = current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -181,7 +149,6 @@ class MABD(Strategy):
             if self.duo_flag:
                 print(f"{self.instrument} CLOSING LONG! enter: {self.duo_enter_point} exit: {current_point}")
                 duo_exit_point = current_point - self.trade_offset
-                self.broker.relog()
                 # 做空信号
                 new_order = Order(
                     instrument=self.instrument,
@@ -202,7 +169,6 @@ class MABD(Strategy):
             if self.kong_flag:
                 print(f"{self.instrument} CLOSING SHORT! enter: {self.kong_enter_point} exit: {current_point}")
                 kong_exit_point = current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -226,7 +192,6 @@ class MABD(Strategy):
                         print(f"{self.instrument} OPENING LONG! enter: {current_point} DIF: {last_DIF} DEA: {last_DEA}")
                         self.duo_enter_point = current_point
                         duo_enter_point = self.duo_enter_point + self.trade_offset
-                        self.broker.relog()
                         new_order = Order(
                             instrument=self.instrument,
                             exchange=self.symbol_exchange,
@@ -244,7 +209,6 @@ class MABD(Strategy):
             if self.duo_flag:
                 print(f"{self.instrument} CLOSING LONG! enter: {self.duo_enter_point} exit: {current_point}")
                 duo_exit_point = current_point - self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -269,7 +233,6 @@ class MABD(Strategy):
                         self.kong_enter_point = current_point
                         kong_enter_point = self.kong_enter_point - self.trade_offset
                         # 做空信号
-                        self.broker.relog()
                         new_order = Order(
                             instrument=self.instrument,
                             exchange=self.symbol_exchange,
@@ -297,7 +260,6 @@ class MABD(Strategy):
                 print(f"{self.instrument} STOPPING LONG! enter: {self.duo_enter_point} exit: {self.current_point}")
 
                 duo_exit_point = self.current_point - self.trade_offset
-                self.broker.relog()
                 # 做空信号
                 new_order = Order(
                     instrument=self.instrument,
@@ -324,7 +286,6 @@ class MABD(Strategy):
                 print(f"{self.instrument} STOPPING SHORT! enter: {self.kong_enter_point} exit: {self.current_point}")
 
                 kong_exit_point = self.current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -346,21 +307,7 @@ class MABD(Strategy):
         return new_orders
 
     def write_order(self, type, point):
-        now = datetime.now().strftime("%m-%d %H:%M:%S")
-        if type == 1:  # 买开
-            line = f"{now} {self.instrument}，买开，{point}，profit {self.profit} \n"
-        elif type == 2:  # 买平
-            line = f"{now} {self.instrument}，买平，{point}，profit {self.profit}  \n"
-        elif type == 3:  # 卖开
-            line = f"{now} {self.instrument}，卖开，{point}，profit {self.profit}  \n"
-        elif type == 4:  # 卖平
-            line = f"{now} {self.instrument}，卖平，{point}，profit {self.profit} \n"
-        else:
-            raise ValueError("Invalid type")
-
-        with self.lock:
-            with open(r"H:\Quant_Proj\LZCTrader/result/order_book.txt", "a", encoding="utf-8") as f:
-                f.write(line)
+        self.broker.journal_trade(self.instrument, type, point, profit=self.profit)
 
     def reset(self):
         pass
@@ -1,5 +1,4 @@
 import os
-import threading
 import pandas as pd
 from finta import TA
 from datetime import datetime
@@ -17,6 +16,8 @@ class MAFAST(Strategy):
     2. 做多条件：生命线为红
     """
 
+    indicator_methods = ('generate_ma',)
+
     def __init__(
         self, instrument: str, exchange: str, point_change: float, parameters: dict, broker: Broker
     ) -> None:
@@ -55,13 +56,16 @@ class MAFAST(Strategy):
         self.trade_offset = self.trade_offset * self.point_change
 
         self.shaking_count = self.shaking_count_num
-        self.lock = threading.Lock()
         self.profit = 0
         self.dt = None
         self.current_point = 0
         self.avg = 0
         self.cooling = 0
 
+    def history_requests(self):
+        # 每次运行generate_signal时所取的k线窗口 (granularity, count)，启动时会一次性预取
+        return [("1min", 15), ("tick", 1)]
+
     def generate_ma(self, data: pd.DataFrame):
         data = (data['Open'] + data['Close']) / 2.0
         ma_short = data.rolling(window=self.params["short_ma_period"]).mean()
@@ -118,7 +122,6 @@ class MAFAST(Strategy):
                 print(f"{self.instrument} STOPPING LONG! enter: {self.duo_enter_point} exit: {self.current_point}")
 
                 duo_exit_point = self.current_point - self.trade_offset
-                self.broker.relog()
                 # 做空信号
                 new_order = Order(
                     instrument=self.instrument,
@@ -141,7 +144,6 @@ class MAFAST(Strategy):
                 print(f"{self.instrument} STOPPING SHORT! enter: {self.kong_enter_point} exit: {self.current_point}")
 
                 kong_exit_point = self.current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -167,7 +169,6 @@ class MAFAST(Strategy):
                     print(f"{self.instrument} CLOSING LONG! enter: {self.duo_enter_point} exit: {current_point} speed: {ma_delta_speed[-1]} short: {last_short} long: {last_long}")
 
                     duo_exit_point = current_point - self.trade_offset
-                    self.broker.relog()
                     new_order = Order(
                         instrument=self.instrument,
                         exchange=self.symbol_exchange,
@@ -190,7 +191,6 @@ class MAFAST(Strategy):
                 if ma_delta_speed[-1] > 0:
                     print(f"{self.instrument} CLOSING SHORT! enter: {self.kong_enter_point} exit: {current_point} speed: {ma_delta_speed[-1]} short: {last_short} long: {last_long}")
                     kong_exit_point = current_point + self.trade_offset
-                    self.broker.relog()
                     new_order = Order(
                         instrument=self.instrument,
                         exchange=self.symbol_exchange,
@@ -217,7 +217,6 @@ class MAFAST(Strategy):
                         print(f"{self.instrument} OPENING LONG! enter: {current_point} short: {last_short} long: {last_long} speed-1: {ma_delta_speed[-1]} speed-2: {ma_delta_speed[-2]}")
                         self.duo_enter_point = current_point
                         duo_enter_point = self.duo_enter_point + self.trade_offset
-                        self.broker.relog()
                         new_order = Order(
                             instrument=self.instrument,
                             exchange=self.symbol_exchange,
@@ -241,7 +240,6 @@ class MAFAST(Strategy):
                         self.kong_enter_point = current_point
                         kong_enter_point = self.kong_enter_point - self.trade_offset
                         # 做空信号
-                        self.broker.relog()
                         new_order = Order(
                             instrument=self.instrument,
                             exchange=self.symbol_exchange,
@@ -261,7 +259,6 @@ class MAFAST(Strategy):
             if self.current_point > self.duo_enter_point + self.take_profit:
                 print(f"{self.instrument} TAKEN PROFIT LONG! enter: {self.duo_enter_point} exit: {current_point}")
                 duo_exit_point = current_point - self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -281,7 +278,6 @@ class MAFAST(Strategy):
             if self.current_point < self.kong_enter_point - self.take_profit:
                 print(f"{self.instrument} TAKEN PROFIT SHORT! enter: {self.kong_enter_point} exit: {current_point}")
                 kong_exit_point = current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -301,21 +297,7 @@ class MAFAST(Strategy):
         return new_orders
 
     def write_order(self, type, point):
-        now = datetime.now().strftime("%m-%d %H:%M:%S")
-        if type == 1:  # 买开
-            line = f"{now} {self.instrument}，买开，{point}，profit {self.profit} \n"
-        elif type == 2:  # 买平
-            line = f"{now} {self.instrument}，买平，{point}，profit {self.profit}  \n"
-        elif type == 3:  # 卖开
-            line = f"{now} {self.instrument}，卖开，{point}，profit {self.profit}  \n"
-        elif type == 4:  # 卖平
-            line = f"{now} {self.instrument}，卖平，{point}，profit {self.profit} \n"
-        else:
-            raise ValueError("Invalid type")
-
-        with self.lock:
-            with open(r"H:\Quant_Proj\LZCTrader/result/order_book.txt", "a", encoding="utf-8") as f:
-                f.write(line)
+        self.broker.journal_trade(self.instrument, type, point, profit=self.profit)
 
     def reset(self):
         pass
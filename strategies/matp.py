@@ -1,5 +1,4 @@
 import os
-import threading
 import pandas as pd
 from finta import TA
 from datetime import datetime
@@ -17,6 +16,8 @@ class MATP(Strategy):
     2. 做多条件：生命线为红
     """
 
+    indicator_methods = ('generate_ma',)
+
     def __init__(
         self, instrument: str, exchange: str, point_change: float, parameters: dict, broker: Broker
     ) -> None:
@@ -49,13 +50,16 @@ class MATP(Strategy):
         self.trade_offset = self.trade_offset * self.point_change
 
         self.cooling_count = self.cooling_count_num
-        self.lock = threading.Lock()
         self.profit = 0
         self.dt = None
         self.current_point = 0
         self.avg = 0
         self.cooling = 0
 
+    def history_requests(self):
+        # 每次运行generate_signal时所取的k线窗口 (granularity, count)，启动时会一次性预取
+        return [("1min", 30), ("tick", 1)]
+
     def generate_ma(self, data: pd.DataFrame):
         data = (data['Open'] + data['Close']) / 2.0
         ma_short = data.rolling(window=self.params["short_ma_period"]).mean()
@@ -103,7 +107,6 @@ class MATP(Strategy):
                     print(f"{self.instrument} OPENING LONG! enter: {current_point} ")
                     self.duo_enter_point = current_point
                     duo_enter_point = self.duo_enter_point + self.trade_offset
-                    self.broker.relog()
                     new_order = Order(
                         instrument=self.instrument,
                         exchange=self.symbol_exchange,
@@ -125,7 +128,6 @@ class MATP(Strategy):
                     self.kong_enter_point = current_point
                     kong_enter_point = self.kong_enter_point - self.trade_offset
                     # 做空信号
-                    self.broker.relog()
                     new_order = Order(
                         instrument=self.instrument,
                         exchange=self.symbol_exchange,
@@ -145,7 +147,6 @@ class MATP(Strategy):
             if self.current_point > self.duo_enter_point + self.take_profit:
                 print(f"{self.instrument} CLOSING LONG! enter: {self.duo_enter_point} exit: {current_point}")
                 duo_exit_point = current_point - self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -165,7 +166,6 @@ class MATP(Strategy):
             if self.current_point < self.kong_enter_point - self.take_profit:
                 print(f"{self.instrument} CLOSING SHORT! enter: {self.kong_enter_point} exit: {current_point}")
                 kong_exit_point = current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -192,7 +192,6 @@ class MATP(Strategy):
                 print(f"{self.instrument} STOPPING LONG! enter: {self.duo_enter_point} exit: {self.current_point}")
 
                 duo_exit_point = self.current_point - self.trade_offset
-                self.broker.relog()
                 # 做空信号
                 new_order = Order(
                     instrument=self.instrument,
@@ -218,7 +217,6 @@ class MATP(Strategy):
                 print(f"{self.instrument} STOPPING SHORT! enter: {self.kong_enter_point} exit: {self.current_point}")
 
                 kong_exit_point = self.current_point + self.trade_offset
-                self.broker.relog()
                 new_order = Order(
                     instrument=self.instrument,
                     exchange=self.symbol_exchange,
@@ -240,21 +238,7 @@ class MATP(Strategy):
         return new_orders
 
     def write_order(self, type, point):
-        now = datetime.now().strftime("%m-%d %H:%M:%S")
-        if type == 1:  # 买开
-            line = f"{now} {self.instrument}，买开，{point}，profit {self.profit} \n"
-        elif type == 2:  # 买平
-            line = f"{now} {self.instrument}，买平，{point}，profit {self.profit}  \n"
-        elif type == 3:  # 卖开
-            line = f"{now} {self.instrument}，卖开，{point}，profit {self.profit}  \n"
-        elif type == 4:  # 卖平
-            line = f"{now} {self.instrument}，卖平，{point}，profit {self.profit} \n"
-        else:
-            raise ValueError("Invalid type")
-
-        with self.lock:
-            with open(r"H:\Quant_Proj\LZCTrader/result/order_book.txt", "a", encoding="utf-8") as f:
-                f.write(line)
+        self.broker.journal_trade(self.instrument, type, point, profit=self.profit)
 
     def reset(self):
         pass